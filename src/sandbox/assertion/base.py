@@ -25,6 +25,10 @@ class AssertionContext:
 class BaseAssertion(ABC):
     """断言基类，所有断言类型必须实现 evaluate 方法"""
 
+    assertion_type: str = ""
+    # 需要调用外部服务（Judge LLM）的断言，评估时并发执行
+    network_bound: bool = False
+
     @abstractmethod
     async def evaluate(
         self,
@@ -33,3 +37,21 @@ class BaseAssertion(ABC):
         context: AssertionContext,
     ) -> AssertionResult:
         ...
+
+    def check_partial(
+        self,
+        partial_text: str,
+        new_from: int,
+        elapsed_ms: float,
+    ) -> AssertionResult | None:
+        """
+        流式模式下对部分回答进行增量检查
+
+        参数：
+            partial_text: 目前已收到的回答
+            new_from: 本次新增内容在 partial_text 中的起始位置
+            elapsed_ms: 请求开始至今的耗时
+        返回：
+            结论已确定（后续内容无论如何都不会改变结果）时返回最终结果，否则返回 None
+        """
+        return None
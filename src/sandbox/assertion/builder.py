@@ -2,13 +2,16 @@
 
 from __future__ import annotations
 
+import re
 from typing import TYPE_CHECKING
 
 from sandbox.assertion.base import BaseAssertion
+from sandbox.assertion.lexicon import load_lexicon
 from sandbox.assertion.performance import LatencyAssertion, TokenUsageAssertion
 from sandbox.assertion.string_match import (
     ContainsAssertion,
     EqualsAssertion,
+    LexiconNotContainsAssertion,
     NotContainsAssertion,
     RegexAssertion,
 )
@@ -35,14 +38,25 @@ def build_assertion(
 
         case "not_contains":
             values = spec.values or ([str(spec.value)] if spec.value is not None else [])
+            if spec.values_file or spec.normalize:
+                # 词表模式：编译为共享的 Aho-Corasick 自动机
+                lexicon = load_lexicon(spec.values_file, values, spec.normalize)
+                if not len(lexicon):
+                    raise AssertionError_("not_contains 词表为空")
+                return LexiconNotContainsAssertion(
+                    lexicon=lexicon, source=spec.values_file or "values"
+                )
             if not values:
-                raise AssertionError_("not_contains 断言必须指定 values 或 value")
+                raise AssertionError_("not_contains 断言必须指定 values、values_file 或 value")
             return NotContainsAssertion(values=values)
 
         case "regex":
             if spec.pattern is None:
                 raise AssertionError_("regex 断言必须指定 pattern")
-            return RegexAssertion(pattern=spec.pattern)
+            try:
+                return RegexAssertion(pattern=spec.pattern)
+            except re.error as e:
+                raise AssertionError_(f"regex 断言的 pattern 无效 ({spec.pattern}): {e}") from e
 
         case "equals":
             if spec.value is None:
@@ -52,11 +66,15 @@ def build_assertion(
         case "latency_ms":
             if spec.max is None:
                 raise AssertionError_("latency_ms 断言必须指定 max")
+            if spec.max <= 0:
+                raise AssertionError_(f"latency_ms 断言的 max 必须大于 0: {spec.max}")
             return LatencyAssertion(max_ms=spec.max)
 
         case "token_usage":
             if spec.max_total is None:
                 raise AssertionError_("token_usage 断言必须指定 max_total")
+            if spec.max_total <= 0:
+                raise AssertionError_(f"token_usage 断言的 max_total 必须大于 0: {spec.max_total}")
             return TokenUsageAssertion(max_total=spec.max_total)
 
         case "llm_judge":
@@ -64,6 +82,7 @@ def build_assertion(
                 raise AssertionError_("llm_judge 断言必须指定 criteria")
             if spec.pass_threshold is None:
                 raise AssertionError_("llm_judge 断言必须指定 pass_threshold")
+            _check_threshold("llm_judge", spec.pass_threshold)
             if judge_client is None:
                 raise AssertionError_("llm_judge 断言需要配置 judge LLM（请在 sandbox.yaml 中配置 judge 段）")
             from sandbox.assertion.llm_judge import LLMJudgeAssertion
@@ -80,6 +99,8 @@ def build_assertion(
                 raise AssertionError_("scene_judge 断言需要配置 judge LLM（请在 sandbox.yaml 中配置 judge 段）")
             if scene is None:
                 raise AssertionError_("scene_judge 断言需要指定 judge_scene（黄金场景文件路径）")
+            if spec.pass_threshold is not None:
+                _check_threshold("scene_judge", spec.pass_threshold)
             from sandbox.assertion.scene_judge import SceneJudgeAssertion
 
             return SceneJudgeAssertion(
@@ -95,3 +116,10 @@ def build_assertion(
 
         case _:
             raise AssertionError_(f"未知断言类型: {spec.type}")
+
+
+def _check_threshold(assertion_type: str, threshold: float) -> None:
+    if not 0.0 <= threshold <= 1.0:
+        raise AssertionError_(
+            f"{assertion_type} 断言的 pass_threshold 必须在 0 到 1 之间: {threshold}"
+        )
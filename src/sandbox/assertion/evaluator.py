@@ -0,0 +1,72 @@
+"""单轮回答的断言评估 — 单轮 / 多轮 Runner 共用
+
+- 本地断言（字符串匹配、性能等）直接依次评估
+- 需要调用 Judge LLM 的断言并发评估，受 judge_semaphore 限制
+- batch_judge=True 时，共用同一个 Judge 客户端的多个 llm_judge 断言合并为一次调用
+结果顺序始终与断言列表一致。
+"""
+
+import asyncio
+from collections.abc import Awaitable
+
+from sandbox.assertion.base import AssertionContext, BaseAssertion
+from sandbox.assertion.llm_judge import LLMJudgeAssertion, evaluate_llm_judges_batched
+from sandbox.schema.result import AssertionResult
+
+
+async def evaluate_assertions(
+    assertions: list[BaseAssertion],
+    response_text: str,
+    raw_response: dict,
+    context: AssertionContext,
+    batch_judge: bool = False,
+    judge_semaphore: asyncio.Semaphore | None = None,
+) -> list[AssertionResult]:
+    """评估一轮回答的全部断言，返回与 assertions 顺序一致的结果"""
+    results: list[AssertionResult | None] = [None] * len(assertions)
+
+    # 本地断言不涉及 I/O，直接评估
+    for i, assertion in enumerate(assertions):
+        if not assertion.network_bound:
+            results[i] = await assertion.evaluate(response_text, raw_response, context)
+
+    # 每组评估一个 Judge 断言或一个批量组，返回对应下标的结果
+    groups: list[tuple[list[int], Awaitable[list[AssertionResult]]]] = []
+    batched: set[int] = set()
+    if batch_judge:
+        for indices in _judge_batches(assertions):
+            batch = [assertions[i] for i in indices]
+            groups.append(
+                (indices, evaluate_llm_judges_batched(batch, response_text, raw_response, context))
+            )
+            batched.update(indices)
+    for i, assertion in enumerate(assertions):
+        if assertion.network_bound and i not in batched:
+            groups.append(([i], _evaluate_one(assertion, response_text, raw_response, context)))
+
+    async def _bounded(pending: Awaitable[list[AssertionResult]]) -> list[AssertionResult]:
+        if judge_semaphore is None:
+            return await pending
+        async with judge_semaphore:
+            return await pending
+
+    group_results = await asyncio.gather(*(_bounded(pending) for _, pending in groups))
+    for (indices, _), group_result in zip(groups, group_results):
+        for i, result in zip(indices, group_result):
+            results[i] = result
+    return results
+
+
+async def _evaluate_one(
+    assertion: BaseAssertion, response_text: str, raw_response: dict, context: AssertionContext
+) -> list[AssertionResult]:
+    return [await assertion.evaluate(response_text, raw_response, context)]
+
+
+def _judge_batches(assertions: list[BaseAssertion]) -> list[list[int]]:
+    """按 Judge 客户端分组 llm_judge 断言的下标（只返回可合并的组）"""
+    groups: dict[int, list[int]] = {}
+    for i, assertion in enumerate(assertions):
+        if isinstance(assertion, LLMJudgeAssertion):
+            groups.setdefault(id(assertion.judge_client), []).append(i)
+    return [indices for indices in groups.values() if len(indices) > 1]
@@ -0,0 +1,177 @@
+"""禁止词词表 — Aho-Corasick 多模式匹配
+
+- 词表（成千上万个词）编译为一个自动机，单次扫描回答即可找出全部命中
+- 可选归一化：width（全角 → 半角，NFKC）、case（忽略大小写）、whitespace（忽略空白）
+- 命中位置始终以原始回答中的字符偏移报告
+- 同一词表文件 + 归一化选项只编译一次，在所有用例间共享
+"""
+
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+
+from sandbox.core.exceptions import AssertionError_
+from sandbox.utils.lru import LRUCache
+
+NORMALIZE_OPTIONS = ("width", "case", "whitespace")
+
+# (词表文件绝对路径, 文件修改时间, 内联词, 归一化选项) -> 已编译词表
+# 条目数有上限，词表文件改动后旧版本会被逐步淘汰
+_LEXICON_CACHE: LRUCache[tuple, "Lexicon"] = LRUCache(maxsize=64)
+
+
+@dataclass(frozen=True)
+class LexiconHit:
+    """一次命中：词表中的原词，以及在原始文本中的 [start, end) 偏移"""
+
+    term: str
+    start: int
+    end: int
+
+
+def normalize_text(text: str, options: frozenset[str]) -> tuple[str, list[int] | None]:
+    """
+    按选项归一化文本
+
+    返回 (归一化文本, 归一化文本每个字符对应的原始偏移)；
+    无归一化选项时偏移表为 None（即与原文一一对应）。
+    """
+    if not options:
+        return text, None
+    chars: list[str] = []
+    offsets: list[int] = []
+    for i, ch in enumerate(text):
+        if "whitespace" in options and ch.isspace():
+            continue
+        if "width" in options:
+            ch = unicodedata.normalize("NFKC", ch)
+        if "case" in options:
+            ch = ch.casefold()
+        chars.append(ch)
+        offsets.extend([i] * len(ch))
+    return "".join(chars), offsets
+
+
+class Lexicon:
+    """Aho-Corasick 自动机"""
+
+    def __init__(self, terms: list[str], normalize: frozenset[str] = frozenset()):
+        self.normalize = normalize
+        self.terms: list[str] = []
+        self._key_lens: list[int] = []
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+
+        seen: set[str] = set()
+        for term in terms:
+            key, _ = normalize_text(term, normalize)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self._insert(key, len(self.terms))
+            self.terms.append(term)
+            self._key_lens.append(len(key))
+        self._build_failure_links()
+
+        # 一个词在原文中最多跨越的字符数（忽略空白时无上限）
+        self.max_span: int | None = (
+            None if "whitespace" in normalize else max(self._key_lens, default=0)
+        )
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _insert(self, key: str, term_index: int) -> None:
+        state = 0
+        for ch in key:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(term_index)
+
+    def _build_failure_links(self) -> None:
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                # 合并后缀状态的输出，扫描时无需沿失败链回溯
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find_all(self, text: str) -> list[LexiconHit]:
+        """单次扫描，返回全部命中（按结束位置排序，含重叠命中）"""
+        normalized, offsets = normalize_text(text, self.normalize)
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: list[LexiconHit] = []
+        state = 0
+        for i, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for term_index in out[state]:
+                start = i - self._key_lens[term_index] + 1
+                if offsets is None:
+                    hits.append(LexiconHit(self.terms[term_index], start, i + 1))
+                else:
+                    hits.append(LexiconHit(self.terms[term_index], offsets[start], offsets[i] + 1))
+        return hits
+
+    def search(self, text: str) -> bool:
+        """是否存在任意命中（找到第一个即返回）"""
+        normalized, _ = normalize_text(text, self.normalize)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in normalized:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+def read_terms(path: Path) -> list[str]:
+    """读取词表文件：每行一个词，忽略空行和 # 开头的注释行"""
+    terms = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        term = line.strip()
+        if term and not term.startswith("#"):
+            terms.append(term)
+    return terms
+
+
+def load_lexicon(
+    values_file: str | None = None,
+    values: list[str] | None = None,
+    normalize: list[str] | None = None,
+) -> Lexicon:
+    """按 词表文件 + 内联词 + 归一化选项 取得（必要时编译）共享词表"""
+    options = frozenset(normalize or ())
+    unknown = options - set(NORMALIZE_OPTIONS)
+    if unknown:
+        raise AssertionError_(f"未知的归一化选项: {sorted(unknown)}")
+
+    path = None
+    mtime = None
+    if values_file:
+        path = Path(values_file).resolve()
+        if not path.is_file():
+            raise AssertionError_(f"词表文件不存在: {values_file}")
+        mtime = path.stat().st_mtime
+
+    key = (str(path) if path else None, mtime, tuple(values or ()), options)
+    lexicon = _LEXICON_CACHE.get(key)
+    if lexicon is None:
+        terms = [*(read_terms(path) if path else []), *(values or [])]
+        lexicon = Lexicon(terms, options)
+        _LEXICON_CACHE.put(key, lexicon)
+    return lexicon
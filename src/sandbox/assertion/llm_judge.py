@@ -1,7 +1,15 @@
-"""LLM-as-Judge 断言 — 用独立 LLM 对回复质量进行客观评估"""
+"""LLM-as-Judge 断言 — 用独立 LLM 对回复质量进行客观评估
+
+批量模式（evaluate_llm_judges_batched）把同一轮的多个 llm_judge 断言合并为
+一次多标准评估请求，对话上下文只发送一次；批量响应无法解析的标准回退为单独调用。
+"""
+
+import asyncio
+import json
+import re
 
 from sandbox.assertion.base import AssertionContext, BaseAssertion
-from sandbox.client.judge_llm import JudgeLLMClient
+from sandbox.client.judge_llm import JudgeLLMClient, JudgeResult
 from sandbox.core.logging import get_logger
 from sandbox.schema.result import AssertionResult
 
@@ -30,10 +38,45 @@ JUDGE_USER_TEMPLATE = """## 评估标准
 
 请严格按照评估标准进行评分，输出 JSON 格式。"""
 
+BATCH_JUDGE_SYSTEM_PROMPT = """你是一个严格的AI对话质量评估专家。
+你需要根据给定的多项评估标准，对AI助手的回复逐项进行客观评分。
+
+评分规则：
+- 每项标准独立评分，互不影响
+- 给出 0.0 到 1.0 之间的分数
+- 0.0 = 完全不满足标准
+- 0.5 = 部分满足
+- 1.0 = 完全满足
+- 必须输出 JSON 格式:
+{
+  "criteria": [
+    {"id": "c1", "score": 0.85, "reasoning": "..."},
+    {"id": "c2", "score": 0.4, "reasoning": "..."}
+  ],
+  "score": 0.62
+}
+其中 score 为各项分数的平均值。
+
+重要：你的评分必须基于事实和具体证据，不能主观臆断。"""
+
+BATCH_JUDGE_USER_TEMPLATE = """## 评估标准（共 {count} 项）
+{criteria_text}
+
+## 对话上下文
+{conversation_context}
+
+## 待评估的AI回复
+{response_text}
+
+请严格按照每项评估标准逐项评分，输出 JSON 格式。"""
+
 
 class LLMJudgeAssertion(BaseAssertion):
     """使用 LLM 评估回复质量"""
 
+    assertion_type = "llm_judge"
+    network_bound = True
+
     def __init__(
         self,
         criteria: str,
@@ -73,6 +116,9 @@ class LLMJudgeAssertion(BaseAssertion):
                 actual="error",
             )
 
+        return self._result(judge_result)
+
+    def _result(self, judge_result: JudgeResult) -> AssertionResult:
         passed = judge_result.score >= self.pass_threshold
         # 关联到第一个评分维度（如果指定了的话）
         dimension = self.dimensions[0] if self.dimensions else None
@@ -86,3 +132,84 @@ class LLMJudgeAssertion(BaseAssertion):
             score=judge_result.score,
             dimension=dimension,
         )
+
+
+async def evaluate_llm_judges_batched(
+    assertions: list[LLMJudgeAssertion],
+    response_text: str,
+    raw_response: dict,
+    context: AssertionContext,
+) -> list[AssertionResult]:
+    """
+    用一次 Judge 调用评估同一轮的多个 llm_judge 断言（需共用同一个 judge_client）
+
+    返回结果与 assertions 顺序一致；批量调用失败或缺少某项评分时，
+    对应断言回退为单独调用。
+    """
+    if len(assertions) < 2:
+        return list(
+            await asyncio.gather(
+                *(a.evaluate(response_text, raw_response, context) for a in assertions)
+            )
+        )
+
+    ids = [f"c{i}" for i in range(1, len(assertions) + 1)]
+    criteria_text = "\n".join(
+        f"- [{cid}] {assertion.criteria}" for cid, assertion in zip(ids, assertions)
+    )
+    prompt = BATCH_JUDGE_USER_TEMPLATE.format(
+        count=len(assertions),
+        criteria_text=criteria_text,
+        conversation_context=context.format_history() or "(无上下文，首轮对话)",
+        response_text=response_text,
+    )
+
+    scores: dict[str, JudgeResult] = {}
+    try:
+        batch_result = await assertions[0].judge_client.evaluate(
+            system_prompt=BATCH_JUDGE_SYSTEM_PROMPT,
+            user_prompt=prompt,
+        )
+        scores = _parse_criteria_scores(batch_result.raw_text)
+    except Exception as e:
+        logger.warning(f"批量 LLM Judge 调用失败，回退为单独调用: {e}")
+
+    missing = [cid for cid in ids if cid not in scores]
+    if scores and missing:
+        logger.warning(f"批量 LLM Judge 缺少评分 {missing}，这些标准回退为单独调用")
+
+    async def _result(cid: str, assertion: LLMJudgeAssertion) -> AssertionResult:
+        if cid in scores:
+            return assertion._result(scores[cid])
+        return await assertion.evaluate(response_text, raw_response, context)
+
+    return list(await asyncio.gather(*(_result(c, a) for c, a in zip(ids, assertions))))
+
+
+def _parse_criteria_scores(raw_text: str) -> dict[str, JudgeResult]:
+    """从批量 Judge 响应中解析逐项评分，无法解析时返回空字典"""
+    data = None
+    try:
+        data = json.loads(raw_text)
+    except (json.JSONDecodeError, TypeError):
+        json_match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", raw_text, re.DOTALL)
+        if json_match:
+            try:
+                data = json.loads(json_match.group(1))
+            except (json.JSONDecodeError, TypeError):
+                pass
+
+    if not isinstance(data, dict) or not isinstance(data.get("criteria"), list):
+        return {}
+
+    scores: dict[str, JudgeResult] = {}
+    for item in data["criteria"]:
+        try:
+            scores[str(item["id"])] = JudgeResult(
+                score=float(item["score"]),
+                reasoning=item.get("reasoning", ""),
+                raw_text=raw_text,
+            )
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return scores
@@ -1,12 +1,15 @@
 """性能断言：latency_ms, token_usage"""
 
 from sandbox.assertion.base import AssertionContext, BaseAssertion
-from sandbox.schema.result import AssertionResult
+from sandbox.schema.result import AssertionResult, TurnResult
+from sandbox.schema.test_case import PerformanceBudget
 
 
 class LatencyAssertion(BaseAssertion):
     """检查响应延迟是否在阈值内"""
 
+    assertion_type = "latency_ms"
+
     def __init__(self, max_ms: int):
         self.max_ms = max_ms
 
@@ -18,6 +21,16 @@ class LatencyAssertion(BaseAssertion):
         else:
             latency = raw_response.get("_latency_ms", 0)
 
+        return self._result(latency)
+
+    def check_partial(
+        self, partial_text: str, new_from: int, elapsed_ms: float
+    ) -> AssertionResult | None:
+        if elapsed_ms > self.max_ms:
+            return self._result(elapsed_ms)
+        return None
+
+    def _result(self, latency: float) -> AssertionResult:
         passed = latency <= self.max_ms
         return AssertionResult(
             passed=passed,
@@ -31,6 +44,8 @@ class LatencyAssertion(BaseAssertion):
 class TokenUsageAssertion(BaseAssertion):
     """检查 Token 用量是否在阈值内"""
 
+    assertion_type = "token_usage"
+
     def __init__(self, max_total: int):
         self.max_total = max_total
 
@@ -50,3 +65,44 @@ class TokenUsageAssertion(BaseAssertion):
             expected=f"<= {self.max_total}",
             actual=str(total_tokens),
         )
+
+
+def evaluate_performance_budget(
+    budget: PerformanceBudget | None, turns: list[TurnResult]
+) -> list[AssertionResult]:
+    """整段对话的性能预算（平均延迟、Token 总量），作为用例的 final_assertions"""
+    if budget is None or not turns:
+        return []
+
+    results = []
+    if budget.max_avg_latency_ms is not None:
+        avg_latency = sum(turn.latency_ms for turn in turns) / len(turns)
+        passed = avg_latency <= budget.max_avg_latency_ms
+        results.append(
+            AssertionResult(
+                passed=passed,
+                assertion_type="avg_latency_ms",
+                message=(
+                    f"平均延迟 {avg_latency:.0f}ms {'<=' if passed else '>'} "
+                    f"{budget.max_avg_latency_ms}ms（{len(turns)} 轮）"
+                ),
+                expected=f"<= {budget.max_avg_latency_ms}ms",
+                actual=f"{avg_latency:.0f}ms",
+            )
+        )
+    if budget.max_total_tokens is not None:
+        total_tokens = sum((turn.token_usage or {}).get("total_tokens", 0) for turn in turns)
+        passed = total_tokens <= budget.max_total_tokens
+        results.append(
+            AssertionResult(
+                passed=passed,
+                assertion_type="total_tokens",
+                message=(
+                    f"Token 总量 {total_tokens} {'<=' if passed else '>'} "
+                    f"{budget.max_total_tokens}（{len(turns)} 轮）"
+                ),
+                expected=f"<= {budget.max_total_tokens}",
+                actual=str(total_tokens),
+            )
+        )
+    return results
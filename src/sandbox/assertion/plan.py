@@ -0,0 +1,132 @@
+"""断言计划 — 套件执行前一次性编译全部断言
+
+compile_suite() 在发出任何网络请求之前，把套件中每个用例的 AssertionSpec
+编译为不可变的 CasePlan：
+- 构建断言实例（正则预编译、阈值校验）
+- 绑定 Judge 客户端与黄金场景（场景由调用方预加载，或在此每个文件只加载一次）
+配置错误只影响对应用例，在执行前即可报告；Runner 直接执行计划，
+逐轮热路径上不再重复构建断言。
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from sandbox.assertion.base import BaseAssertion
+from sandbox.assertion.builder import build_assertion
+from sandbox.core.exceptions import YAMLValidationError
+from sandbox.core.logging import get_logger
+from sandbox.schema.scene import SceneFile
+from sandbox.schema.test_case import AssertionSpec, TestCaseSpec, TestSuiteSpec
+from sandbox.utils.yaml_loader import load_and_validate
+
+if TYPE_CHECKING:
+    from sandbox.client.judge_llm import JudgeLLMClient
+    from sandbox.schema.scene import SceneSpec
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class CasePlan:
+    """
+    单个用例的断言计划
+
+    turns[i] 为第 i 轮的断言（单轮用例只有一轮；模拟用户用例只有一组，每轮共用）；
+    stop_conditions / final 为模拟用户用例的停止条件与整段对话断言；
+    error 不为空表示编译失败，用例不应执行。
+    """
+
+    case_id: str
+    turns: tuple[tuple[BaseAssertion, ...], ...] = ()
+    scene: SceneSpec | None = None
+    error: str | None = None
+    stop_conditions: tuple[BaseAssertion, ...] = ()
+    final: tuple[BaseAssertion, ...] = ()
+
+    def turn(self, index: int) -> list[BaseAssertion]:
+        return list(self.turns[index]) if index < len(self.turns) else []
+
+
+def compile_case(
+    case: TestCaseSpec,
+    judge_client: JudgeLLMClient | None = None,
+    scene: SceneSpec | None = None,
+) -> CasePlan:
+    """编译单个用例（断言规格非法时抛出 AssertionError_）"""
+
+    def build(specs: list[AssertionSpec]) -> tuple[BaseAssertion, ...]:
+        return tuple(
+            build_assertion(spec, judge_client=judge_client, scene=scene) for spec in specs
+        )
+
+    turns = tuple(build(specs) for specs in _turn_specs(case))
+    if case.type != "simulated_user":
+        return CasePlan(case_id=case.id, turns=turns, scene=scene)
+    sim_config = case.simulated_user_config
+    return CasePlan(
+        case_id=case.id,
+        turns=turns,
+        scene=scene,
+        stop_conditions=build((sim_config.stop_conditions or []) if sim_config else []),
+        final=build(case.final_assertions or []),
+    )
+
+
+def plan_case(
+    case: TestCaseSpec,
+    judge_client: JudgeLLMClient | None = None,
+    scene: SceneSpec | Exception | None = None,
+) -> CasePlan:
+    """编译单个用例，场景加载失败或断言配置错误时返回带 error 的计划"""
+    if isinstance(scene, Exception):
+        logger.error(f"用例 {case.id} 加载场景失败: {scene}")
+        return CasePlan(case_id=case.id, error=f"加载场景文件失败: {scene}")
+    try:
+        return compile_case(case, judge_client=judge_client, scene=scene)
+    except Exception as e:
+        logger.error(f"用例 {case.id} 断言配置错误: {e}")
+        return CasePlan(case_id=case.id, error=f"断言配置错误: {e}")
+
+
+def compile_suite(
+    suite_spec: TestSuiteSpec,
+    judge_client: JudgeLLMClient | None = None,
+    scenes: Mapping[str, SceneSpec | Exception] | None = None,
+) -> list[CasePlan]:
+    """
+    编译整个套件，返回与 suite_spec.cases 顺序一致的计划
+
+    scenes 为预加载的 场景路径 -> 场景（或加载异常）；
+    未提供时在此同步加载（每个文件一次）。
+    """
+    if scenes is None:
+        scenes = {}
+        for path in dict.fromkeys(c.judge_scene for c in suite_spec.cases if c.judge_scene):
+            try:
+                scenes[path] = load_and_validate(path, SceneFile).scene
+            except Exception as e:
+                scenes[path] = e
+    plans: list[CasePlan] = []
+    for case in suite_spec.cases:
+        scene = None
+        if case.judge_scene:
+            scene = scenes.get(case.judge_scene) or YAMLValidationError(
+                f"场景未加载: {case.judge_scene}"
+            )
+        plans.append(plan_case(case, judge_client=judge_client, scene=scene))
+
+    failed = sum(1 for plan in plans if plan.error)
+    if failed:
+        logger.warning(f"套件 {suite_spec.suite.name} 有 {failed} 个用例编译失败，将不会执行")
+    return plans
+
+
+def _turn_specs(case: TestCaseSpec) -> list[list[AssertionSpec]]:
+    if case.type == "multi_turn":
+        return [turn.assertions for turn in case.turns or []]
+    if case.type == "simulated_user":
+        return [case.per_turn_assertions or []]
+    return [case.assertions or []]
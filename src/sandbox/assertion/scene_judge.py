@@ -1,10 +1,13 @@
 """场景驱动 Judge 断言 — 基于黄金场景逐行为加权评分"""
 
+import hashlib
+
 from sandbox.assertion.base import AssertionContext, BaseAssertion
 from sandbox.client.judge_llm import JudgeLLMClient
 from sandbox.core.logging import get_logger
 from sandbox.schema.result import AssertionResult
 from sandbox.schema.scene import BehaviorSpec, SceneSpec
+from sandbox.utils.lru import LRUCache
 
 logger = get_logger(__name__)
 
@@ -25,14 +28,17 @@ SCENE_JUDGE_SYSTEM_PROMPT = """你是一个严格的AI对话质量评估专家
   "overall": 0.72
 }"""
 
-SCENE_JUDGE_USER_TEMPLATE = """## 评分标准（来自真人优秀对话场景：{scene_name}）
+# 评分标准部分只取决于 (场景, 阶段, 行为)，渲染一次后复用
+SCENE_JUDGE_CRITERIA_TEMPLATE = """## 评分标准（来自真人优秀对话场景：{scene_name}）
 
 当前评估阶段：{phase}
 
 你需要逐项评估以下行为特征：
 
 {behaviors_text}
+"""
 
+SCENE_JUDGE_RESPONSE_TEMPLATE = """
 ## 对话上下文
 {conversation_context}
 
@@ -41,10 +47,18 @@ SCENE_JUDGE_USER_TEMPLATE = """## 评分标准（来自真人优秀对话场景
 
 请逐项评分并输出 JSON。"""
 
+SCENE_JUDGE_USER_TEMPLATE = SCENE_JUDGE_CRITERIA_TEMPLATE + SCENE_JUDGE_RESPONSE_TEMPLATE
+
+# (场景名, 场景内容摘要, 阶段, 行为 ID) -> (筛选后的行为, 渲染好的评分标准)
+_CRITERIA_CACHE: LRUCache[tuple, tuple[list[BehaviorSpec], str]] = LRUCache(maxsize=256)
+
 
 class SceneJudgeAssertion(BaseAssertion):
     """基于黄金场景的逐行为评分"""
 
+    assertion_type = "scene_judge"
+    network_bound = True
+
     def __init__(
         self,
         scene: SceneSpec,
@@ -58,6 +72,7 @@ class SceneJudgeAssertion(BaseAssertion):
         self.phase = phase
         self.behavior_ids = behavior_ids
         self.pass_threshold = pass_threshold
+        self._criteria_key: tuple | None = None
 
     async def evaluate(
         self,
@@ -65,27 +80,19 @@ class SceneJudgeAssertion(BaseAssertion):
         raw_response: dict,
         context: AssertionContext,
     ) -> AssertionResult:
-        # 1. 筛选要评估的行为
-        behaviors = self.scene.behaviors
-        if self.behavior_ids:
-            behaviors = [b for b in behaviors if b.id in self.behavior_ids]
-            if not behaviors:
-                return AssertionResult(
-                    passed=False,
-                    assertion_type="scene_judge",
-                    message=f"未找到匹配的行为: {self.behavior_ids}",
-                    expected=f"score >= {self.pass_threshold}",
-                    actual="no matching behaviors",
-                )
-
-        # 2. 格式化行为特征文本
-        behaviors_text = self._format_behaviors(behaviors)
-
-        # 3. 调用 Judge LLM
-        prompt = SCENE_JUDGE_USER_TEMPLATE.format(
-            scene_name=self.scene.name,
-            phase=self.phase or "全场景",
-            behaviors_text=behaviors_text,
+        # 1. 筛选要评估的行为，取得（缓存的）评分标准文本
+        behaviors, criteria_text = self._criteria()
+        if not behaviors:
+            return AssertionResult(
+                passed=False,
+                assertion_type="scene_judge",
+                message=f"未找到匹配的行为: {self.behavior_ids}",
+                expected=f"score >= {self.pass_threshold}",
+                actual="no matching behaviors",
+            )
+
+        # 2. 调用 Judge LLM
+        prompt = criteria_text + SCENE_JUDGE_RESPONSE_TEMPLATE.format(
             conversation_context=context.format_history() or "(无上下文，首轮对话)",
             response_text=response_text,
         )
@@ -105,7 +112,7 @@ class SceneJudgeAssertion(BaseAssertion):
                 actual="error",
             )
 
-        # 4. 加权计算综合得分
+        # 3. 加权计算综合得分
         # result 来自 JudgeLLMClient，返回的是 JudgeResult(score, reasoning, raw_text)
         # 对于 scene_judge，我们需要解析 raw_text 中的逐行为评分
         behavior_scores = self._parse_behavior_scores(result.raw_text, behaviors)
@@ -122,6 +129,31 @@ class SceneJudgeAssertion(BaseAssertion):
             details=behavior_scores,
         )
 
+    def _criteria(self) -> tuple[list[BehaviorSpec], str]:
+        """筛选后的行为与渲染好的评分标准，按 (场景内容, 阶段, 行为 ID) 缓存"""
+        if self._criteria_key is None:
+            digest = hashlib.sha256(self.scene.model_dump_json().encode()).hexdigest()
+            self._criteria_key = (
+                self.scene.name,
+                digest,
+                self.phase,
+                tuple(self.behavior_ids or ()),
+            )
+        cached = _CRITERIA_CACHE.get(self._criteria_key)
+        if cached is not None:
+            return cached
+
+        behaviors = self.scene.behaviors
+        if self.behavior_ids:
+            behaviors = [b for b in behaviors if b.id in self.behavior_ids]
+        criteria_text = SCENE_JUDGE_CRITERIA_TEMPLATE.format(
+            scene_name=self.scene.name,
+            phase=self.phase or "全场景",
+            behaviors_text=self._format_behaviors(behaviors),
+        )
+        _CRITERIA_CACHE.put(self._criteria_key, (behaviors, criteria_text))
+        return behaviors, criteria_text
+
     def _format_behaviors(self, behaviors: list[BehaviorSpec]) -> str:
         lines = []
         for i, b in enumerate(behaviors, 1):
@@ -0,0 +1,95 @@
+"""流式增量断言评估 — 在回答生成过程中提前确定结论
+
+对 not_contains / regex / latency_ms 等支持 check_partial 的断言，
+每收到一个分片就对部分回答做增量检查。一旦有断言确定失败
+（出现禁止词、耗时超过 latency_ms 上限），即可中止请求，
+不必等待完整回答。
+"""
+
+from sandbox.assertion.base import BaseAssertion
+from sandbox.assertion.performance import LatencyAssertion
+from sandbox.schema.result import AssertionResult
+
+
+class StreamingEvaluator:
+    """
+    单轮回答的增量断言评估器
+
+    用法：
+        evaluator = StreamingEvaluator(assertions)
+        response = await client.send_message(..., on_chunk=evaluator.feed,
+                                             deadline_ms=evaluator.deadline_ms)
+        if response.aborted:
+            results = evaluator.results_after_abort(response.answer, response.latency_ms)
+    """
+
+    def __init__(self, assertions: list[BaseAssertion]):
+        self.assertions = assertions
+        self.settled: dict[int, AssertionResult] = {}
+        self._scanned_text = ""
+        latency_limits = [a.max_ms for a in assertions if isinstance(a, LatencyAssertion)]
+        self.deadline_ms: float | None = min(latency_limits) if latency_limits else None
+
+    @property
+    def active(self) -> bool:
+        """是否有断言支持增量检查（否则无需在流式过程中评估）"""
+        return any(
+            type(a).check_partial is not BaseAssertion.check_partial for a in self.assertions
+        )
+
+    def send_kwargs(self) -> dict:
+        """传给 DifyChatClient.send_message 的流式回调参数"""
+        return {"on_chunk": self.feed, "deadline_ms": self.deadline_ms}
+
+    def feed(self, partial_text: str, elapsed_ms: float) -> bool:
+        """
+        检查部分回答，返回 True 表示已有断言确定失败，应中止请求
+        """
+        # 正常情况下新内容追加在末尾；若回答被整体替换则从头扫描
+        if partial_text.startswith(self._scanned_text):
+            new_from = len(self._scanned_text)
+        else:
+            new_from = 0
+            self.settled.clear()
+        self._scanned_text = partial_text
+
+        for i, assertion in enumerate(self.assertions):
+            if i in self.settled:
+                continue
+            result = assertion.check_partial(partial_text, new_from, elapsed_ms)
+            if result is not None:
+                self.settled[i] = result
+
+        return any(not r.passed for r in self.settled.values())
+
+    def results_after_abort(self, partial_text: str, elapsed_ms: float) -> list[AssertionResult]:
+        """
+        请求被中止后的断言结果（保持原顺序）
+
+        已确定结论的断言使用其结果；其余断言无法在部分回答上评估，记为未通过。
+        """
+        # 超时中止时最后一个分片之后可能没有再调用 feed
+        self.feed(partial_text, elapsed_ms)
+        return [
+            self.settled.get(i) or self._skipped(assertion)
+            for i, assertion in enumerate(self.assertions)
+        ]
+
+    @staticmethod
+    def _skipped(assertion: BaseAssertion) -> AssertionResult:
+        return AssertionResult(
+            passed=False,
+            assertion_type=assertion.assertion_type,
+            message="流式请求已提前中止，未评估",
+            actual="skipped",
+        )
+
+
+def create_streaming_evaluator(
+    assertions: list[BaseAssertion], enabled: bool
+) -> StreamingEvaluator | None:
+    """仅在启用且有可增量检查的断言时创建评估器"""
+    if not enabled:
+        return None
+    evaluator = StreamingEvaluator(assertions)
+    return evaluator if evaluator.active else None
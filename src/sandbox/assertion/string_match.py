@@ -1,14 +1,20 @@
-"""字符串匹配断言：contains, not_contains, regex, equals"""
+"""字符串匹配断言：contains, not_contains（含词表模式）, regex, equals"""
 
 import re
 
 from sandbox.assertion.base import AssertionContext, BaseAssertion
+from sandbox.assertion.lexicon import Lexicon
 from sandbox.schema.result import AssertionResult
 
+# 在部分文本上匹配成功后，仍可能因后续内容而失效的正则结构
+_UNSTABLE_TOKENS = ("$", "\\Z", "(?!")
+
 
 class ContainsAssertion(BaseAssertion):
     """检查响应中是否包含指定字符串"""
 
+    assertion_type = "contains"
+
     def __init__(self, value: str):
         self.value = value
 
@@ -26,10 +32,25 @@ class ContainsAssertion(BaseAssertion):
 class NotContainsAssertion(BaseAssertion):
     """检查响应中不包含任何指定字符串"""
 
+    assertion_type = "not_contains"
+
     def __init__(self, values: list[str]):
         self.values = values
+        self._max_len = max((len(v) for v in values), default=0)
 
     async def evaluate(self, response_text: str, raw_response: dict, context: AssertionContext) -> AssertionResult:
+        return self._result(response_text)
+
+    def check_partial(
+        self, partial_text: str, new_from: int, elapsed_ms: float
+    ) -> AssertionResult | None:
+        # 只扫描新增内容（向前重叠 max_len - 1 个字符，覆盖跨分片的禁止词）
+        window = partial_text[max(0, new_from - self._max_len + 1) :]
+        if any(v in window for v in self.values):
+            return self._result(partial_text)
+        return None
+
+    def _result(self, response_text: str) -> AssertionResult:
         found = [v for v in self.values if v in response_text]
         passed = len(found) == 0
         return AssertionResult(
@@ -41,14 +62,79 @@ class NotContainsAssertion(BaseAssertion):
         )
 
 
+class LexiconNotContainsAssertion(BaseAssertion):
+    """基于词表（Aho-Corasick）的 not_contains：单次扫描，报告全部命中及偏移"""
+
+    assertion_type = "not_contains"
+
+    def __init__(self, lexicon: Lexicon, source: str):
+        self.lexicon = lexicon
+        self.source = source
+
+    async def evaluate(
+        self, response_text: str, raw_response: dict, context: AssertionContext
+    ) -> AssertionResult:
+        return self._result(response_text)
+
+    def check_partial(
+        self, partial_text: str, new_from: int, elapsed_ms: float
+    ) -> AssertionResult | None:
+        # 词在原文中的跨度有上限时只扫描新增内容（带重叠），否则重新扫描全文
+        span = self.lexicon.max_span
+        window = partial_text if span is None else partial_text[max(0, new_from - span + 1) :]
+        if self.lexicon.search(window):
+            return self._result(partial_text)
+        return None
+
+    def _result(self, response_text: str) -> AssertionResult:
+        hits = self.lexicon.find_all(response_text)
+        found = list(dict.fromkeys(hit.term for hit in hits))
+        passed = not hits
+        return AssertionResult(
+            passed=passed,
+            assertion_type="not_contains",
+            message=f"{'通过: 未发现禁止词' if passed else f'失败: 发现禁止词 {found}'}",
+            expected=f"不包含词表 {self.source} 中的 {len(self.lexicon)} 个词",
+            actual=f"发现 {found}" if found else "未发现",
+            details=[
+                {
+                    "term": hit.term,
+                    "start": hit.start,
+                    "end": hit.end,
+                    "text": response_text[hit.start : hit.end],
+                }
+                for hit in hits
+            ],
+        )
+
+
 class RegexAssertion(BaseAssertion):
     """正则表达式匹配"""
 
+    assertion_type = "regex"
+
     def __init__(self, pattern: str):
         self.pattern = pattern
+        # 构建时编译一次（非法模式在此抛出 re.error）
+        self._regex = re.compile(pattern)
+        # 模式中含有会被后续内容推翻的结尾锚点 / 否定前瞻时，不能在部分文本上提前确定
+        self._stable = not any(token in pattern for token in _UNSTABLE_TOKENS)
 
     async def evaluate(self, response_text: str, raw_response: dict, context: AssertionContext) -> AssertionResult:
-        match = re.search(self.pattern, response_text)
+        return self._result(self._regex.search(response_text))
+
+    def check_partial(
+        self, partial_text: str, new_from: int, elapsed_ms: float
+    ) -> AssertionResult | None:
+        # 只有"已匹配"可以提前确定；且匹配不能触及当前末尾
+        if not self._stable:
+            return None
+        match = self._regex.search(partial_text)
+        if match is not None and match.end() < len(partial_text):
+            return self._result(match)
+        return None
+
+    def _result(self, match: re.Match | None) -> AssertionResult:
         passed = match is not None
         return AssertionResult(
             passed=passed,
@@ -62,6 +148,8 @@ class RegexAssertion(BaseAssertion):
 class EqualsAssertion(BaseAssertion):
     """完全等于"""
 
+    assertion_type = "equals"
+
     def __init__(self, value: str):
         self.value = value
 
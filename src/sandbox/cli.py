@@ -10,11 +10,23 @@ from rich.console import Console
 from rich.table import Table
 
 from sandbox import __version__
+from sandbox.client.cassette import Cassette
+from sandbox.client.pool import ClientPool
 from sandbox.core.config import load_config
+from sandbox.core.exceptions import SandboxError
 from sandbox.core.logging import setup_logging, get_logger
-from sandbox.report.json_report import generate_json_report
+from sandbox.report.json_report import generate_json_report_from_jsonl, report_file_path
+from sandbox.report.jsonl_sink import JSONLResultSink, read_completed_results
+from sandbox.report.load_report import generate_load_report, load_summary, window_summary
+from sandbox.report.merge import merge_result_logs
 from sandbox.runner.engine import TestEngine
+from sandbox.runner.load import LoadRunner, load_target
+from sandbox.runner.result_cache import ResultCache
+from sandbox.runner.sharding import case_durations, parse_shard, shard_cases
+from sandbox.schema.config import ExecutionConfig
+from sandbox.schema.result import CaseResult
 from sandbox.scoring.scorer import Scorer, SuiteScorer
+from sandbox.utils.sqlite_cache import SQLiteCache
 from sandbox.utils.yaml_loader import load_and_validate
 from sandbox.schema.test_case import TestSuiteSpec
 
@@ -35,49 +47,244 @@ def cli(ctx, config_path: str, verbose: bool):
     ctx.obj["verbose"] = verbose
 
 
+def _parse_shard_option(ctx, param, value: str | None) -> tuple[int, int] | None:
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
+
+
 @cli.command()
 @click.argument("suite_files", nargs=-1, required=True)
 @click.option("--fail-threshold", default=0.0, type=float, help="最低通过评分")
 @click.option("--output-dir", default=None, help="报告输出目录")
+@click.option("--record", "record_path", default=None, help="将 Dify 响应录制到该文件")
+@click.option(
+    "--replay", "replay_path", default=None, help="从录制文件回放 Dify 响应（不访问网络）"
+)
+@click.option(
+    "--resume",
+    "resume_paths",
+    multiple=True,
+    help="从上次运行的 JSONL 结果文件续跑（按套件名匹配，可多次指定）",
+)
+@click.option("--incremental", is_flag=True, help="复用未变化用例的缓存结果，只执行有变化的用例")
+@click.option(
+    "--prompt-version", default=None, help="被测 Prompt 版本标识（参与增量运行的用例指纹）"
+)
+@click.option(
+    "--shard",
+    default=None,
+    callback=_parse_shard_option,
+    help="只执行第 i/n 片用例（i 从 1 开始）",
+)
+@click.option(
+    "--shard-weights",
+    multiple=True,
+    help="按历史 JSONL 结果文件中的用例耗时均衡分片（可多次指定）",
+)
 @click.pass_context
-def run(ctx, suite_files: tuple[str, ...], fail_threshold: float, output_dir: str | None):
+def run(
+    ctx,
+    suite_files: tuple[str, ...],
+    fail_threshold: float,
+    output_dir: str | None,
+    record_path: str | None,
+    replay_path: str | None,
+    resume_paths: tuple[str, ...],
+    incremental: bool,
+    prompt_version: str | None,
+    shard: tuple[int, int] | None,
+    shard_weights: tuple[str, ...],
+):
     """运行测试套件"""
     config_path = ctx.obj["config_path"]
 
+    if record_path and replay_path:
+        console.print("[red]--record 与 --replay 不能同时使用[/red]")
+        sys.exit(2)
+
     try:
         config = load_config(config_path)
     except Exception as e:
         console.print(f"[red]配置加载失败: {e}[/red]")
         sys.exit(2)
 
+    cassette = None
+    try:
+        if record_path:
+            cassette = Cassette(record_path, mode="record")
+        elif replay_path:
+            cassette = Cassette(replay_path, mode="replay")
+    except Exception as e:
+        console.print(f"[red]录制文件打开失败: {e}[/red]")
+        sys.exit(2)
+
     report_dir = output_dir or config.report.output_dir
     exit_code = 0
 
+    suite_specs: list[TestSuiteSpec] = []
     for suite_file in suite_files:
         try:
-            suite_spec = load_and_validate(suite_file, TestSuiteSpec)
+            suite_specs.append(load_and_validate(suite_file, TestSuiteSpec))
         except Exception as e:
             console.print(f"[red]套件加载失败 ({suite_file}): {e}[/red]")
             exit_code = 2
-            continue
-
-        console.print(f"\n[bold]运行套件: {suite_spec.suite.name}[/bold]")
-        console.print(f"  目标: {suite_spec.suite.target}  用例数: {len(suite_spec.cases)}")
 
-        engine = TestEngine(config)
-        suite_result = asyncio.run(engine.run_suite(suite_spec))
+    # 分片：每个进程按同一个确定性划分只执行自己的一片
+    shard_suffix = ""
+    if shard is not None:
+        shard_index, shard_count = shard
+        shard_suffix = f".shard{shard_index}-{shard_count}"
+        try:
+            weights = case_durations(shard_weights) if shard_weights else None
+        except Exception as e:
+            console.print(f"[red]分片权重文件读取失败: {e}[/red]")
+            sys.exit(2)
+        for i, spec in enumerate(suite_specs):
+            suite_specs[i] = spec.model_copy(
+                update={"cases": shard_cases(spec.cases, shard_index, shard_count, weights)}
+            )
+
+    # 续跑：沿用上次已完成的用例结果，只执行缺失或出错的用例
+    carried: list[dict[str, CaseResult]] = [{} for _ in suite_specs]
+    if resume_paths:
+        previous: dict[str, dict[str, CaseResult]] = {}
+        for resume_path in resume_paths:
+            try:
+                suite_name, completed = read_completed_results(resume_path)
+            except Exception as e:
+                console.print(f"[red]续跑结果文件读取失败 ({resume_path}): {e}[/red]")
+                sys.exit(2)
+            previous.setdefault(suite_name, {}).update(completed)
+        for i, spec in enumerate(suite_specs):
+            completed = previous.pop(spec.suite.name, {})
+            carried[i] = {
+                case.id: completed[case.id] for case in spec.cases if case.id in completed
+            }
+            suite_specs[i] = spec.model_copy(
+                update={"cases": [case for case in spec.cases if case.id not in carried[i]]}
+            )
+        for suite_name in previous:
+            console.print(
+                f"[yellow]续跑文件中的套件 '{suite_name}' 不在本次运行中，已忽略[/yellow]"
+            )
+
+    # 增量运行：指纹未变化的用例复用缓存结果
+    result_cache = None
+    fingerprints: list[dict[str, str]] = [{} for _ in suite_specs]
+    reused = [0] * len(suite_specs)
+    if incremental or config.result_cache.enabled:
+        cache_config = config.result_cache
+        if prompt_version is None:
+            prompt_version = cache_config.prompt_version
+        result_cache = ResultCache(
+            SQLiteCache(
+                cache_config.path,
+                max_entries=cache_config.max_entries,
+                max_age_days=cache_config.max_age_days,
+            ),
+            prompt_version=prompt_version,
+            judge=config.judge,
+            batch_judge=config.execution.batch_judge,
+        )
+        for i, spec in enumerate(suite_specs):
+            target_config = config.targets.get(spec.suite.target)
+            if target_config is None:
+                continue
+            for case in spec.cases:
+                fingerprint = result_cache.fingerprint(
+                    case, spec.suite.shared_inputs, target_config
+                )
+                fingerprints[i][case.id] = fingerprint
+                cached = result_cache.get(fingerprint)
+                if cached is not None:
+                    carried[i][case.id] = cached
+                    reused[i] += 1
+            suite_specs[i] = spec.model_copy(
+                update={"cases": [case for case in spec.cases if case.id not in carried[i]]}
+            )
+
+    for suite_spec, done, cached in zip(suite_specs, carried, reused):
+        notes = []
+        if len(done) > cached:
+            notes.append(f"续跑跳过 {len(done) - cached} 个已完成")
+        if cached:
+            notes.append(f"复用 {cached} 个未变化用例")
+        skipped = f"（{'，'.join(notes)}）" if notes else ""
+        console.print(
+            f"[bold]运行套件: {suite_spec.suite.name}[/bold]"
+            f"  目标: {suite_spec.suite.target}  用例数: {len(suite_spec.cases)}{skipped}"
+        )
+
+    # 每个用例完成即写入 JSONL 结果文件，并加入流式评分
+    suite_scorer = SuiteScorer(Scorer(config.scoring))
+    sinks = [
+        JSONLResultSink(
+            report_file_path(report_dir, spec.suite.name, f"{shard_suffix}.jsonl"),
+            spec.suite.name,
+            spec.suite.target,
+        )
+        for spec in suite_specs
+    ]
+    aggregators = [
+        suite_scorer.aggregator(spec.suite.name, spec.suite.budgets) for spec in suite_specs
+    ]
+    # 沿用的结果先写入新的结果文件，最终报告包含全部用例
+    for sink, aggregator, done in zip(sinks, aggregators, carried):
+        for case_result in done.values():
+            sink.write(case_result)
+            aggregator.add(case_result)
+
+    # 结果缓存在事件循环之外写入，运行结束前等待全部写完
+    cache_writes: set[asyncio.Task] = set()
+
+    def _on_result(index: int, case_result: CaseResult) -> None:
+        sinks[index].write(case_result)
+        aggregators[index].add(case_result)
+        fingerprint = fingerprints[index].get(case_result.case_id)
+        if result_cache is not None and fingerprint is not None:
+            task = asyncio.create_task(result_cache.aput(fingerprint, case_result))
+            cache_writes.add(task)
+            task.add_done_callback(cache_writes.discard)
+
+    # 所有套件在同一个事件循环中由同一个引擎并发执行，共享并发、限流与连接池
+    async def _run_suites():
+        async with TestEngine(config, cassette=cassette) as engine:
+            suite_results = await engine.run_suites(suite_specs, on_result=_on_result)
+        if cache_writes:
+            await asyncio.gather(*cache_writes)
+        return suite_results
 
-        # 评分
-        scorer = Scorer(config.scoring)
-        suite_scorer = SuiteScorer(scorer)
-        suite_score = suite_scorer.score_suite(suite_result)
+    try:
+        suite_results = asyncio.run(_run_suites()) if suite_specs else []
+    except KeyboardInterrupt:
+        # 进行中的用例已被取消；已完成的用例均已完整写入结果文件
+        console.print("[yellow]运行已中断[/yellow]")
+        for sink in sinks:
+            sink.close(stats={"interrupted": True})
+            console.print(f"  已保存 {sink.written} 个用例结果: {sink.path}")
+        resume_args = " ".join(f"--resume {sink.path}" for sink in sinks)
+        console.print(f"  使用 {resume_args} 续跑")
+        if cassette is not None:
+            cassette.close()
+        if result_cache is not None:
+            result_cache.close()
+        sys.exit(130)
+
+    for suite_result, sink, aggregator in zip(suite_results, sinks, aggregators):
+        sink.close(stats=suite_result.stats)
+        suite_score = aggregator.finish()
 
         # 输出结果摘要
         _print_summary(suite_score)
 
-        # 生成报告
+        # 生成报告（由 JSONL 结果文件逐行生成）
+        console.print(f"  结果: {sink.path}")
         if "json" in config.report.formats:
-            report_path = generate_json_report(suite_result, suite_score, output_dir=report_dir)
+            report_path = generate_json_report_from_jsonl(sink.path, suite_score)
             console.print(f"  报告: {report_path}")
 
         # 判定退出码
@@ -85,10 +292,156 @@ def run(ctx, suite_files: tuple[str, ...], fail_threshold: float, output_dir: st
             exit_code = 1
         if suite_score.passed_cases < suite_score.total_cases:
             exit_code = max(exit_code, 1)
+        if not suite_score.budgets_passed:
+            exit_code = max(exit_code, 1)
+
+    if result_cache is not None:
+        stats = result_cache.stats()
+        console.print(f"  结果缓存: 命中 {stats['hits']}，未命中 {stats['misses']}")
+        result_cache.close()
+
+    if cassette is not None:
+        cassette.close()
+        if cassette.mode == "record":
+            console.print(f"  已录制 {cassette.recorded} 个响应: {cassette.path}")
+
+    sys.exit(exit_code)
+
+
+@cli.command()
+@click.argument("result_files", nargs=-1, required=True)
+@click.option("--fail-threshold", default=0.0, type=float, help="最低通过评分")
+@click.option("--output-dir", default=None, help="报告输出目录")
+@click.option(
+    "--suite",
+    "suite_files",
+    multiple=True,
+    help="套件 YAML 文件，按套件名检查其分位数预算（可多次指定）",
+)
+@click.pass_context
+def merge(
+    ctx,
+    result_files: tuple[str, ...],
+    fail_threshold: float,
+    output_dir: str | None,
+    suite_files: tuple[str, ...],
+):
+    """合并分片运行的 JSONL 结果文件，生成每个套件的汇总结果与报告"""
+    try:
+        config = load_config(ctx.obj["config_path"])
+    except Exception as e:
+        console.print(f"[red]配置加载失败: {e}[/red]")
+        sys.exit(2)
+
+    budgets = {}
+    for suite_file in suite_files:
+        try:
+            spec = load_and_validate(suite_file, TestSuiteSpec)
+        except Exception as e:
+            console.print(f"[red]加载失败 {suite_file}: {e}[/red]")
+            sys.exit(2)
+        budgets[spec.suite.name] = spec.suite.budgets
+
+    report_dir = output_dir or config.report.output_dir
+    suite_scorer = SuiteScorer(Scorer(config.scoring))
+    try:
+        merged = merge_result_logs(result_files, report_dir, suite_scorer, budgets)
+    except Exception as e:
+        console.print(f"[red]结果文件合并失败: {e}[/red]")
+        sys.exit(2)
+
+    exit_code = 0
+    for jsonl_path, suite_score in merged:
+        _print_summary(suite_score)
+        console.print(f"  结果: {jsonl_path}")
+        if "json" in config.report.formats:
+            report_path = generate_json_report_from_jsonl(jsonl_path, suite_score)
+            console.print(f"  报告: {report_path}")
+        if suite_score.avg_overall_score < fail_threshold:
+            exit_code = 1
+        if suite_score.passed_cases < suite_score.total_cases:
+            exit_code = max(exit_code, 1)
+        if not suite_score.budgets_passed:
+            exit_code = max(exit_code, 1)
 
     sys.exit(exit_code)
 
 
+@cli.command()
+@click.argument("suite_file")
+@click.option("--rps", required=True, type=float, help="平均到达速率（会话 / 秒）")
+@click.option("--duration", required=True, type=float, help="发压时长（秒）")
+@click.option(
+    "--arrival",
+    type=click.Choice(["poisson", "constant"]),
+    default="poisson",
+    help="到达过程 [默认: poisson]",
+)
+@click.option("--window", default=1.0, type=float, help="统计时间窗口（秒）")
+@click.option(
+    "--max-in-flight", default=1000, type=int, help="进行中会话上限（超出的到达计为丢弃）"
+)
+@click.option("--seed", default=None, type=int, help="poisson 到达的随机种子")
+@click.option("--output-dir", default=None, help="报告输出目录")
+@click.pass_context
+def load(
+    ctx,
+    suite_file: str,
+    rps: float,
+    duration: float,
+    arrival: str,
+    window: float,
+    max_in_flight: int,
+    seed: int | None,
+    output_dir: str | None,
+):
+    """以开环方式对目标压测（复用套件用例作为请求组合）"""
+    try:
+        config = load_config(ctx.obj["config_path"])
+        suite_spec = load_and_validate(suite_file, TestSuiteSpec)
+    except Exception as e:
+        console.print(f"[red]加载失败: {e}[/red]")
+        sys.exit(2)
+
+    target_config = config.targets.get(suite_spec.suite.target)
+    if target_config is None:
+        console.print(f"[red]目标 '{suite_spec.suite.target}' 未在配置中定义[/red]")
+        sys.exit(2)
+
+    async def _load():
+        # 压测不经过客户端限流、目标并发池、重试预算与熔断器
+        pool = ClientPool(
+            config.http, config.retry, ExecutionConfig(rate_limit_rpm=0), retry_guards=False
+        )
+        try:
+            runner = LoadRunner(
+                pool.dify_client(load_target(target_config)),
+                rps=rps,
+                duration_s=duration,
+                arrival=arrival,
+                window_s=window,
+                max_in_flight=max_in_flight,
+                seed=seed,
+            )
+            return await runner.run(suite_spec)
+        finally:
+            await pool.close()
+
+    console.print(
+        f"[bold]压测套件: {suite_spec.suite.name}[/bold]"
+        f"  目标: {suite_spec.suite.target}  {rps:g} rps × {duration:g}s ({arrival})"
+    )
+    try:
+        result = asyncio.run(_load())
+    except SandboxError as e:
+        console.print(f"[red]{e}[/red]")
+        sys.exit(2)
+
+    _print_load_summary(result)
+    report_path = generate_load_report(result, output_dir=output_dir or config.report.output_dir)
+    console.print(f"  报告: {report_path}")
+
+
 @cli.command()
 @click.argument("suite_files", nargs=-1, required=True)
 def validate(suite_files: tuple[str, ...]):
@@ -167,6 +520,41 @@ def learn(ctx, input_files: tuple[str, ...], output_dir: str):
     console.print("[bold]完成[/bold]")
 
 
+def _print_load_summary(result):
+    """打印压测摘要与各时间窗口"""
+    summary = load_summary(result)
+    latency = summary["latency_ms"]
+    table = Table(title=f"压测: {result.suite_name}")
+    table.add_column("指标")
+    table.add_column("值", justify="right")
+    table.add_row(
+        "发出 / 成功 / 失败 / 丢弃",
+        f"{result.sent}/{result.completed}/{result.errors}/{result.dropped}",
+    )
+    table.add_row("错误率", f"{result.error_rate:.2%}")
+    table.add_row("实际吞吐", f"{result.throughput:.2f} rps")
+    for key in ("p50", "p90", "p99", "p99.9", "max"):
+        if key in latency:
+            table.add_row(f"时延 {key}", f"{latency[key]:.0f}ms")
+    console.print(table)
+
+    windows = Table(title="时间窗口")
+    for column in ("开始(s)", "发出", "成功", "失败", "吞吐(rps)", "p50(ms)", "p99(ms)"):
+        windows.add_column(column, justify="right")
+    for index in sorted(result.windows):
+        row = window_summary(result.windows[index], result.window_s)
+        windows.add_row(
+            f"{row['start_s']:g}",
+            str(row["sent"]),
+            str(row["completed"]),
+            str(row["errors"]),
+            f"{row['throughput_rps']:.2f}",
+            f"{row['latency_ms'].get('p50', 0):.0f}",
+            f"{row['latency_ms'].get('p99', 0):.0f}",
+        )
+    console.print(windows)
+
+
 def _print_summary(suite_score):
     """打印评分摘要表格"""
     table = Table(title=f"结果: {suite_score.suite_name}")
@@ -180,6 +568,26 @@ def _print_summary(suite_score):
     for dim, avg in suite_score.dimension_averages.items():
         table.add_row(f"  {dim}", f"{avg:.2f}")
 
+    for metric in ("latency_ms", "ttft_ms"):
+        stats = suite_score.latency_percentiles.get(metric)
+        if stats:
+            table.add_row(
+                metric,
+                f"p50 {stats['p50']:.0f}  p95 {stats['p95']:.0f}  p99 {stats['p99']:.0f}",
+            )
+
+    # 工作流中 p95 耗时最长的节点
+    slowest = sorted(suite_score.node_latency.items(), key=lambda item: -item[1]["p95"])[:3]
+    for node, stats in slowest:
+        table.add_row(f"  节点 {node}", f"p50 {stats['p50']:.0f}  p95 {stats['p95']:.0f}")
+
+    if suite_score.token_totals.get("total_tokens"):
+        table.add_row("Token 总量", str(suite_score.token_totals["total_tokens"]))
+
+    for result in suite_score.budget_results:
+        status = "[green]通过[/green]" if result.passed else "[red]未通过[/red]"
+        table.add_row("预算", f"{status} {result.message}")
+
     console.print(table)
 
 
@@ -1,14 +1,23 @@
 """共享 HTTP 客户端基类"""
 
 import asyncio
+import importlib.util
+import time
+from collections.abc import Callable
 
 import httpx
 
+from sandbox.client.retry import RetryOptions, is_retryable_status, parse_retry_after
 from sandbox.core.exceptions import DifyAPIError
 from sandbox.core.logging import get_logger
+from sandbox.schema.config import HTTPConfig, RetryConfig
+from sandbox.utils.rate_limiter import EndpointRateLimiter
 
 logger = get_logger(__name__)
 
+# 请求观察者：(单次尝试耗时 ms, HTTP 状态码；网络异常时为 None)
+ResponseObserver = Callable[[float, int | None], None]
+
 
 class BaseHTTPClient:
     """带重试逻辑的异步 HTTP 客户端基类"""
@@ -19,45 +28,162 @@ class BaseHTTPClient:
         api_key: str,
         timeout: float = 30.0,
         max_retries: int = 2,
+        http_config: HTTPConfig | None = None,
+        retry: RetryOptions | None = None,
+        rate_limiter: EndpointRateLimiter | None = None,
     ):
+        http_config = http_config or HTTPConfig()
+        http2 = http_config.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("未安装 h2，已回退到 HTTP/1.1（pip install 'httpx[http2]'）")
+            http2 = False
+
         self._client = httpx.AsyncClient(
             base_url=base_url,
             headers={"Authorization": f"Bearer {api_key}"},
             timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=http_config.max_connections,
+                max_keepalive_connections=http_config.max_keepalive_connections,
+                keepalive_expiry=http_config.keepalive_expiry,
+            ),
+            http2=http2,
         )
         self._max_retries = max_retries
+        self._retry = retry or RetryOptions.from_config(RetryConfig())
+        self._rate_limiter = rate_limiter
+        self.observers: list[ResponseObserver] = []
 
     async def _request_with_retry(
         self,
         method: str,
         path: str,
         **kwargs,
-    ) -> dict:
-        """带指数退避的请求重试"""
+    ) -> tuple[dict, float]:
+        """带指数退避的请求重试，返回 (JSON 响应体, TPM 预约)"""
+        resp, reserved = await self._send_with_retry(method, path, **kwargs)
+        return resp.json(), reserved
+
+    async def _send_with_retry(
+        self,
+        method: str,
+        path: str,
+        *,
+        stream: bool = False,
+        attempt_timeout: float | None = None,
+        on_attempt: Callable[[], None] | None = None,
+        **kwargs,
+    ) -> tuple[httpx.Response, float]:
+        """
+        按重试策略发送请求，返回 (状态码正常的响应, 成功那次尝试的 TPM 预约)
+
+        - 408 / 429 / 5xx 和网络异常可重试，其余 4xx 直接失败
+        - 优先遵循 Retry-After（不超过 max_retry_after），受整体重试预算约束
+        - 熔断器打开时直接抛出 DifyAPIError
+        - 每次尝试前获取端点限流令牌；失败尝试的 TPM 预约立即归还，
+          成功尝试的预约由调用方传给 _record_usage 按实际用量校正
+
+        stream=True 时不读取响应体（用于 SSE），调用方负责 aclose()。
+        重试只发生在拿到响应头之前，已开始消费的流不会重试。
+
+        attempt_timeout 限制单次尝试等待响应头的时间，超时抛出 TimeoutError 且不重试；
+        on_attempt 在每次尝试发出前（限流等待之后）调用。两者都不包含限流与退避等待。
+        """
+        budget = self._retry.budget
+        breaker = self._retry.breaker
+        if budget is not None:
+            budget.record_request()
+
+        delay = 0.0
         for attempt in range(self._max_retries + 1):
+            # 先等限流再占用熔断器的探测名额，等待期间被取消不会占住半开状态
+            reserved = 0.0
+            if self._rate_limiter is not None:
+                reserved = await self._rate_limiter.acquire()
+            if breaker is not None:
+                try:
+                    breaker.before_request()
+                except DifyAPIError:
+                    self._release(reserved)
+                    raise
+
+            retry_after: float | None = None
             try:
-                resp = await self._client.request(method, path, **kwargs)
-                resp.raise_for_status()
-                return resp.json()
-            except httpx.HTTPStatusError as e:
-                status = e.response.status_code
-                body = e.response.text
-                if attempt == self._max_retries or status < 500:
-                    raise DifyAPIError(
-                        f"HTTP {status}: {body}",
-                        status_code=status,
-                        response_body=body,
-                    ) from e
-                wait = 2**attempt
-                logger.warning(f"请求失败 (HTTP {status})，{wait}s 后重试 ({attempt + 1}/{self._max_retries})")
-                await asyncio.sleep(wait)
-            except httpx.RequestError as e:
-                if attempt == self._max_retries:
-                    raise DifyAPIError(f"请求异常: {e}") from e
-                wait = 2**attempt
-                logger.warning(f"请求异常: {e}，{wait}s 后重试 ({attempt + 1}/{self._max_retries})")
-                await asyncio.sleep(wait)
+                if on_attempt is not None:
+                    on_attempt()
+                attempt_start = time.monotonic()
+                try:
+                    request = self._client.build_request(method, path, **kwargs)
+                    async with asyncio.timeout(attempt_timeout):
+                        resp = await self._client.send(request, stream=stream)
+                    self._notify(attempt_start, resp.status_code)
+                    if resp.is_error:
+                        await resp.aread()
+                        await resp.aclose()
+                    resp.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    status = e.response.status_code
+                    body = e.response.text
+                    # 4xx 说明服务本身可用，只有 5xx 计入熔断
+                    if breaker is not None and status >= 500:
+                        breaker.record_failure()
+                    elif breaker is not None:
+                        breaker.record_success()
+                    error = DifyAPIError(
+                        f"HTTP {status}: {body}", status_code=status, response_body=body
+                    )
+                    error.__cause__ = e
+                    if not is_retryable_status(status):
+                        raise error
+                    retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                    reason = f"请求失败 (HTTP {status})"
+                except httpx.RequestError as e:
+                    self._notify(attempt_start, None)
+                    if breaker is not None:
+                        breaker.record_failure()
+                    error = DifyAPIError(f"请求异常: {e}")
+                    error.__cause__ = e
+                    reason = f"请求异常: {e}"
+                else:
+                    if breaker is not None:
+                        breaker.record_success()
+                    return resp, reserved
+            except BaseException:
+                # 被取消、超过调用方的截止时间或其他意外异常：不代表服务故障，
+                # 释放探测名额（已记录成功 / 失败时为空操作），避免熔断器停留在半开状态
+                if breaker is not None:
+                    breaker.release_probe()
+                self._release(reserved)
+                raise
+
+            self._release(reserved)
+            if attempt == self._max_retries:
+                raise error
+            if budget is not None and not budget.try_acquire():
+                logger.warning(f"{reason}，重试预算已耗尽，不再重试")
+                raise error
+
+            delay = self._retry.policy.next_delay(attempt, delay)
+            if retry_after is not None and self._retry.respect_retry_after:
+                # Retry-After 不超过重试策略的最大等待时间
+                delay = max(delay, min(retry_after, self._retry.max_retry_after))
+            logger.warning(f"{reason}，{delay:.1f}s 后重试 ({attempt + 1}/{self._max_retries})")
+            await asyncio.sleep(delay)
         raise DifyAPIError("重试次数耗尽")  # pragma: no cover
 
+    def _record_usage(self, usage: dict | None, reserved: float = 0.0) -> None:
+        """按响应中的 token 用量扣减端点 TPM 预算（reserved 为该请求的 TPM 预约）"""
+        if self._rate_limiter is not None and usage:
+            self._rate_limiter.record_usage(int(usage.get("total_tokens") or 0), reserved)
+
+    def _release(self, reserved: float) -> None:
+        if self._rate_limiter is not None:
+            self._rate_limiter.release(reserved)
+
+    def _notify(self, attempt_start: float, status_code: int | None) -> None:
+        latency_ms = (time.monotonic() - attempt_start) * 1000
+        for observer in self.observers:
+            observer(latency_ms, status_code)
+
     async def close(self) -> None:
         await self._client.aclose()
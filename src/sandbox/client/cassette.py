@@ -0,0 +1,104 @@
+"""Dify 响应录制 / 回放（cassette）
+
+- record：把每次 send_message 的请求与响应（含 conversation_id 链、实测延迟、
+  流式指标）逐行写入 JSONL 文件
+- replay：完全不访问网络，按 套件/用例/轮次 + 请求哈希 从文件中取回响应
+
+请求哈希不包含 conversation_id（每次实际运行都会变化），
+回放时 conversation_id 由录制的响应提供，链式关系保持一致。
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Literal
+
+from sandbox.core.exceptions import DifyAPIError
+from sandbox.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 当前执行中的 (套件名, 用例 ID)，由执行引擎在每个用例任务内设置
+cassette_scope: ContextVar[tuple[str, str]] = ContextVar("cassette_scope", default=("", ""))
+
+
+def request_hash(payload: dict) -> str:
+    """Dify 请求内容的短哈希（忽略 conversation_id）"""
+    content = {k: v for k, v in payload.items() if k != "conversation_id"}
+    canonical = json.dumps(content, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class Cassette:
+    """录制 / 回放文件（JSONL，每行一个请求-响应对）"""
+
+    def __init__(self, path: str | Path, mode: Literal["record", "replay"]):
+        self.path = Path(path)
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._entries: dict[str, dict] = {}
+        # 每个 (套件, 用例) 已发送的请求数，即下一个请求的轮次
+        self._turns: dict[tuple[str, str], int] = defaultdict(int)
+
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("w", encoding="utf-8")
+        else:
+            self._file = None
+            if not self.path.exists():
+                raise DifyAPIError(f"回放文件不存在: {self.path}")
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+            logger.info(f"已加载回放文件 {self.path}（{len(self._entries)} 条）")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def next_key(self, payload: dict) -> str:
+        """为当前用例的下一个请求生成键：套件/用例/轮次/请求哈希"""
+        scope = cassette_scope.get()
+        turn = self._turns[scope]
+        self._turns[scope] += 1
+        suite, case = scope
+        return f"{suite}/{case}/{turn}/{request_hash(payload)}"
+
+    def lookup(self, key: str) -> dict:
+        """回放：取回录制的响应字段，找不到时抛出 DifyAPIError"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            raise DifyAPIError(f"回放文件中没有匹配的请求: {key}")
+        self.hits += 1
+        return entry["response"]
+
+    def record(self, key: str, payload: dict, response: dict) -> None:
+        """录制：追加一条请求-响应对（立即落盘，中断的运行也可回放已完成部分）"""
+        entry = {
+            "key": key,
+            "request": {
+                "query": payload.get("query", ""),
+                "conversation_id": payload.get("conversation_id", ""),
+            },
+            "response": response,
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.recorded += 1
+
+    def stats(self) -> dict:
+        if self.replaying:
+            return {"mode": self.mode, "hits": self.hits, "misses": self.misses}
+        return {"mode": self.mode, "recorded": self.recorded}
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
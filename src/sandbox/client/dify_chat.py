@@ -1,10 +1,27 @@
 """Dify Chatflow API 客户端"""
 
+import asyncio
+import json
 import time
-from dataclasses import dataclass
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager, aclosing, nullcontext
+from dataclasses import dataclass, field
+
+import httpx
 
 from sandbox.client.base import BaseHTTPClient
-from sandbox.schema.config import TargetConfig
+from sandbox.client.cassette import Cassette
+from sandbox.client.retry import RetryOptions
+from sandbox.client.sse import iter_sse_events
+from sandbox.core.exceptions import DifyAPIError
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import HTTPConfig, TargetConfig
+from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+logger = get_logger(__name__)
+
+# 流式分片回调：(目前的完整回答, 已耗时 ms) -> 是否中止请求
+ChunkCallback = Callable[[str, float], bool]
 
 
 @dataclass
@@ -19,6 +36,62 @@ class DifyResponse:
     token_usage: dict | None
     status: str  # "success" | "error"
     error_message: str | None = None
+    # 流式模式指标（blocking 模式下为空）
+    ttft_ms: float | None = None
+    chunk_gaps_ms: list[float] = field(default_factory=list)
+    output_tokens_per_sec: float | None = None
+    # 流式提前中止原因："assertion"（断言已确定失败）| "deadline"（超过延迟上限）
+    abort_reason: str | None = None
+
+    @property
+    def aborted(self) -> bool:
+        return self.abort_reason is not None
+
+    @property
+    def max_chunk_gap_ms(self) -> float | None:
+        return max(self.chunk_gaps_ms) if self.chunk_gaps_ms else None
+
+    @property
+    def mean_chunk_gap_ms(self) -> float | None:
+        if not self.chunk_gaps_ms:
+            return None
+        return sum(self.chunk_gaps_ms) / len(self.chunk_gaps_ms)
+
+    def to_record(self) -> dict:
+        """录制用的紧凑表示（raw_data 只保留 metadata）"""
+        return {
+            "answer": self.answer,
+            "conversation_id": self.conversation_id,
+            "message_id": self.message_id,
+            "metadata": self.raw_data.get("metadata") or {},
+            "latency_ms": round(self.latency_ms, 3),
+            "token_usage": self.token_usage,
+            "ttft_ms": self.ttft_ms,
+            "chunk_gaps_ms": [round(gap, 3) for gap in self.chunk_gaps_ms],
+            "output_tokens_per_sec": self.output_tokens_per_sec,
+            "abort_reason": self.abort_reason,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "DifyResponse":
+        return cls(
+            answer=record["answer"],
+            conversation_id=record["conversation_id"],
+            message_id=record["message_id"],
+            raw_data={
+                "answer": record["answer"],
+                "conversation_id": record["conversation_id"],
+                "message_id": record["message_id"],
+                "metadata": record.get("metadata") or {},
+            },
+            latency_ms=record["latency_ms"],
+            token_usage=record.get("token_usage"),
+            status="success",
+            ttft_ms=record.get("ttft_ms"),
+            chunk_gaps_ms=record.get("chunk_gaps_ms") or [],
+            output_tokens_per_sec=record.get("output_tokens_per_sec"),
+            abort_reason=record.get("abort_reason"),
+        )
 
 
 class DifyChatClient(BaseHTTPClient):
@@ -27,19 +100,35 @@ class DifyChatClient(BaseHTTPClient):
 
     支持：
     - 多轮对话（conversation_id 自动追踪）
-    - blocking 模式
-    - 延迟和 Token 用量测量
+    - blocking / streaming 模式
+    - 延迟和 Token 用量测量（streaming 额外测量首字延迟、分片间隔、输出速率）
+    - streaming 模式下按分片回调 / 截止时间提前中止请求
     - 指数退避重试
+    - 录制 / 回放（cassette）：回放模式下不访问网络
+    - 目标并发名额（slots）：只在请求 Dify 期间占用，断言评估不占用
     """
 
-    def __init__(self, config: TargetConfig):
+    def __init__(
+        self,
+        config: TargetConfig,
+        http_config: HTTPConfig | None = None,
+        retry: RetryOptions | None = None,
+        rate_limiter: EndpointRateLimiter | None = None,
+        cassette: Cassette | None = None,
+        slots: AbstractAsyncContextManager | None = None,
+    ):
         super().__init__(
             base_url=config.api_base,
             api_key=config.api_key,
             timeout=config.timeout,
             max_retries=config.max_retries,
+            http_config=http_config,
+            retry=retry,
+            rate_limiter=rate_limiter,
         )
         self.config = config
+        self.cassette = cassette
+        self.slots = slots or nullcontext()
 
     async def send_message(
         self,
@@ -48,6 +137,8 @@ class DifyChatClient(BaseHTTPClient):
         conversation_id: str = "",
         user: str = "sandbox_test",
         inputs: dict | None = None,
+        on_chunk: ChunkCallback | None = None,
+        deadline_ms: float | None = None,
     ) -> DifyResponse:
         """
         发送消息到 Dify Chatflow API
@@ -57,6 +148,8 @@ class DifyChatClient(BaseHTTPClient):
             conversation_id: 对话ID，首轮传空字符串
             user: 用户标识
             inputs: Dify 应用输入变量
+            on_chunk: 仅 streaming 模式，每个分片后回调，返回 True 时中止请求
+            deadline_ms: 仅 streaming 模式，超过该耗时即中止请求
         """
         payload: dict = {
             "inputs": inputs or {},
@@ -67,9 +160,33 @@ class DifyChatClient(BaseHTTPClient):
         if conversation_id:
             payload["conversation_id"] = conversation_id
 
+        if self.cassette is None:
+            return await self._send(payload, on_chunk, deadline_ms)
+
+        key = self.cassette.next_key(payload)
+        if self.cassette.replaying:
+            return DifyResponse.from_record(self.cassette.lookup(key))
+        response = await self._send(payload, on_chunk, deadline_ms)
+        self.cassette.record(key, payload, response.to_record())
+        return response
+
+    async def _send(
+        self,
+        payload: dict,
+        on_chunk: ChunkCallback | None = None,
+        deadline_ms: float | None = None,
+    ) -> DifyResponse:
+        async with self.slots:
+            if self.config.response_mode == "streaming":
+                return await self._send_streaming(payload, on_chunk, deadline_ms)
+            return await self._send_blocking(payload)
+
+    async def _send_blocking(self, payload: dict) -> DifyResponse:
+
         start_time = time.monotonic()
-        response = await self._request_with_retry("POST", "/chat-messages", json=payload)
+        response, reserved = await self._request_with_retry("POST", "/chat-messages", json=payload)
         latency_ms = (time.monotonic() - start_time) * 1000
+        self._record_usage(response.get("metadata", {}).get("usage"), reserved)
 
         return DifyResponse(
             answer=response["answer"],
@@ -80,3 +197,122 @@ class DifyChatClient(BaseHTTPClient):
             token_usage=response.get("metadata", {}).get("usage"),
             status="success",
         )
+
+    async def _send_streaming(
+        self,
+        payload: dict,
+        on_chunk: ChunkCallback | None = None,
+        deadline_ms: float | None = None,
+    ) -> DifyResponse:
+        """以 SSE 方式发送消息，逐事件拼接回答并记录时间指标"""
+        start_time = time.monotonic()
+        loop = asyncio.get_running_loop()
+        # 截止时间只约束当前这次尝试（发出请求与读取流），不含限流等待与重试退避
+        attempt_timeout = deadline_ms / 1000 if deadline_ms is not None else None
+        deadline: float | None = None
+
+        def _start_attempt() -> None:
+            nonlocal deadline
+            if attempt_timeout is not None:
+                deadline = loop.time() + attempt_timeout
+
+        answer = ""
+        chunk_times: list[float] = []
+        conversation_id = ""
+        message_id = ""
+        task_id = ""
+        metadata: dict = {}
+        abort_reason: str | None = None
+        reserved = 0.0
+        try:
+            resp, reserved = await self._send_with_retry(
+                "POST",
+                "/chat-messages",
+                stream=True,
+                attempt_timeout=attempt_timeout,
+                on_attempt=_start_attempt,
+                json=payload,
+            )
+            try:
+                async with asyncio.timeout_at(deadline):
+                    async with aclosing(iter_sse_events(resp)) as events:
+                        async for event in events:
+                            event_type = event.get("event")
+                            conversation_id = event.get("conversation_id") or conversation_id
+                            message_id = event.get("message_id") or message_id
+                            task_id = event.get("task_id") or task_id
+
+                            if event_type in ("message", "agent_message", "message_replace"):
+                                chunk = event.get("answer", "")
+                                if event_type == "message_replace":
+                                    # 内容审查替换了整段回答
+                                    answer = chunk
+                                elif chunk:
+                                    answer += chunk
+                                    chunk_times.append(time.monotonic())
+                                else:
+                                    continue
+                                elapsed_ms = (time.monotonic() - start_time) * 1000
+                                if on_chunk is not None and on_chunk(answer, elapsed_ms):
+                                    abort_reason = "assertion"
+                                    break
+                            elif event_type == "message_end":
+                                metadata = event.get("metadata") or {}
+                            elif event_type == "error":
+                                raise DifyAPIError(
+                                    f"流式响应错误: {event.get('message', '')}",
+                                    status_code=event.get("status"),
+                                    response_body=json.dumps(event, ensure_ascii=False),
+                                )
+            except httpx.RequestError as e:
+                raise DifyAPIError(f"流式响应中断: {e}") from e
+            finally:
+                await resp.aclose()
+        except TimeoutError:
+            abort_reason = "deadline"
+
+        end_time = time.monotonic()
+        if abort_reason is not None:
+            logger.debug(f"流式请求提前中止 ({abort_reason})")
+            if task_id:
+                await self._stop_task(task_id, payload["user"])
+
+        usage = metadata.get("usage")
+        self._record_usage(usage, reserved)
+
+        ttft_ms = (chunk_times[0] - start_time) * 1000 if chunk_times else None
+        chunk_gaps_ms = [(b - a) * 1000 for a, b in zip(chunk_times, chunk_times[1:])]
+        output_tokens_per_sec = None
+        if usage and usage.get("completion_tokens") and chunk_times:
+            generation_sec = end_time - chunk_times[0]
+            if generation_sec > 0:
+                output_tokens_per_sec = usage["completion_tokens"] / generation_sec
+
+        return DifyResponse(
+            answer=answer,
+            conversation_id=conversation_id,
+            message_id=message_id,
+            raw_data={
+                "answer": answer,
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "metadata": metadata,
+            },
+            latency_ms=(end_time - start_time) * 1000,
+            token_usage=usage,
+            status="success",
+            ttft_ms=ttft_ms,
+            chunk_gaps_ms=chunk_gaps_ms,
+            output_tokens_per_sec=output_tokens_per_sec,
+            abort_reason=abort_reason,
+        )
+
+    async def _stop_task(self, task_id: str, user: str) -> None:
+        """通知 Dify 停止生成（尽力而为，失败不影响结果；与其他请求共用端点限流）"""
+        try:
+            if self._rate_limiter is not None:
+                # 停止请求不消耗 Token，只占用 RPM
+                self._rate_limiter.release(await self._rate_limiter.acquire())
+            await self._client.post(f"/chat-messages/{task_id}/stop", json={"user": user})
+        except httpx.HTTPError as e:
+            logger.debug(f"停止 Dify 任务 {task_id} 失败: {e}")
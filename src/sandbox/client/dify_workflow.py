@@ -0,0 +1,245 @@
+"""Dify Workflow API 客户端"""
+
+import json
+import time
+from contextlib import AbstractAsyncContextManager, aclosing, nullcontext
+from dataclasses import asdict, dataclass, field
+
+import httpx
+
+from sandbox.client.base import BaseHTTPClient
+from sandbox.client.cassette import Cassette
+from sandbox.client.retry import RetryOptions
+from sandbox.client.sse import iter_sse_events
+from sandbox.core.exceptions import DifyAPIError
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import HTTPConfig, TargetConfig
+from sandbox.schema.result import NodeTiming
+from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class WorkflowResponse:
+    """Dify 工作流执行结果的结构化封装"""
+
+    outputs: dict
+    workflow_run_id: str
+    # "succeeded" | "failed" | "stopped"
+    status: str
+    raw_data: dict
+    latency_ms: float
+    token_usage: dict | None
+    # Dify 上报的工作流执行耗时
+    elapsed_ms: float | None = None
+    error_message: str | None = None
+    # 流式模式指标（blocking 模式下为空）
+    ttft_ms: float | None = None
+    nodes: list[NodeTiming] = field(default_factory=list)
+
+    def to_record(self) -> dict:
+        """录制用的紧凑表示"""
+        return {
+            "outputs": self.outputs,
+            "workflow_run_id": self.workflow_run_id,
+            "status": self.status,
+            "latency_ms": round(self.latency_ms, 3),
+            "token_usage": self.token_usage,
+            "elapsed_ms": self.elapsed_ms,
+            "error_message": self.error_message,
+            "ttft_ms": self.ttft_ms,
+            "nodes": [asdict(node) for node in self.nodes],
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "WorkflowResponse":
+        return cls(
+            outputs=record["outputs"],
+            workflow_run_id=record["workflow_run_id"],
+            status=record["status"],
+            raw_data={
+                "workflow_run_id": record["workflow_run_id"],
+                "data": {
+                    "status": record["status"],
+                    "outputs": record["outputs"],
+                    "error": record.get("error_message"),
+                },
+            },
+            latency_ms=record["latency_ms"],
+            token_usage=record.get("token_usage"),
+            elapsed_ms=record.get("elapsed_ms"),
+            error_message=record.get("error_message"),
+            ttft_ms=record.get("ttft_ms"),
+            nodes=[NodeTiming(**node) for node in record.get("nodes") or []],
+        )
+
+
+class DifyWorkflowClient(BaseHTTPClient):
+    """
+    Dify Workflow API 客户端（POST /workflows/run，无 conversation_id，单次执行）
+
+    - blocking 模式只有整体耗时与 Token 总量
+    - streaming 模式额外按 node_started / node_finished 事件记录每个节点的
+      耗时、状态与 Token 用量，定位慢在哪个 LLM / 知识检索 / 代码节点
+    - 与 Chatflow 客户端相同的重试、限流、目标并发名额与录制 / 回放
+    """
+
+    def __init__(
+        self,
+        config: TargetConfig,
+        http_config: HTTPConfig | None = None,
+        retry: RetryOptions | None = None,
+        rate_limiter: EndpointRateLimiter | None = None,
+        cassette: Cassette | None = None,
+        slots: AbstractAsyncContextManager | None = None,
+    ):
+        super().__init__(
+            base_url=config.api_base,
+            api_key=config.api_key,
+            timeout=config.timeout,
+            max_retries=config.max_retries,
+            http_config=http_config,
+            retry=retry,
+            rate_limiter=rate_limiter,
+        )
+        self.config = config
+        self.cassette = cassette
+        self.slots = slots or nullcontext()
+
+    async def run(
+        self, inputs: dict | None = None, *, user: str = "sandbox_test"
+    ) -> WorkflowResponse:
+        """执行工作流"""
+        payload = {
+            "inputs": inputs or {},
+            "response_mode": self.config.response_mode,
+            "user": user,
+        }
+        if self.cassette is None:
+            return await self._send(payload)
+
+        key = self.cassette.next_key(payload)
+        if self.cassette.replaying:
+            return WorkflowResponse.from_record(self.cassette.lookup(key))
+        response = await self._send(payload)
+        self.cassette.record(key, payload, response.to_record())
+        return response
+
+    async def _send(self, payload: dict) -> WorkflowResponse:
+        async with self.slots:
+            if self.config.response_mode == "streaming":
+                return await self._send_streaming(payload)
+            return await self._send_blocking(payload)
+
+    async def _send_blocking(self, payload: dict) -> WorkflowResponse:
+        start_time = time.monotonic()
+        response, reserved = await self._request_with_retry("POST", "/workflows/run", json=payload)
+        latency_ms = (time.monotonic() - start_time) * 1000
+        data = response.get("data") or {}
+        usage = _workflow_usage(data)
+        self._record_usage(usage, reserved)
+
+        return WorkflowResponse(
+            outputs=data.get("outputs") or {},
+            workflow_run_id=response.get("workflow_run_id", ""),
+            status=data.get("status", ""),
+            raw_data=response,
+            latency_ms=latency_ms,
+            token_usage=usage,
+            elapsed_ms=_seconds_to_ms(data.get("elapsed_time")),
+            error_message=data.get("error"),
+        )
+
+    async def _send_streaming(self, payload: dict) -> WorkflowResponse:
+        """以 SSE 方式执行工作流，记录首个文本分片时间与各节点耗时"""
+        start_time = time.monotonic()
+        first_chunk: float | None = None
+        workflow_run_id = ""
+        task_id = ""
+        finished: dict = {}
+        # node_started 的实测时间，按节点执行 ID（迭代中同一节点会执行多次）
+        started_at: dict[str, float] = {}
+        nodes: list[NodeTiming] = []
+
+        resp, reserved = await self._send_with_retry(
+            "POST", "/workflows/run", stream=True, json=payload
+        )
+        try:
+            async with aclosing(iter_sse_events(resp)) as events:
+                async for event in events:
+                    event_type = event.get("event")
+                    workflow_run_id = event.get("workflow_run_id") or workflow_run_id
+                    task_id = event.get("task_id") or task_id
+                    data = event.get("data") or {}
+
+                    if event_type == "node_started":
+                        started_at[data.get("id") or data.get("node_id", "")] = time.monotonic()
+                    elif event_type == "node_finished":
+                        nodes.append(self._node_timing(data, started_at))
+                    elif event_type == "text_chunk":
+                        if first_chunk is None and data.get("text"):
+                            first_chunk = time.monotonic()
+                    elif event_type == "workflow_finished":
+                        finished = data
+                    elif event_type == "error":
+                        raise DifyAPIError(
+                            f"流式响应错误: {event.get('message', '')}",
+                            status_code=event.get("status"),
+                            response_body=json.dumps(event, ensure_ascii=False),
+                        )
+        except httpx.RequestError as e:
+            raise DifyAPIError(f"流式响应中断: {e}") from e
+        finally:
+            await resp.aclose()
+
+        end_time = time.monotonic()
+        if not finished:
+            raise DifyAPIError(f"工作流流式响应缺少 workflow_finished 事件 (task_id={task_id})")
+        usage = _workflow_usage(finished)
+        self._record_usage(usage, reserved)
+
+        return WorkflowResponse(
+            outputs=finished.get("outputs") or {},
+            workflow_run_id=workflow_run_id,
+            status=finished.get("status", ""),
+            raw_data={"workflow_run_id": workflow_run_id, "task_id": task_id, "data": finished},
+            latency_ms=(end_time - start_time) * 1000,
+            token_usage=usage,
+            elapsed_ms=_seconds_to_ms(finished.get("elapsed_time")),
+            error_message=finished.get("error"),
+            ttft_ms=(first_chunk - start_time) * 1000 if first_chunk is not None else None,
+            nodes=nodes,
+        )
+
+    @staticmethod
+    def _node_timing(data: dict, started_at: dict[str, float]) -> NodeTiming:
+        """由 node_finished 事件构建节点耗时（LLM 节点的 outputs.usage 含 prompt / completion）"""
+        elapsed_ms = _seconds_to_ms(data.get("elapsed_time"))
+        if elapsed_ms is None:
+            started = started_at.get(data.get("id") or data.get("node_id", ""))
+            elapsed_ms = (time.monotonic() - started) * 1000 if started is not None else 0.0
+
+        usage = (data.get("outputs") or {}).get("usage")
+        if not isinstance(usage, dict):
+            total_tokens = (data.get("execution_metadata") or {}).get("total_tokens")
+            usage = {"total_tokens": total_tokens} if total_tokens else None
+
+        return NodeTiming(
+            node_id=data.get("node_id", ""),
+            node_type=data.get("node_type", ""),
+            title=data.get("title", ""),
+            elapsed_ms=elapsed_ms,
+            status=data.get("status", ""),
+            token_usage=usage,
+            error=data.get("error"),
+        )
+
+
+def _workflow_usage(data: dict) -> dict | None:
+    total_tokens = data.get("total_tokens")
+    return {"total_tokens": total_tokens} if total_tokens is not None else None
+
+
+def _seconds_to_ms(seconds: float | None) -> float | None:
+    return seconds * 1000 if seconds is not None else None
@@ -1,13 +1,18 @@
 """Judge LLM 客户端 — 调用 OpenAI 兼容接口评估回复质量"""
 
+import asyncio
+import hashlib
 import json
 import re
 from dataclasses import dataclass
 
 from sandbox.client.base import BaseHTTPClient
+from sandbox.client.retry import RetryOptions
 from sandbox.core.exceptions import SandboxError
 from sandbox.core.logging import get_logger
-from sandbox.schema.config import LLMConfig
+from sandbox.schema.config import HTTPConfig, LLMConfig
+from sandbox.utils.rate_limiter import EndpointRateLimiter
+from sandbox.utils.sqlite_cache import SQLiteCache
 
 logger = get_logger(__name__)
 
@@ -27,17 +32,34 @@ class JudgeLLMClient(BaseHTTPClient):
 
     调用 OpenAI 兼容的 /chat/completions 接口，
     解析 JSON 格式的评分结果。
+
+    - 可选的持久化缓存：按完整请求的哈希复用历史评分
+    - 单飞（single-flight）：同一请求并发时只调用一次 API
     """
 
-    def __init__(self, config: LLMConfig):
+    def __init__(
+        self,
+        config: LLMConfig,
+        http_config: HTTPConfig | None = None,
+        retry: RetryOptions | None = None,
+        rate_limiter: EndpointRateLimiter | None = None,
+        cache: SQLiteCache | None = None,
+    ):
         super().__init__(
             base_url=config.api_base,
             api_key=config.api_key,
             timeout=config.timeout,
             max_retries=2,
+            http_config=http_config,
+            retry=retry,
+            rate_limiter=rate_limiter,
         )
         self.model = config.model
         self.temperature = config.temperature
+        self.api_base = config.api_base
+        self.cache = cache
+        self.shared_calls = 0
+        self._inflight: dict[str, asyncio.Future[str]] = {}
 
     async def evaluate(self, system_prompt: str, user_prompt: str) -> JudgeResult:
         """
@@ -58,10 +80,65 @@ class JudgeLLMClient(BaseHTTPClient):
             ],
         }
 
-        response = await self._request_with_retry("POST", "/chat/completions", json=payload)
+        key = self._request_key(payload)
+
+        while True:
+            # 单飞：相同请求正在进行时等待其结果
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                raw_text = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 发起者被取消不代表等待者被取消：由等待者重新发起请求
+                if inflight.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            self.shared_calls += 1
+            return self._parse_judge_response(raw_text)
+
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            raw_text, result = await self._evaluate_uncached(key, payload)
+            future.set_result(raw_text)
+            return result
+        except asyncio.CancelledError:
+            # 取消只属于发起者本身，不传播给等待者
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _evaluate_uncached(self, key: str, payload: dict) -> tuple[str, JudgeResult]:
+        """查询持久化缓存，未命中时调用 API（仅缓存可解析的响应）"""
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached, self._parse_judge_response(cached)
+
+        response, reserved = await self._request_with_retry(
+            "POST", "/chat/completions", json=payload
+        )
+        self._record_usage(response.get("usage"), reserved)
         raw_text = response["choices"][0]["message"]["content"]
+        result = self._parse_judge_response(raw_text)
+
+        if self.cache is not None:
+            await self.cache.aput(key, raw_text)
+        return raw_text, result
 
-        return self._parse_judge_response(raw_text)
+    def _request_key(self, payload: dict) -> str:
+        """完整请求（端点 + 模型 + 温度 + 提示词）的内容哈希"""
+        canonical = json.dumps(
+            {"api_base": self.api_base, **payload}, ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
     def _parse_judge_response(self, raw_text: str) -> JudgeResult:
         """解析 Judge LLM 的 JSON 响应，带容错处理"""
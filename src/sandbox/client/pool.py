@@ -0,0 +1,235 @@
+"""HTTP 客户端连接池 — 按目标配置复用客户端，整个运行期间共享
+
+每个 TargetConfig / LLMConfig 对应一个长生命周期的客户端（即一个
+httpx.AsyncClient 连接池），避免每个用例重复 DNS / TCP / TLS 握手。
+"""
+
+from contextlib import AbstractAsyncContextManager
+
+from sandbox.client.base import ResponseObserver
+from sandbox.client.cassette import Cassette
+from sandbox.client.dify_chat import DifyChatClient
+from sandbox.client.dify_workflow import DifyWorkflowClient
+from sandbox.client.judge_llm import JudgeLLMClient
+from sandbox.client.retry import (
+    CircuitBreakerRegistry,
+    RetryBudget,
+    RetryOptions,
+    build_retry_policy,
+)
+from sandbox.client.simulated_user import SimulatedUserLLMClient
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import (
+    ExecutionConfig,
+    HTTPConfig,
+    LLMConfig,
+    RetryConfig,
+    TargetConfig,
+)
+from sandbox.utils.rate_limiter import EndpointRateLimiter
+from sandbox.utils.sqlite_cache import SQLiteCache
+
+logger = get_logger(__name__)
+
+
+class ClientPool:
+    """
+    客户端池
+
+    - dify_client(): 按 TargetConfig 取得共享的 Dify 客户端
+    - workflow_client(): 按 TargetConfig 取得共享的 Dify 工作流客户端
+    - judge_client(): 按 LLMConfig 取得共享的 Judge 客户端
+    - sim_user_client(): 按 LLMConfig 取得共享的模拟用户客户端
+    - close(): 关闭池中所有客户端
+
+    池内客户端共享同一个重试预算，并按 base URL 共享熔断器；
+    每个端点（Dify 应用 / Judge 服务 / 模拟用户 LLM）有独立的 RPM / TPM 限流桶。
+    Judge 客户端共享同一个评分结果缓存（可选）；Dify 客户端共享同一个录制 / 回放文件（可选）；
+    模拟用户客户端共享同一个对话记录缓存（可选）。
+    target_slots 为目标并发名额，所有 Dify 客户端在每次请求期间占用一个名额。
+    retry_guards=False 时客户端不挂载重试预算与熔断器（压测需要观察目标本身的失败）。
+    """
+
+    def __init__(
+        self,
+        http_config: HTTPConfig | None = None,
+        retry_config: RetryConfig | None = None,
+        execution_config: ExecutionConfig | None = None,
+        judge_cache: SQLiteCache | None = None,
+        cassette: Cassette | None = None,
+        target_slots: AbstractAsyncContextManager | None = None,
+        transcript_cache: SQLiteCache | None = None,
+        retry_guards: bool = True,
+    ):
+        self.http_config = http_config or HTTPConfig()
+        self.retry_config = retry_config or RetryConfig()
+        self.execution_config = execution_config or ExecutionConfig()
+        self.retry_budget = RetryBudget(
+            ratio=self.retry_config.budget_ratio,
+            min_retries=self.retry_config.budget_min_retries,
+        )
+        self.breakers = CircuitBreakerRegistry(self.retry_config)
+        self.judge_cache = judge_cache
+        self.transcript_cache = transcript_cache
+        self.cassette = cassette
+        self.target_slots = target_slots
+        self.retry_guards = retry_guards
+        self._dify_clients: dict[str, DifyChatClient] = {}
+        self._workflow_clients: dict[str, DifyWorkflowClient] = {}
+        self._judge_clients: dict[str, JudgeLLMClient] = {}
+        self._sim_user_clients: dict[str, SimulatedUserLLMClient] = {}
+        self._target_observers: list[ResponseObserver] = []
+        self.rate_limiters: dict[str, EndpointRateLimiter] = {}
+
+    def dify_client(self, target: TargetConfig) -> DifyChatClient:
+        key = target.model_dump_json()
+        client = self._dify_clients.get(key)
+        if client is None:
+            client = DifyChatClient(
+                target,
+                http_config=self.http_config,
+                retry=self._retry_options(target.api_base),
+                rate_limiter=self._target_rate_limiter(target),
+                cassette=self.cassette,
+                slots=self.target_slots,
+            )
+            client.observers.extend(self._target_observers)
+            self._dify_clients[key] = client
+            logger.debug(f"创建 Dify 连接池: {target.api_base}")
+        return client
+
+    def workflow_client(self, target: TargetConfig) -> DifyWorkflowClient:
+        key = target.model_dump_json()
+        client = self._workflow_clients.get(key)
+        if client is None:
+            client = DifyWorkflowClient(
+                target,
+                http_config=self.http_config,
+                retry=self._retry_options(target.api_base),
+                rate_limiter=self._target_rate_limiter(target),
+                cassette=self.cassette,
+                slots=self.target_slots,
+            )
+            client.observers.extend(self._target_observers)
+            self._workflow_clients[key] = client
+            logger.debug(f"创建 Dify 工作流连接池: {target.api_base}")
+        return client
+
+    def judge_client(self, config: LLMConfig) -> JudgeLLMClient:
+        key = config.model_dump_json()
+        client = self._judge_clients.get(key)
+        if client is None:
+            client = JudgeLLMClient(
+                config,
+                http_config=self.http_config,
+                retry=self._retry_options(config.api_base),
+                rate_limiter=self._rate_limiter(
+                    f"judge:{config.api_base}",
+                    config.api_key,
+                    rpm=config.rate_limit_rpm or 0,
+                    burst=config.rate_limit_burst,
+                    tpm=config.rate_limit_tpm,
+                ),
+                cache=self.judge_cache,
+            )
+            self._judge_clients[key] = client
+            logger.debug(f"创建 Judge 连接池: {config.api_base}")
+        return client
+
+    def sim_user_client(self, config: LLMConfig) -> SimulatedUserLLMClient:
+        key = config.model_dump_json()
+        client = self._sim_user_clients.get(key)
+        if client is None:
+            client = SimulatedUserLLMClient(
+                config,
+                http_config=self.http_config,
+                retry=self._retry_options(config.api_base),
+                rate_limiter=self._rate_limiter(
+                    f"sim_user:{config.api_base}",
+                    config.api_key,
+                    rpm=config.rate_limit_rpm or 0,
+                    burst=config.rate_limit_burst,
+                    tpm=config.rate_limit_tpm,
+                ),
+                cache=self.transcript_cache,
+            )
+            self._sim_user_clients[key] = client
+            logger.debug(f"创建模拟用户连接池: {config.api_base}")
+        return client
+
+    def add_target_observer(self, observer: ResponseObserver) -> None:
+        """为所有 Dify 客户端（含之后创建的）注册请求观察者"""
+        self._target_observers.append(observer)
+        for client in (*self._dify_clients.values(), *self._workflow_clients.values()):
+            client.observers.append(observer)
+
+    def _target_rate_limiter(self, target: TargetConfig) -> EndpointRateLimiter:
+        """Dify 目标的限流桶（Chatflow 与 Workflow 客户端按端点共享）"""
+        execution = self.execution_config
+        return self._rate_limiter(
+            f"dify:{target.api_base}",
+            target.api_key,
+            rpm=target.rate_limit_rpm or execution.rate_limit_rpm,
+            burst=target.rate_limit_burst or execution.rate_limit_burst,
+            tpm=target.rate_limit_tpm or execution.rate_limit_tpm,
+        )
+
+    def _rate_limiter(
+        self, name: str, api_key: str, rpm: int, burst: int, tpm: int | None
+    ) -> EndpointRateLimiter:
+        """同一端点（base URL + API Key）的客户端共享一个限流桶"""
+        key = f"{name}|{api_key}"
+        limiter = self.rate_limiters.get(key)
+        if limiter is None:
+            limiter = EndpointRateLimiter(name, rpm=rpm, burst=burst, tpm=tpm)
+            self.rate_limiters[key] = limiter
+        return limiter
+
+    def rate_limit_stats(self) -> dict[str, dict]:
+        return {limiter.name: limiter.stats() for limiter in self.rate_limiters.values()}
+
+    def judge_cache_stats(self) -> dict:
+        """缓存命中统计 + 各 Judge 客户端单飞合并的调用数"""
+        stats = self.judge_cache.stats() if self.judge_cache is not None else {}
+        shared = sum(client.shared_calls for client in self._judge_clients.values())
+        return {**stats, "shared_inflight": shared}
+
+    def sim_user_stats(self) -> dict:
+        """模拟用户 LLM 实际生成的消息数与对话记录缓存命中数"""
+        stats = {"generated": 0, "cache_hits": 0}
+        for client in self._sim_user_clients.values():
+            for name, value in client.stats().items():
+                stats[name] += value
+        return stats
+
+    def _retry_options(self, base_url: str) -> RetryOptions:
+        return RetryOptions(
+            policy=build_retry_policy(self.retry_config),
+            budget=self.retry_budget if self.retry_guards else None,
+            breaker=self.breakers.get(base_url) if self.retry_guards else None,
+            respect_retry_after=self.retry_config.respect_retry_after,
+            max_retry_after=self.retry_config.max_delay,
+        )
+
+    async def close(self) -> None:
+        """关闭所有客户端（单个关闭失败不影响其余客户端）"""
+        clients = [
+            *self._dify_clients.values(),
+            *self._workflow_clients.values(),
+            *self._judge_clients.values(),
+            *self._sim_user_clients.values(),
+        ]
+        self._dify_clients.clear()
+        self._workflow_clients.clear()
+        self._judge_clients.clear()
+        self._sim_user_clients.clear()
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"关闭 HTTP 客户端失败: {e}")
+        for cache in (self.judge_cache, self.transcript_cache):
+            if cache is not None:
+                cache.close()
+        self.judge_cache = None
+        self.transcript_cache = None
@@ -0,0 +1,215 @@
+"""重试策略、重试预算与熔断器
+
+- RetryPolicy: 计算下一次重试的等待时间（可插拔，默认 decorrelated jitter）
+- RetryBudget: 整个运行期间共享的重试预算，防止故障时重试放大流量
+- CircuitBreaker: 按 base URL 熔断，连续失败后快速失败，不再消耗超时时间
+"""
+
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from sandbox.core.exceptions import DifyAPIError
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import RetryConfig
+
+logger = get_logger(__name__)
+
+# 可重试的 HTTP 状态码：请求超时、限流、服务端错误
+RETRYABLE_STATUS = frozenset({408, 429})
+
+
+def is_retryable_status(status: int) -> bool:
+    return status in RETRYABLE_STATUS or status >= 500
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy(ABC):
+    """重试等待策略"""
+
+    @abstractmethod
+    def next_delay(self, attempt: int, previous_delay: float) -> float:
+        """
+        参数：
+            attempt: 已失败的次数（从 0 开始）
+            previous_delay: 上一次的等待时间（首次为 0）
+        """
+
+
+class ExponentialBackoffPolicy(RetryPolicy):
+    """固定指数退避：base * 2^attempt"""
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, attempt: int, previous_delay: float) -> float:
+        return min(self.max_delay, self.base_delay * 2**attempt)
+
+
+class DecorrelatedJitterPolicy(RetryPolicy):
+    """
+    Decorrelated jitter：sleep = min(max, random(base, previous * 3))
+
+    并发请求同时失败时各自的等待时间被打散，不会同步重试。
+    """
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, attempt: int, previous_delay: float) -> float:
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+
+def build_retry_policy(config: RetryConfig) -> RetryPolicy:
+    match config.policy:
+        case "exponential":
+            return ExponentialBackoffPolicy(config.base_delay, config.max_delay)
+        case _:
+            return DecorrelatedJitterPolicy(config.base_delay, config.max_delay)
+
+
+class RetryBudget:
+    """
+    重试预算：累计重试次数 ≤ min_retries + ratio × 请求数
+
+    在整个运行期间共享。服务整体降级时，重试很快耗尽预算，
+    之后的失败直接返回，避免把故障流量放大 (max_retries + 1) 倍。
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def record_request(self) -> None:
+        self.requests += 1
+
+    def try_acquire(self) -> bool:
+        """申请一次重试，预算不足时返回 False"""
+        if self.retries < self.min_retries + self.ratio * self.requests:
+            self.retries += 1
+            return True
+        self.rejected += 1
+        return False
+
+
+class CircuitBreaker:
+    """
+    熔断器（closed → open → half_open）
+
+    - closed: 正常放行；连续失败达到阈值后打开
+    - open: 直接抛出 DifyAPIError，recovery_timeout 后进入 half_open
+    - half_open: 只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_request(self) -> None:
+        """请求前检查，熔断时抛出 DifyAPIError"""
+        if self.state == "closed":
+            return
+        if self.state == "open":
+            remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0:
+                raise DifyAPIError(
+                    f"熔断器已打开: {self.name} 连续失败 {self.consecutive_failures} 次，"
+                    f"{remaining:.0f}s 后再尝试"
+                )
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self._probe_in_flight:
+            raise DifyAPIError(f"熔断器半开: {self.name} 正在探测服务是否恢复")
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"熔断器关闭: {self.name} 已恢复")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """探测请求被取消（既未成功也未失败）时释放探测名额"""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or (
+            self.state == "closed" and self.consecutive_failures >= self.failure_threshold
+        ):
+            if self.state == "closed":
+                logger.warning(f"熔断器打开: {self.name} 连续失败 {self.consecutive_failures} 次")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+@dataclass
+class RetryOptions:
+    """客户端使用的重试组件（预算和熔断器可在多个客户端间共享）"""
+
+    policy: RetryPolicy
+    budget: RetryBudget | None = None
+    breaker: CircuitBreaker | None = None
+    respect_retry_after: bool = True
+    # Retry-After 的上限（秒），防止异常的响应头让请求等待数小时
+    max_retry_after: float = 30.0
+
+    @classmethod
+    def from_config(cls, config: RetryConfig) -> "RetryOptions":
+        return cls(
+            policy=build_retry_policy(config),
+            respect_retry_after=config.respect_retry_after,
+            max_retry_after=config.max_delay,
+        )
+
+
+class CircuitBreakerRegistry:
+    """按 base URL 管理熔断器"""
+
+    def __init__(self, config: RetryConfig):
+        self.config = config
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, base_url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(base_url)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name=base_url,
+                failure_threshold=self.config.breaker_failure_threshold,
+                recovery_timeout=self.config.breaker_recovery_timeout,
+            )
+            self._breakers[base_url] = breaker
+        return breaker
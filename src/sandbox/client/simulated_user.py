@@ -0,0 +1,91 @@
+"""模拟用户 LLM 客户端 — 调用 OpenAI 兼容接口生成下一条用户消息"""
+
+import hashlib
+import json
+
+from sandbox.client.base import BaseHTTPClient
+from sandbox.client.retry import RetryOptions
+from sandbox.core.exceptions import SandboxError
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import HTTPConfig, LLMConfig
+from sandbox.schema.result import TurnResult
+from sandbox.utils.rate_limiter import EndpointRateLimiter
+from sandbox.utils.sqlite_cache import SQLiteCache
+
+logger = get_logger(__name__)
+
+
+class SimulatedUserLLMClient(BaseHTTPClient):
+    """
+    模拟用户 LLM 客户端
+
+    模拟用户扮演对话中的 assistant 角色：自己说过的话为 assistant 消息，
+    机器人的回复为 user 消息，由 LLM 续写下一条用户消息。
+
+    可选的对话记录缓存（transcript cache）：按完整请求（模型、温度、system_prompt、
+    截至当前的全部对话）的哈希复用生成结果。模拟用户 Prompt 与机器人回答都未变化时，
+    重跑得到完全相同的用户消息，不再调用 LLM；任一轮机器人回答变化后，
+    从该轮起重新生成。
+    """
+
+    def __init__(
+        self,
+        config: LLMConfig,
+        http_config: HTTPConfig | None = None,
+        retry: RetryOptions | None = None,
+        rate_limiter: EndpointRateLimiter | None = None,
+        cache: SQLiteCache | None = None,
+    ):
+        super().__init__(
+            base_url=config.api_base,
+            api_key=config.api_key,
+            timeout=config.timeout,
+            max_retries=2,
+            http_config=http_config,
+            retry=retry,
+            rate_limiter=rate_limiter,
+        )
+        self.model = config.model
+        self.temperature = config.temperature
+        self.api_base = config.api_base
+        self.cache = cache
+        self.generated = 0
+        self.cache_hits = 0
+
+    async def generate_next_message(self, system_prompt: str, history: list[TurnResult]) -> str:
+        """根据对话历史生成下一条用户消息"""
+        messages = [{"role": "system", "content": system_prompt}]
+        for turn in history:
+            messages.append({"role": "assistant", "content": turn.user_message})
+            messages.append({"role": "user", "content": turn.bot_response})
+        payload = {"model": self.model, "temperature": self.temperature, "messages": messages}
+
+        key = self._request_key(payload)
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        response, reserved = await self._request_with_retry(
+            "POST", "/chat/completions", json=payload
+        )
+        self._record_usage(response.get("usage"), reserved)
+        message = (response["choices"][0]["message"]["content"] or "").strip()
+        if not message:
+            raise SandboxError("模拟用户 LLM 返回了空消息")
+        self.generated += 1
+
+        if self.cache is not None:
+            await self.cache.aput(key, message)
+        return message
+
+    def stats(self) -> dict:
+        return {"generated": self.generated, "cache_hits": self.cache_hits}
+
+    def _request_key(self, payload: dict) -> str:
+        """完整请求（端点 + 模型 + 温度 + 对话）的内容哈希"""
+        canonical = json.dumps(
+            {"api_base": self.api_base, **payload}, ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,51 @@
+"""Server-Sent Events 解析
+
+Dify 流式接口以 SSE 返回，每个事件的 data 字段是一个 JSON 对象：
+    data: {"event": "message", "answer": "你", ...}
+
+    data: {"event": "message_end", "metadata": {...}}
+
+"""
+
+import json
+from collections.abc import AsyncIterator
+
+import httpx
+
+from sandbox.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[dict]:
+    """逐个产出 SSE 事件的 JSON 数据（忽略注释行和非 JSON 的 data，如 ping）"""
+    data_lines: list[str] = []
+    async for line in response.aiter_lines():
+        if line == "":
+            # 空行表示一个事件结束
+            if data_lines:
+                event = _decode("\n".join(data_lines))
+                data_lines = []
+                if event is not None:
+                    yield event
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+
+    # 流结束时没有尾随空行的最后一个事件
+    if data_lines:
+        event = _decode("\n".join(data_lines))
+        if event is not None:
+            yield event
+
+
+def _decode(data: str) -> dict | None:
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError:
+        logger.debug(f"忽略非 JSON 的 SSE 数据: {data[:100]}")
+        return None
+    return event if isinstance(event, dict) else None
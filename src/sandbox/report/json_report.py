@@ -1,36 +1,85 @@
 """JSON 报告输出"""
 
 import json
+import secrets
+from collections.abc import Iterable
 from dataclasses import asdict
 from datetime import datetime, timezone
 from pathlib import Path
 
 from sandbox.core.logging import get_logger
+from sandbox.report.jsonl_sink import iter_jsonl_records
 from sandbox.schema.result import SuiteResult, SuiteScore
 
+# 按轮次统计延迟时输出的分位数
+TURN_PERCENTILES = (50, 95, 99)
+
 logger = get_logger(__name__)
 
 
+def report_file_path(output_dir: str, suite_name: str, suffix: str = ".json") -> Path:
+    """
+    报告文件路径：<输出目录>/<套件名>_<UTC 时间戳>_<随机后缀><后缀>
+
+    随机后缀保证同名套件、同一秒内结束的分片 / 进程不会覆盖彼此的文件。
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    safe_name = suite_name.replace(" ", "_")[:50]
+    return output_path / f"{safe_name}_{timestamp}_{secrets.token_hex(3)}{suffix}"
+
+
 def generate_json_report(
     suite_result: SuiteResult,
     suite_score: SuiteScore,
     output_dir: str = "./reports",
 ) -> Path:
     """生成 JSON 报告文件"""
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+    file_path = report_file_path(output_dir, suite_result.suite_name)
+    report = _report_head(
+        suite_result.suite_name, suite_result.target, suite_score, suite_result.stats
+    )
+    _write_report(file_path, report, (asdict(cr) for cr in suite_result.case_results))
 
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    safe_name = suite_result.suite_name.replace(" ", "_")[:50]
-    file_name = f"{safe_name}_{timestamp}.json"
-    file_path = output_path / file_name
+    logger.info(f"JSON 报告已生成: {file_path}")
+    return file_path
+
+
+def generate_json_report_from_jsonl(jsonl_path: str | Path, suite_score: SuiteScore) -> Path:
+    """
+    由 JSONL 结果文件生成 JSON 报告（与 JSONL 同名，后缀为 .json）
+
+    用例逐行从 JSONL 读出并写入报告，不在内存中保留全部结果。
+    """
+    jsonl_path = Path(jsonl_path)
+    suite: dict = {}
+    stats: dict = {}
+    for record in iter_jsonl_records(jsonl_path):
+        if record["type"] == "suite":
+            suite = record["suite"]
+        elif record["type"] == "stats":
+            stats = record["execution"]
 
-    report = {
+    file_path = jsonl_path.with_suffix(".json")
+    report = _report_head(suite.get("name", ""), suite.get("target", ""), suite_score, stats)
+    cases = (
+        record["case"] for record in iter_jsonl_records(jsonl_path) if record["type"] == "case"
+    )
+    _write_report(file_path, report, cases)
+
+    logger.info(f"JSON 报告已生成: {file_path}")
+    return file_path
+
+
+def _report_head(suite_name: str, target: str, suite_score: SuiteScore, execution: dict) -> dict:
+    return {
         "version": "1.0",
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "suite": {
-            "name": suite_result.suite_name,
-            "target": suite_result.target,
+            "name": suite_name,
+            "target": target,
         },
         "summary": {
             "total_cases": suite_score.total_cases,
@@ -41,12 +90,51 @@ def generate_json_report(
             "dimension_averages": {
                 k: round(v, 4) for k, v in suite_score.dimension_averages.items()
             },
+            "latency": {
+                metric: _rounded(stats) for metric, stats in suite_score.latency_percentiles.items()
+            },
+            # 按轮次（turn_index）的延迟分位数，来自直方图
+            "turn_latency": {
+                str(turn_index): _rounded(histogram.summary(TURN_PERCENTILES))
+                for turn_index, histogram in suite_score.turn_latency_histograms.items()
+            },
+            "node_latency": {
+                node: _rounded(stats) for node, stats in suite_score.node_latency.items()
+            },
+            "tokens": suite_score.token_totals,
+            "budgets": [asdict(result) for result in suite_score.budget_results],
+            "budgets_passed": suite_score.budgets_passed,
+        },
+        "execution": execution,
+        # 可合并的直方图（Histogram.from_dict 还原），用于跨运行 / 分片汇总分位数
+        "histograms": {
+            **{metric: h.to_dict() for metric, h in suite_score.histograms.items()},
+            "turn_latency": {
+                str(turn_index): h.to_dict()
+                for turn_index, h in suite_score.turn_latency_histograms.items()
+            },
         },
-        "cases": [asdict(cr) for cr in suite_result.case_results],
     }
 
+
+def _rounded(stats: dict[str, float]) -> dict[str, float]:
+    return {k: round(v, 2) for k, v in stats.items()}
+
+
+def _write_report(file_path: Path, report: dict, cases: Iterable[dict]) -> None:
+    """写入报告：先写报告头，再逐个写入用例并收尾，不在内存中组装完整报告"""
     with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write("{\n")
+        for key, value in report.items():
+            f.write(f"  {_dumps(key, 1)}: {_dumps(value, 1)},\n")
+        f.write('  "cases": [')
+        written = 0
+        for case in cases:
+            f.write(("," if written else "") + "\n    " + _dumps(case, 2))
+            written += 1
+        f.write("\n  ]\n}" if written else "]\n}")
 
-    logger.info(f"JSON 报告已生成: {file_path}")
-    return file_path
+
+def _dumps(value, level: int) -> str:
+    """按 indent=2 序列化，并整体缩进 level 层（字符串中的换行已转义，可直接替换）"""
+    return json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n" + "  " * level)
@@ -0,0 +1,112 @@
+"""JSONL 结果流 — 用例完成即追加写入
+
+文件每行一条记录（type 字段区分）：
+- suite：套件名与目标（首行）
+- case：一个 CaseResult（asdict 结果）
+- stats：运行统计（套件执行结束后写入）
+
+每行写入后立即落盘，运行中途崩溃时已完成的用例不会丢失；
+JSON 报告可在运行结束后由该文件逐行生成，
+中断的运行也可由该文件续跑（read_completed_results）。
+"""
+
+import json
+from collections.abc import Iterator
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sandbox.core.logging import get_logger
+from sandbox.schema.result import CaseResult
+
+logger = get_logger(__name__)
+
+
+class JSONLResultSink:
+    """单个套件的 JSONL 结果文件"""
+
+    def __init__(self, path: str | Path, suite_name: str, target: str):
+        self.path = Path(path)
+        self.written = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("w", encoding="utf-8")
+        self._write(
+            {
+                "type": "suite",
+                "suite": {"name": suite_name, "target": target},
+                "started_at": datetime.now(timezone.utc).isoformat(),
+            }
+        )
+
+    def write(self, case_result: CaseResult) -> None:
+        """追加一个用例结果并落盘"""
+        self._write({"type": "case", "case": asdict(case_result)})
+        self.written += 1
+
+    def close(self, stats: dict | None = None) -> None:
+        """写入运行统计（如有）并关闭文件"""
+        if self._file is None:
+            return
+        if stats is not None:
+            self._write({"type": "stats", "execution": stats})
+        self._file.close()
+        self._file = None
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+
+def iter_jsonl_records(path: str | Path) -> Iterator[dict]:
+    """
+    逐行读取 JSONL 结果文件
+
+    进程被中断时最后一行可能不完整，该行会被跳过。
+    """
+    with Path(path).open(encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"跳过不完整的结果行: {path}:{line_no}")
+
+
+def read_suite_header(path: str | Path) -> dict:
+    """读取结果文件的套件信息（name / target），缺失时抛出 ValueError"""
+    for record in iter_jsonl_records(path):
+        if record["type"] == "suite":
+            return record["suite"]
+    raise ValueError(f"结果文件缺少套件信息: {path}")
+
+
+def load_case_results(path: str | Path) -> list[CaseResult]:
+    """读取 JSONL 结果文件中的全部用例结果"""
+    return [
+        CaseResult.from_dict(record["case"])
+        for record in iter_jsonl_records(path)
+        if record["type"] == "case"
+    ]
+
+
+def read_completed_results(path: str | Path) -> tuple[str, dict[str, CaseResult]]:
+    """
+    读取上次运行的结果文件，用于续跑
+
+    返回 (套件名, 用例 ID -> 已完成的结果)；同一用例出现多次时以最后一条为准，
+    status="error" 的用例视为未完成，不计入。
+    """
+    suite_name = ""
+    latest: dict[str, dict] = {}
+    for record in iter_jsonl_records(path):
+        if record["type"] == "suite":
+            suite_name = record["suite"]["name"]
+        elif record["type"] == "case":
+            latest[record["case"]["case_id"]] = record["case"]
+    completed = {
+        case_id: CaseResult.from_dict(case)
+        for case_id, case in latest.items()
+        if case["status"] != "error"
+    }
+    return suite_name, completed
@@ -0,0 +1,74 @@
+"""压测报告输出（sandbox load）"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sandbox.core.logging import get_logger
+from sandbox.report.json_report import report_file_path
+from sandbox.schema.result import LoadResult, LoadWindow
+
+logger = get_logger(__name__)
+
+
+def load_summary(result: LoadResult) -> dict:
+    """压测整体指标：请求数、错误率、实际吞吐、时延分位数"""
+    return {
+        "sent": result.sent,
+        "completed": result.completed,
+        "errors": result.errors,
+        "dropped": result.dropped,
+        "error_rate": round(result.error_rate, 4),
+        "throughput_rps": round(result.throughput, 2),
+        "elapsed_s": round(result.elapsed_s, 2),
+        "latency_ms": _rounded(result.latency.summary()),
+        "ttft_ms": _rounded(result.ttft.summary()),
+    }
+
+
+def window_summary(window: LoadWindow, window_s: float) -> dict:
+    failed = window.errors
+    total = window.completed + failed
+    return {
+        "start_s": window.start_s,
+        "sent": window.sent,
+        "completed": window.completed,
+        "errors": window.errors,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "throughput_rps": round(window.completed / window_s, 2),
+        "latency_ms": _rounded(window.latency.summary()),
+    }
+
+
+def generate_load_report(result: LoadResult, output_dir: str = "./reports") -> Path:
+    """生成压测 JSON 报告（含可合并的完整时延直方图）"""
+    file_path = report_file_path(output_dir, f"{result.suite_name}_load")
+    report = {
+        "version": "1.0",
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "suite": {"name": result.suite_name, "target": result.target},
+        "load": {
+            "rps": result.rps,
+            "duration_s": result.duration_s,
+            "arrival": result.arrival,
+            "window_s": result.window_s,
+        },
+        "summary": load_summary(result),
+        "windows": [
+            window_summary(result.windows[index], result.window_s)
+            for index in sorted(result.windows)
+        ],
+        "histograms": {
+            "latency_ms": result.latency.to_dict(),
+            "ttft_ms": result.ttft.to_dict(),
+        },
+    }
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"压测报告已生成: {file_path}")
+    return file_path
+
+
+def _rounded(summary: dict[str, float]) -> dict[str, float]:
+    return {k: round(v, 2) for k, v in summary.items()}
@@ -0,0 +1,65 @@
+"""合并分片结果 — sandbox merge
+
+各分片（run --shard i/n）的 JSONL 结果文件按套件名分组，逐行流式合并为
+每个套件一份新的 JSONL 结果文件，同时由流式聚合器计算套件评分；
+合并后的文件可直接生成 JSON 报告，内存占用与用例总数无关（仅保留用例 ID 去重）。
+"""
+
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+from sandbox.core.logging import get_logger
+from sandbox.report.json_report import report_file_path
+from sandbox.report.jsonl_sink import JSONLResultSink, iter_jsonl_records, read_suite_header
+from sandbox.schema.result import CaseResult, SuiteScore
+from sandbox.schema.test_case import PercentileBudget
+from sandbox.scoring.scorer import SuiteScorer
+
+logger = get_logger(__name__)
+
+
+def merge_result_logs(
+    paths: Iterable[str | Path],
+    output_dir: str,
+    suite_scorer: SuiteScorer,
+    budgets: Mapping[str, list[PercentileBudget]] | None = None,
+) -> list[tuple[Path, SuiteScore]]:
+    """
+    合并多个 JSONL 结果文件，返回每个套件的 (合并后的结果文件, 套件评分)
+
+    同一用例出现在多个文件中时保留先读到的一条；
+    各分片的运行统计以 {"shards": [...]} 写入合并文件。
+    budgets 按套件名给出分位数预算，在合并后的全部用例上检查。
+    """
+    budgets = budgets or {}
+    groups: dict[str, list[Path]] = {}
+    targets: dict[str, str] = {}
+    for path in paths:
+        suite = read_suite_header(path)
+        groups.setdefault(suite["name"], []).append(Path(path))
+        targets.setdefault(suite["name"], suite["target"])
+
+    merged: list[tuple[Path, SuiteScore]] = []
+    for suite_name, group in groups.items():
+        sink = JSONLResultSink(
+            report_file_path(output_dir, suite_name, ".jsonl"), suite_name, targets[suite_name]
+        )
+        aggregator = suite_scorer.aggregator(suite_name, budgets.get(suite_name))
+        seen: set[str] = set()
+        shard_stats: list[dict] = []
+        for path in group:
+            for record in iter_jsonl_records(path):
+                if record["type"] == "case":
+                    case_result = CaseResult.from_dict(record["case"])
+                    if case_result.case_id in seen:
+                        logger.warning(f"用例 {case_result.case_id} 重复出现，忽略 {path} 中的结果")
+                        continue
+                    seen.add(case_result.case_id)
+                    sink.write(case_result)
+                    aggregator.add(case_result)
+                elif record["type"] == "stats":
+                    shard_stats.append({"source": str(path), **record["execution"]})
+        sink.close(stats={"shards": shard_stats})
+        logger.info(f"套件 {suite_name}: 合并 {len(group)} 个结果文件，共 {sink.written} 个用例")
+        merged.append((sink.path, aggregator.finish()))
+    return merged
@@ -0,0 +1,164 @@
+"""并发控制 — 固定并发或 AIMD 自适应并发
+
+AdaptiveConcurrencyLimiter 根据每个 HTTP 请求的反馈动态调整并发上限：
+- 延迟正常且无错误：加性增长（每满一个窗口 +1）
+- 429 / 5xx / 网络异常 / 短期延迟明显高于长期基线：乘性下降
+上限始终在 [min_concurrency, max_concurrency] 范围内。
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import ExecutionConfig
+
+logger = get_logger(__name__)
+
+
+class StaticConcurrencyLimiter:
+    """固定并发上限（asyncio.Semaphore 的薄封装，接口与自适应版本一致）"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __aenter__(self) -> None:
+        await self._semaphore.acquire()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+    def record(self, latency_ms: float, status_code: int | None) -> None:
+        """固定并发不需要反馈"""
+
+    def stats(self) -> dict:
+        return {"mode": "static", "limit": self.limit}
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发限制器"""
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 50,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.7,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        # 延迟基线：长期 EWMA 作为基线，短期 EWMA 反映当前负载
+        self._long_latency: float | None = None
+        self._short_latency: float | None = None
+        self._last_decrease = 0.0
+
+        self._started_at = time.monotonic()
+        self.history: list[tuple[float, int]] = [(0.0, self.limit)]
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def __aenter__(self) -> None:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分配到名额但被取消，归还名额
+                self._release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self._in_flight += 1
+                future.set_result(None)
+
+    def record(self, latency_ms: float, status_code: int | None) -> None:
+        """记录一次请求结果（status_code 为 None 表示网络异常）"""
+        throttled = status_code is None or status_code == 429 or status_code >= 500
+        if throttled:
+            self._decrease("错误或限流" if status_code is None else f"HTTP {status_code}")
+            return
+
+        if self._long_latency is None:
+            self._long_latency = self._short_latency = latency_ms
+        else:
+            self._short_latency = 0.8 * self._short_latency + 0.2 * latency_ms
+            self._long_latency = 0.98 * self._long_latency + 0.02 * latency_ms
+
+        if self._short_latency > self._long_latency * self.latency_tolerance:
+            self._decrease(f"延迟上升 {self._short_latency:.0f}ms")
+        elif self._in_flight >= self.limit - 1:
+            # 只有上限确实被用满时才增长，避免空闲时无限膨胀
+            self._set_limit(self._limit + 1 / max(self._limit, 1))
+
+    def _decrease(self, reason: str) -> None:
+        # 同一批在途请求的失败只触发一次下降
+        now = time.monotonic()
+        cooldown = (self._short_latency or 1000) / 1000
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self._set_limit(self._limit * self.backoff_ratio)
+        if self.limit != old:
+            logger.info(f"并发上限下调 {old} → {self.limit}（{reason}）")
+
+    def _set_limit(self, value: float) -> None:
+        old = self.limit
+        self._limit = min(max(value, self.min_limit), self.max_limit)
+        if self.limit != old:
+            self.history.append((round(time.monotonic() - self._started_at, 3), self.limit))
+            self._wake_waiters()
+
+    def stats(self) -> dict:
+        return {
+            "mode": "adaptive",
+            "limit": self.limit,
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "limit_history": self.history,
+        }
+
+
+def build_concurrency_limiter(
+    execution: ExecutionConfig,
+) -> StaticConcurrencyLimiter | AdaptiveConcurrencyLimiter:
+    adaptive = execution.adaptive_concurrency
+    if not adaptive.enabled:
+        return StaticConcurrencyLimiter(execution.concurrency)
+    return AdaptiveConcurrencyLimiter(
+        initial=execution.concurrency,
+        min_limit=adaptive.min_concurrency,
+        max_limit=adaptive.max_concurrency,
+        latency_tolerance=adaptive.latency_tolerance,
+        backoff_ratio=adaptive.backoff_ratio,
+    )
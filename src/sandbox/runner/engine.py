@@ -1,17 +1,23 @@
 """主测试执行引擎"""
 
 import asyncio
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
 
+from sandbox.assertion.plan import CasePlan, compile_suite, plan_case
+from sandbox.client.cassette import Cassette, cassette_scope
 from sandbox.client.judge_llm import JudgeLLMClient
+from sandbox.client.pool import ClientPool
 from sandbox.core.logging import get_logger
+from sandbox.runner.concurrency import build_concurrency_limiter
 from sandbox.runner.multi_turn import MultiTurnRunner
+from sandbox.runner.scene_registry import SceneRegistry
+from sandbox.runner.simulated_user import SimulatedUserRunner
 from sandbox.runner.single_turn import SingleTurnRunner
-from sandbox.schema.config import SandboxConfig
+from sandbox.runner.workflow import WorkflowRunner
+from sandbox.schema.config import ExecutionConfig, SandboxConfig
 from sandbox.schema.result import CaseResult, SuiteResult
-from sandbox.schema.scene import SceneFile
-from sandbox.schema.test_case import TestSuiteSpec
-from sandbox.utils.rate_limiter import TokenBucketRateLimiter
-from sandbox.utils.yaml_loader import load_and_validate
+from sandbox.schema.test_case import SuiteMetadata, TestCaseSpec, TestSuiteSpec
+from sandbox.utils.sqlite_cache import SQLiteCache
 
 logger = get_logger(__name__)
 
@@ -23,67 +29,208 @@ class TestEngine:
     职责：
     - 解析 target 配置
     - 分发到对应 Runner
-    - 通过 Semaphore 控制并发度
-    - 汇总结果
+    - 控制并发度：目标（Dify）、Judge 与模拟用户 LLM 各自独立的并发池
+      · 目标名额只在 Dify 请求期间占用（固定上限或按 Dify 反馈自适应）
+      · Judge 断言在拿到 Dify 回答后进入 Judge 并发池，不占用目标名额
+      · 模拟用户生成下一条消息时占用模拟用户名额
+      · 同时进行中的用例数受 max_cases_in_flight 限制
+    - 持有整个运行期间共享的 HTTP 连接池
+    - 可选的 Dify 响应录制 / 回放（cassette 由调用方创建和关闭）
+    - 汇总结果（run_suite），或流式产出结果（iter_results，内存占用恒定）
     """
 
-    def __init__(self, config: SandboxConfig):
+    def __init__(self, config: SandboxConfig, cassette: Cassette | None = None):
         self.config = config
-        self.semaphore = asyncio.Semaphore(config.execution.concurrency)
-        self.rate_limiter = TokenBucketRateLimiter(
-            rpm=config.execution.rate_limit_rpm,
-            burst=config.execution.rate_limit_burst,
+        self.cassette = cassette
+        self.concurrency = build_concurrency_limiter(config.execution)
+        self.max_cases_in_flight = _max_cases_in_flight(config.execution)
+        self._case_admission = asyncio.Semaphore(self.max_cases_in_flight)
+        self.scene_registry = SceneRegistry()
+
+        # 限流在客户端内按每个 HTTP 请求进行（Dify 与 Judge 各自独立）
+        judge_cache = None
+        if config.judge_cache.enabled:
+            judge_cache = SQLiteCache(
+                config.judge_cache.path,
+                max_entries=config.judge_cache.max_entries,
+                max_age_days=config.judge_cache.max_age_days,
+            )
+        transcript_cache = None
+        if config.transcript_cache.enabled:
+            transcript_cache = SQLiteCache(
+                config.transcript_cache.path,
+                max_entries=config.transcript_cache.max_entries,
+                max_age_days=config.transcript_cache.max_age_days,
+            )
+        self.client_pool = ClientPool(
+            config.http,
+            config.retry,
+            config.execution,
+            judge_cache=judge_cache,
+            cassette=cassette,
+            target_slots=self.concurrency,
+            transcript_cache=transcript_cache,
         )
+        self.client_pool.add_target_observer(self.concurrency.record)
 
         # 初始化 Judge LLM 客户端（如果配置了 api_key）
         self.judge_client: JudgeLLMClient | None = None
         if config.judge.api_key:
-            self.judge_client = JudgeLLMClient(config.judge)
+            self.judge_client = self.client_pool.judge_client(config.judge)
+        self.sim_user_client = None
+        if config.simulated_user.api_key:
+            self.sim_user_client = self.client_pool.sim_user_client(config.simulated_user)
+
+        # 所有用例的 Judge 断言共享同一个并发上限
+        runner_options = {
+            "judge_client": self.judge_client,
+            "client_pool": self.client_pool,
+            "batch_judge": config.execution.batch_judge,
+            "judge_semaphore": asyncio.Semaphore(config.execution.judge_concurrency),
+        }
+        self._single_turn_runner = SingleTurnRunner(**runner_options)
+        self._multi_turn_runner = MultiTurnRunner(
+            **runner_options, pipeline_turns=config.execution.pipeline_turns
+        )
+        self._simulated_user_runner = SimulatedUserRunner(
+            **runner_options,
+            sim_client=self.sim_user_client,
+            sim_semaphore=asyncio.Semaphore(config.execution.sim_user_concurrency),
+        )
+        self._workflow_runner = WorkflowRunner(**runner_options)
+
+    async def close(self) -> None:
+        """关闭连接池（包括 Judge LLM 客户端与评分缓存）"""
+        await self.client_pool.close()
+
+    async def __aenter__(self) -> "TestEngine":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def run_suites(
+        self,
+        suite_specs: list[TestSuiteSpec],
+        on_result: Callable[[int, CaseResult], None] | None = None,
+    ) -> list[SuiteResult]:
+        """
+        在同一个事件循环中并发执行多个套件，返回与输入顺序一致的结果
 
-        self._single_turn_runner = SingleTurnRunner(judge_client=self.judge_client)
-        self._multi_turn_runner = MultiTurnRunner(judge_client=self.judge_client)
+        所有套件共享目标 / Judge 并发池、限流与连接池：
+        一个套件的收尾用例执行时，其余套件的用例可以继续占满并发。
+        on_result(套件下标, 用例结果) 在每个用例完成时调用。
 
-    async def run_suite(self, suite_spec: TestSuiteSpec) -> SuiteResult:
-        """执行一个测试套件"""
+        这些共享资源的统计只能按整个运行给出：全部套件结束后取一次快照，
+        各套件的 stats 为同一份运行级统计（scope="run"，suites 列出参与的套件）。
+        """
+
+        def suite_callback(index: int) -> Callable[[CaseResult], None] | None:
+            if on_result is None:
+                return None
+            return lambda result: on_result(index, result)
+
+        results = list(
+            await asyncio.gather(
+                *(
+                    self._run_suite(spec, on_result=suite_callback(i))
+                    for i, spec in enumerate(suite_specs)
+                )
+            )
+        )
+        stats = self.run_stats([spec.suite.name for spec in suite_specs])
+        for result in results:
+            result.stats = stats
+        return results
+
+    async def run_suite(
+        self,
+        suite_spec: TestSuiteSpec,
+        on_result: Callable[[CaseResult], None] | None = None,
+    ) -> SuiteResult:
+        """
+        执行一个测试套件
+
+        on_result 在每个用例完成时立即调用（如写入 JSONL 结果文件），
+        返回的结果仍按用例定义顺序排列。
+        stats 为引擎的运行级统计（同一引擎并发执行多个套件时请使用 run_suites）。
+        """
+        result = await self._run_suite(suite_spec, on_result)
+        result.stats = self.run_stats([suite_spec.suite.name])
+        return result
+
+    def run_stats(self, suite_names: list[str]) -> dict:
+        """运行级统计：并发、限流、缓存等在同一引擎的全部套件间共享，不能按套件拆分"""
+        stats = {
+            "scope": "run",
+            "suites": suite_names,
+            "concurrency": {
+                **self.concurrency.stats(),
+                "judge_limit": self.config.execution.judge_concurrency,
+                "max_cases_in_flight": self.max_cases_in_flight,
+            },
+            "rate_limits": self.client_pool.rate_limit_stats(),
+            "judge_cache": self.client_pool.judge_cache_stats(),
+            "sim_user": {
+                **self.client_pool.sim_user_stats(),
+                "limit": self.config.execution.sim_user_concurrency,
+            },
+        }
+        if self.cassette is not None:
+            stats["cassette"] = self.cassette.stats()
+        return stats
+
+    async def _run_suite(
+        self,
+        suite_spec: TestSuiteSpec,
+        on_result: Callable[[CaseResult], None] | None = None,
+    ) -> SuiteResult:
         target_name = suite_spec.suite.target
         if target_name not in self.config.targets:
             logger.error(f"目标 '{target_name}' 未在配置中定义")
+            case_results = [
+                CaseResult(
+                    case_id=case.id,
+                    status="error",
+                    error_message=f"目标 '{target_name}' 未在配置中定义",
+                )
+                for case in suite_spec.cases
+            ]
+            if on_result is not None:
+                for case_result in case_results:
+                    on_result(case_result)
             return SuiteResult(
                 suite_name=suite_spec.suite.name,
                 target=target_name,
-                case_results=[
-                    CaseResult(
-                        case_id=case.id,
-                        status="error",
-                        error_message=f"目标 '{target_name}' 未在配置中定义",
-                    )
-                    for case in suite_spec.cases
-                ],
+                case_results=case_results,
             )
 
         target_config = self.config.targets[target_name]
         shared_inputs = suite_spec.suite.shared_inputs
 
-        tasks = [
-            self._run_case_with_semaphore(case, target_config, shared_inputs)
-            for case in suite_spec.cases
-        ]
-
-        case_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # 处理异常结果
-        processed: list[CaseResult] = []
-        for i, result in enumerate(case_results):
-            if isinstance(result, Exception):
-                processed.append(
-                    CaseResult(
-                        case_id=suite_spec.cases[i].id,
-                        status="error",
-                        error_message=str(result),
-                    )
+        # 在事件循环外预加载引用的场景，再一次性编译全部断言，
+        # 配置错误在发出任何请求前暴露
+        scenes = await self.scene_registry.preload(
+            case.judge_scene for case in suite_spec.cases if case.judge_scene
+        )
+        plans = compile_suite(suite_spec, judge_client=self.judge_client, scenes=scenes)
+
+        async def run_one(case: TestCaseSpec, plan: CasePlan) -> CaseResult:
+            try:
+                result = await self._run_case(
+                    suite_spec.suite.name, case, plan, target_config, shared_inputs
                 )
-            else:
-                processed.append(result)
+            except Exception as e:
+                result = CaseResult(case_id=case.id, status="error", error_message=str(e))
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        processed = list(
+            await asyncio.gather(
+                *(run_one(case, plan) for case, plan in zip(suite_spec.cases, plans))
+            )
+        )
 
         return SuiteResult(
             suite_name=suite_spec.suite.name,
@@ -91,27 +238,102 @@ class TestEngine:
             case_results=processed,
         )
 
-    async def _run_case_with_semaphore(self, case, target_config, shared_inputs) -> CaseResult:
-        async with self.semaphore:
-            await self.rate_limiter.acquire()
-            runner = self._get_runner(case.type)
+    async def iter_results(
+        self,
+        suite: SuiteMetadata,
+        cases: Iterable[TestCaseSpec] | AsyncIterable[TestCaseSpec],
+        workers: int | None = None,
+    ) -> AsyncIterator[CaseResult]:
+        """
+        工作池模式：逐个消费用例并按完成顺序产出 CaseResult
+
+        用例可以来自普通迭代器或异步生成器（如大规模数据驱动套件按行生成），
+        经有界队列交给固定数量的 worker 执行，调用方边消费边处理结果。
+        同时存在的用例与结果数量只与 worker 数有关，与用例总数无关。
+
+        workers 默认为 max_cases_in_flight。
+        """
+        workers = workers or self.max_cases_in_flight
+        target_config = self.config.targets.get(suite.target)
+        if target_config is None:
+            logger.error(f"目标 '{suite.target}' 未在配置中定义")
+
+        case_queue: asyncio.Queue[TestCaseSpec | None] = asyncio.Queue(maxsize=workers)
+        result_queue: asyncio.Queue[CaseResult | None] = asyncio.Queue(maxsize=workers)
+
+        async def produce() -> None:
+            try:
+                if isinstance(cases, AsyncIterable):
+                    async for case in cases:
+                        await case_queue.put(case)
+                else:
+                    for case in cases:
+                        await case_queue.put(case)
+            finally:
+                # 每个 worker 一个结束标记；被取消说明调用方已提前退出，
+                # 队列无人消费，不再发送（否则会永远阻塞在已满的队列上）
+                if not asyncio.current_task().cancelling():
+                    for _ in range(workers):
+                        await case_queue.put(None)
 
-            # 加载黄金场景（如果测试用例引用了场景文件）
-            scene = None
-            if case.judge_scene:
-                try:
-                    scene_file = load_and_validate(case.judge_scene, SceneFile)
-                    scene = scene_file.scene
-                    logger.info(f"用例 {case.id} 加载场景: {scene.name}")
-                except Exception as e:
-                    logger.error(f"用例 {case.id} 加载场景失败: {e}")
-                    return CaseResult(
-                        case_id=case.id,
-                        status="error",
-                        error_message=f"加载场景文件失败: {e}",
-                    )
-
-            return await runner.execute(case, target_config, shared_inputs, scene=scene)
+        async def work() -> None:
+            while (case := await case_queue.get()) is not None:
+                await result_queue.put(await self._run_streamed_case(suite, case, target_config))
+            await result_queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        worker_tasks = [asyncio.create_task(work()) for _ in range(workers)]
+        try:
+            finished = 0
+            while finished < workers:
+                result = await result_queue.get()
+                if result is None:
+                    finished += 1
+                else:
+                    yield result
+            # 用例迭代器抛出的异常在此传递给调用方
+            await producer
+        finally:
+            for task in (producer, *worker_tasks):
+                task.cancel()
+            await asyncio.gather(producer, *worker_tasks, return_exceptions=True)
+
+    async def _run_streamed_case(
+        self, suite: SuiteMetadata, case: TestCaseSpec, target_config
+    ) -> CaseResult:
+        """工作池中执行单个用例：按需加载场景、编译断言，异常转为 error 结果"""
+        if target_config is None:
+            return CaseResult(
+                case_id=case.id,
+                status="error",
+                error_message=f"目标 '{suite.target}' 未在配置中定义",
+            )
+        scene = None
+        if case.judge_scene:
+            try:
+                scene = await asyncio.to_thread(self.scene_registry.load, case.judge_scene)
+            except Exception as e:
+                scene = e
+        plan = plan_case(case, judge_client=self.judge_client, scene=scene)
+        try:
+            return await self._run_case(suite.name, case, plan, target_config, suite.shared_inputs)
+        except Exception as e:
+            return CaseResult(case_id=case.id, status="error", error_message=str(e))
+
+    async def _run_case(
+        self, suite_name, case, plan: CasePlan, target_config, shared_inputs
+    ) -> CaseResult:
+        if plan.error:
+            return CaseResult(case_id=case.id, status="error", error_message=plan.error)
+
+        # 每个用例运行在独立的 Task 中，录制 / 回放的作用域互不影响
+        cassette_scope.set((suite_name, case.id))
+        # 目标并发名额由 Dify 客户端按请求占用，这里只限制进行中的用例数
+        async with self._case_admission:
+            runner = self._get_runner(case.type)
+            return await runner.execute(
+                case, target_config, shared_inputs, scene=plan.scene, plan=plan
+            )
 
     def _get_runner(self, case_type: str):
         match case_type:
@@ -119,5 +341,18 @@ class TestEngine:
                 return self._single_turn_runner
             case "multi_turn":
                 return self._multi_turn_runner
+            case "simulated_user":
+                return self._simulated_user_runner
+            case "workflow":
+                return self._workflow_runner
             case _:
-                raise ValueError(f"Runner 类型 '{case_type}' 将在后续阶段实现")
+                raise ValueError(f"未知的 Runner 类型 '{case_type}'")
+
+
+def _max_cases_in_flight(execution: ExecutionConfig) -> int:
+    """进行中用例数上限：未配置时为目标并发上限 + Judge 并发上限"""
+    if execution.max_cases_in_flight is not None:
+        return execution.max_cases_in_flight
+    adaptive = execution.adaptive_concurrency
+    target_limit = adaptive.max_concurrency if adaptive.enabled else execution.concurrency
+    return target_limit + execution.judge_concurrency
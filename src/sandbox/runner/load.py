@@ -0,0 +1,200 @@
+"""开环压测 — sandbox load
+
+与 TestEngine（闭环：一个请求完成后才发出下一个）不同，压测按预先确定的到达时刻
+发出会话，不等待之前的响应：
+- 到达过程：poisson（指数分布间隔）或 constant（固定间隔），平均速率为 rps
+- 请求组合：按顺序轮流复用套件中的用例（单轮 input / 多轮 turns，含 shared_inputs）
+- 时延从计划到达时刻起算（多轮的后续轮次从该轮发出时起算），
+  压测端自身排队的时间也计入，避免协同遗漏（coordinated omission）
+- 时延记录在 HDR 风格直方图中，并按完成时刻划分时间窗口统计吞吐与错误率
+- 不评估断言、不重试、不经过客户端限流与熔断器（客户端池以 retry_guards=False 创建），
+  错误率与时延都是目标本身的表现；进行中会话超过 max_in_flight 时新到达直接计为丢弃
+
+只支持 chatflow 目标的 single_turn / multi_turn 用例，其余类型的用例被忽略。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+from collections.abc import Iterator
+from typing import Literal
+
+from sandbox.client.dify_chat import DifyChatClient
+from sandbox.core.exceptions import SandboxError
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import TargetConfig
+from sandbox.schema.result import LoadResult, LoadWindow
+from sandbox.schema.test_case import TestCaseSpec, TestSuiteSpec
+
+logger = get_logger(__name__)
+
+
+def load_target(target: TargetConfig) -> TargetConfig:
+    """
+    压测用的目标配置：关闭重试与客户端限流，时延反映目标的真实表现
+
+    熔断器与重试预算挂在客户端池上，压测时由 ClientPool(retry_guards=False) 关闭。
+    """
+    return target.model_copy(
+        update={
+            "max_retries": 0,
+            "rate_limit_rpm": None,
+            "rate_limit_burst": None,
+            "rate_limit_tpm": None,
+        }
+    )
+
+
+class LoadRunner:
+    """开环压测执行器"""
+
+    def __init__(
+        self,
+        client: DifyChatClient,
+        rps: float,
+        duration_s: float,
+        arrival: Literal["poisson", "constant"] = "poisson",
+        window_s: float = 1.0,
+        max_in_flight: int = 1000,
+        seed: int | None = None,
+    ):
+        if rps <= 0 or duration_s <= 0 or window_s <= 0:
+            raise SandboxError("rps、duration 与 window 必须大于 0")
+        self.client = client
+        self.rps = rps
+        self.duration_s = duration_s
+        self.arrival = arrival
+        self.window_s = window_s
+        self.max_in_flight = max_in_flight
+        self._rng = random.Random(seed)
+
+    async def run(self, suite_spec: TestSuiteSpec) -> LoadResult:
+        cases = [case for case in suite_spec.cases if _runnable(case)]
+        skipped = len(suite_spec.cases) - len(cases)
+        if skipped:
+            logger.warning(f"压测忽略 {skipped} 个不支持的用例（仅支持单轮 / 多轮）")
+        if not cases:
+            raise SandboxError(f"套件 {suite_spec.suite.name} 没有可用于压测的用例")
+
+        result = LoadResult(
+            suite_name=suite_spec.suite.name,
+            target=suite_spec.suite.target,
+            rps=self.rps,
+            duration_s=self.duration_s,
+            arrival=self.arrival,
+            window_s=self.window_s,
+        )
+        shared_inputs = suite_spec.suite.shared_inputs
+        tasks: set[asyncio.Task] = set()
+        start = time.monotonic()
+
+        for sequence, offset in enumerate(self._arrivals()):
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._window(result, offset).sent += 1
+            result.sent += 1
+            if len(tasks) >= self.max_in_flight:
+                result.dropped += 1
+                self._window(result, offset).errors += 1
+                continue
+            case = cases[sequence % len(cases)]
+            task = asyncio.create_task(
+                self._session(result, case, shared_inputs, start, start + offset, sequence)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # 到达结束后等待进行中的会话完成
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        result.elapsed_s = time.monotonic() - start
+        return result
+
+    def _arrivals(self) -> Iterator[float]:
+        """相对开始时刻的到达时间（秒），直到 duration 结束"""
+        offset = 0.0
+        for sequence in itertools.count(1):
+            if self.arrival == "constant":
+                offset = sequence / self.rps
+            else:
+                offset += self._rng.expovariate(self.rps)
+            if offset >= self.duration_s:
+                return
+            yield offset
+
+    async def _session(
+        self,
+        result: LoadResult,
+        case: TestCaseSpec,
+        shared_inputs: dict | None,
+        start: float,
+        scheduled: float,
+        sequence: int,
+    ) -> None:
+        """执行一个会话（单轮用例一个请求，多轮用例按脚本依次发送各轮）
+
+        任何异常（含构造请求时的错误）都计入错误数，不会遗留在未读取的任务中。
+        """
+        try:
+            await self._send_session(result, case, shared_inputs or {}, start, scheduled, sequence)
+        except Exception as e:
+            window = self._window(result, time.monotonic() - start)
+            window.errors += 1
+            result.errors += 1
+            logger.debug(f"压测请求失败 ({case.id}): {e}")
+
+    async def _send_session(
+        self,
+        result: LoadResult,
+        case: TestCaseSpec,
+        shared_inputs: dict,
+        start: float,
+        scheduled: float,
+        sequence: int,
+    ) -> None:
+        if case.type == "single_turn":
+            requests = [(case.input.query, {**shared_inputs, **(case.input.inputs or {})})]
+            user = case.input.user or f"sandbox_load_{sequence}"
+        else:
+            requests = [
+                (turn.user, shared_inputs if i == 0 else {}) for i, turn in enumerate(case.turns)
+            ]
+            user = f"sandbox_load_{sequence}"
+
+        conversation_id = ""
+        sent_at = scheduled
+        for query, inputs in requests:
+            response = await self.client.send_message(
+                query=query, conversation_id=conversation_id, user=user, inputs=inputs
+            )
+            finished = time.monotonic()
+            latency_ms = (finished - sent_at) * 1000
+            window = self._window(result, finished - start)
+            window.completed += 1
+            window.latency.record(latency_ms)
+            result.completed += 1
+            result.latency.record(latency_ms)
+            if response.ttft_ms is not None:
+                result.ttft.record(response.ttft_ms)
+            conversation_id = response.conversation_id
+            sent_at = finished
+
+    def _window(self, result: LoadResult, offset: float) -> LoadWindow:
+        index = int(offset // self.window_s)
+        window = result.windows.get(index)
+        if window is None:
+            window = LoadWindow(index=index, start_s=index * self.window_s)
+            result.windows[index] = window
+        return window
+
+
+def _runnable(case: TestCaseSpec) -> bool:
+    if case.type == "single_turn":
+        return case.input is not None
+    if case.type == "multi_turn":
+        return bool(case.turns)
+    return False
@@ -2,28 +2,50 @@
 
 from __future__ import annotations
 
+import asyncio
 from typing import TYPE_CHECKING
 
 from sandbox.assertion.base import AssertionContext
-from sandbox.assertion.builder import build_assertion
+from sandbox.assertion.evaluator import evaluate_assertions
+from sandbox.assertion.performance import evaluate_performance_budget
+from sandbox.assertion.plan import CasePlan, compile_case
+from sandbox.assertion.streaming import create_streaming_evaluator
 from sandbox.client.dify_chat import DifyChatClient
 from sandbox.core.logging import get_logger
 from sandbox.schema.config import TargetConfig
-from sandbox.schema.result import AssertionResult, CaseResult, TurnResult
+from sandbox.schema.result import CaseResult, TurnResult
 from sandbox.schema.test_case import TestCaseSpec
 
 if TYPE_CHECKING:
     from sandbox.client.judge_llm import JudgeLLMClient
+    from sandbox.client.pool import ClientPool
     from sandbox.schema.scene import SceneSpec
 
 logger = get_logger(__name__)
 
 
 class MultiTurnRunner:
-    """脚本化多轮对话测试执行器"""
+    """
+    脚本化多轮对话测试执行器
 
-    def __init__(self, judge_client: JudgeLLMClient | None = None):
+    pipeline_turns=True 时，第 N 轮回答到达后立即发送第 N+1 轮，
+    第 N 轮的断言在后台评估，结束前统一写回对应的 TurnResult。
+    （脚本化轮次的用户消息不依赖断言结果）
+    """
+
+    def __init__(
+        self,
+        judge_client: JudgeLLMClient | None = None,
+        client_pool: ClientPool | None = None,
+        batch_judge: bool = False,
+        judge_semaphore: asyncio.Semaphore | None = None,
+        pipeline_turns: bool = False,
+    ):
         self.judge_client = judge_client
+        self.client_pool = client_pool
+        self.batch_judge = batch_judge
+        self.judge_semaphore = judge_semaphore
+        self.pipeline_turns = pipeline_turns
 
     async def execute(
         self,
@@ -31,23 +53,36 @@ class MultiTurnRunner:
         target: TargetConfig,
         shared_inputs: dict | None = None,
         scene: SceneSpec | None = None,
+        plan: CasePlan | None = None,
     ) -> CaseResult:
         if not case.turns:
             return CaseResult(case_id=case.id, status="error", error_message="多轮测试缺少 turns 配置")
 
-        client = DifyChatClient(target)
+        # 有连接池时复用共享客户端，否则为本用例单独创建
+        owns_client = self.client_pool is None
+        client = DifyChatClient(target) if owns_client else self.client_pool.dify_client(target)
         conversation_id = ""
         turn_results: list[TurnResult] = []
+        # 流水线模式下尚未完成的断言评估：(所属轮次, 后台任务)
+        pending: list[tuple[TurnResult, asyncio.Task]] = []
 
         try:
+            # 未预先编译时（直接调用 Runner）就地编译
+            plan = plan or compile_case(case, judge_client=self.judge_client, scene=scene)
+
             for i, turn in enumerate(case.turns):
                 # inputs 仅首轮传入
                 inputs = shared_inputs if i == 0 else {}
+                assertions = plan.turn(i)
+                evaluator = create_streaming_evaluator(
+                    assertions, enabled=target.response_mode == "streaming" and target.early_abort
+                )
 
                 response = await client.send_message(
                     query=turn.user,
                     conversation_id=conversation_id,
                     inputs=inputs or {},
+                    **(evaluator.send_kwargs() if evaluator else {}),
                 )
                 conversation_id = response.conversation_id
 
@@ -58,25 +93,54 @@ class MultiTurnRunner:
                     bot_response=response.answer,
                     latency_ms=response.latency_ms,
                     token_usage=response.token_usage,
+                    ttft_ms=response.ttft_ms,
+                    mean_chunk_gap_ms=response.mean_chunk_gap_ms,
+                    max_chunk_gap_ms=response.max_chunk_gap_ms,
+                    output_tokens_per_sec=response.output_tokens_per_sec,
+                    abort_reason=response.abort_reason,
                 )
 
+                # 流式提前中止：本轮已确定失败，后续轮次不再执行
+                if evaluator is not None and response.aborted:
+                    turn_result.assertions = evaluator.results_after_abort(
+                        response.answer, response.latency_ms
+                    )
+                    turn_results.append(turn_result)
+                    logger.info(f"用例 {case.id} 第 {i + 1} 轮提前中止 ({response.abort_reason})")
+                    break
+
                 # 逐轮评估断言
-                assertion_results: list[AssertionResult] = []
                 ctx = AssertionContext(history=turn_results + [turn_result], turn_index=i)
                 raw_with_meta = {**response.raw_data, "_latency_ms": response.latency_ms}
-
-                for spec in turn.assertions:
-                    assertion = build_assertion(spec, judge_client=self.judge_client, scene=scene)
-                    result = await assertion.evaluate(response.answer, raw_with_meta, ctx)
-                    assertion_results.append(result)
-
-                turn_result.assertions = assertion_results
+                evaluation = evaluate_assertions(
+                    assertions,
+                    response.answer,
+                    raw_with_meta,
+                    ctx,
+                    batch_judge=self.batch_judge,
+                    judge_semaphore=self.judge_semaphore,
+                )
+                if self.pipeline_turns:
+                    pending.append((turn_result, asyncio.create_task(evaluation)))
+                else:
+                    turn_result.assertions = await evaluation
                 turn_results.append(turn_result)
 
-            return CaseResult(case_id=case.id, status="completed", turns=turn_results)
+            await collect_pending(pending)
+            return CaseResult(
+                case_id=case.id,
+                status="completed",
+                turns=turn_results,
+                final_assertions=evaluate_performance_budget(case.performance, turn_results),
+            )
 
         except Exception as e:
             logger.error(f"用例 {case.id} 执行失败: {e}")
+            # 已完成轮次的断言结果仍然保留
+            try:
+                await collect_pending(pending)
+            except Exception:
+                pass
             return CaseResult(
                 case_id=case.id,
                 status="error",
@@ -84,4 +148,23 @@ class MultiTurnRunner:
                 error_message=str(e),
             )
         finally:
-            await client.close()
+            for _, task in pending:
+                task.cancel()
+            if owns_client:
+                await client.close()
+
+
+async def collect_pending(pending: list[tuple[TurnResult, asyncio.Task]]) -> None:
+    """等待后台断言评估完成并写回对应轮次，有评估出错时抛出第一个异常"""
+    if not pending:
+        return
+    outcomes = await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+    error: BaseException | None = None
+    for (turn_result, _), outcome in zip(pending, outcomes):
+        if isinstance(outcome, BaseException):
+            error = error or outcome
+        else:
+            turn_result.assertions = outcome
+    pending.clear()
+    if error is not None:
+        raise error
@@ -0,0 +1,119 @@
+"""增量运行的用例结果缓存
+
+用例指纹 = 用例规格 + 套件 shared_inputs + 目标配置 + 引用的场景文件与词表文件内容
++ Judge 配置（仅使用 Judge 的用例）+ prompt_version。
+指纹未变化的用例直接复用上次的 CaseResult，不再请求 Dify / Judge；
+任一输入变化（包括场景 / 词表文件被编辑、更换 Judge 模型、Prompt 版本更新）都会得到新的指纹。
+
+- 目标配置只取影响回答的字段，api_key 以摘要参与（不落盘明文）
+- Judge 配置只取影响评分的字段（api_base、model、temperature、batch_judge）
+- status="error" 的结果不缓存，下次运行会重新执行
+"""
+
+import asyncio
+import hashlib
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import LLMConfig, TargetConfig
+from sandbox.schema.result import CaseResult
+from sandbox.schema.test_case import TestCaseSpec
+from sandbox.utils.sqlite_cache import SQLiteCache
+
+logger = get_logger(__name__)
+
+# 影响回答内容的目标配置字段（超时、重试、限流等不影响结果）
+_TARGET_FIELDS = ("api_base", "app_type", "response_mode", "early_abort")
+# 影响评分的 Judge 配置字段
+_JUDGE_FIELDS = ("api_base", "model", "temperature")
+_JUDGE_ASSERTIONS = ("llm_judge", "scene_judge")
+
+
+class ResultCache:
+    """用例结果缓存（指纹 -> CaseResult）"""
+
+    def __init__(
+        self,
+        cache: SQLiteCache,
+        prompt_version: str = "",
+        judge: LLMConfig | None = None,
+        batch_judge: bool = False,
+    ):
+        self.cache = cache
+        self.prompt_version = prompt_version
+        self.judge = (
+            {field: getattr(judge, field) for field in _JUDGE_FIELDS} if judge is not None else {}
+        )
+        self.judge["batch_judge"] = batch_judge
+        self._file_digests: dict[str, str] = {}
+
+    def fingerprint(
+        self, case: TestCaseSpec, shared_inputs: dict | None, target_config: TargetConfig
+    ) -> str:
+        target = {field: getattr(target_config, field) for field in _TARGET_FIELDS}
+        target["api_key"] = hashlib.sha256(target_config.api_key.encode("utf-8")).hexdigest()
+        case_data = case.model_dump(mode="json")
+        values_files, assertion_types = _scan_assertions(case_data)
+        uses_judge = bool(case.judge_scene) or any(t in _JUDGE_ASSERTIONS for t in assertion_types)
+        content = {
+            "case": case_data,
+            "shared_inputs": shared_inputs,
+            "target": target,
+            "scene": self._file_digest(case.judge_scene) if case.judge_scene else None,
+            "lexicons": {path: self._file_digest(path) for path in sorted(values_files)},
+            "judge": self.judge if uses_judge else None,
+            "prompt_version": self.prompt_version,
+        }
+        canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, fingerprint: str) -> CaseResult | None:
+        value = self.cache.get(fingerprint)
+        return CaseResult.from_dict(json.loads(value)) if value is not None else None
+
+    def put(self, fingerprint: str, case_result: CaseResult) -> None:
+        if case_result.status == "error":
+            return
+        self.cache.put(fingerprint, json.dumps(asdict(case_result), ensure_ascii=False))
+
+    async def aput(self, fingerprint: str, case_result: CaseResult) -> None:
+        """在事件循环之外写入（运行期间每个用例完成时调用）"""
+        await asyncio.to_thread(self.put, fingerprint, case_result)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def close(self) -> None:
+        self.cache.close()
+
+    def _file_digest(self, path: str) -> str:
+        """场景 / 词表文件内容摘要（每次运行每个文件只读取一次；文件不存在时为空）"""
+        digest = self._file_digests.get(path)
+        if digest is None:
+            try:
+                data = Path(path).read_bytes()
+            except OSError:
+                data = b""
+            digest = hashlib.sha256(data).hexdigest()
+            self._file_digests[path] = digest
+        return digest
+
+
+def _scan_assertions(data) -> tuple[set[str], set[str]]:
+    """遍历用例数据中的所有断言（含嵌套），返回 (values_file 路径, 断言类型)"""
+    values_files: set[str] = set()
+    types: set[str] = set()
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if item.get("values_file"):
+                values_files.add(item["values_file"])
+            if isinstance(item.get("type"), str):
+                types.add(item["type"])
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return values_files, types
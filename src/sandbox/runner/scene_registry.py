@@ -0,0 +1,55 @@
+"""黄金场景注册表 — 套件开始时在事件循环外预加载全部场景
+
+- 每个场景文件按绝对路径缓存，只解析一次
+- 文件修改时间变化后重新加载
+- 文件读取与 YAML 解析通过 asyncio.to_thread 执行，不阻塞事件循环
+"""
+
+import asyncio
+from collections.abc import Iterable
+from pathlib import Path
+
+from sandbox.core.exceptions import YAMLValidationError
+from sandbox.core.logging import get_logger
+from sandbox.schema.scene import SceneFile, SceneSpec
+from sandbox.utils.yaml_loader import load_and_validate
+
+logger = get_logger(__name__)
+
+
+class SceneRegistry:
+    """黄金场景缓存（整个运行期间共享）"""
+
+    def __init__(self):
+        self._entries: dict[Path, tuple[float, SceneSpec]] = {}
+        self.loads = 0
+
+    def load(self, path: str) -> SceneSpec:
+        """同步取得场景（缓存有效时不读取文件内容）"""
+        resolved = Path(path).resolve()
+        try:
+            mtime = resolved.stat().st_mtime
+        except FileNotFoundError:
+            raise YAMLValidationError(f"文件不存在: {path}", file_path=str(path)) from None
+
+        entry = self._entries.get(resolved)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+        scene = load_and_validate(resolved, SceneFile).scene
+        self._entries[resolved] = (mtime, scene)
+        self.loads += 1
+        logger.info(f"加载场景: {scene.name} ({path})")
+        return scene
+
+    async def preload(self, paths: Iterable[str]) -> dict[str, SceneSpec | Exception]:
+        """
+        并发加载一组场景文件（在线程中执行）
+
+        返回 路径 -> 场景；加载失败的路径对应异常对象，由调用方决定如何报告。
+        """
+        unique = list(dict.fromkeys(paths))
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.load, path) for path in unique), return_exceptions=True
+        )
+        return dict(zip(unique, results))
@@ -0,0 +1,76 @@
+"""套件分片 — 把一个大套件拆到多个进程 / CI 机器上执行
+
+run --shard i/n 时，每个进程独立计算同一个确定性的划分，只执行第 i 片：
+- 用例按权重（历史耗时）从大到小依次分给当前负载最小的分片（LPT 贪心）
+- 权重相同按用例 ID 排序，分片负载相同取编号小的，结果与进程、机器无关
+- 没有历史耗时的用例按已知耗时的中位数计；完全没有历史时每个用例权重为 1
+分片内保持用例在套件中的原始顺序。各分片的结果文件由 sandbox merge 合并。
+"""
+
+import heapq
+import statistics
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+from sandbox.report.jsonl_sink import iter_jsonl_records
+from sandbox.schema.test_case import TestCaseSpec
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """解析 "i/n"（i 从 1 开始），格式错误时抛出 ValueError"""
+    index_text, sep, count_text = value.partition("/")
+    if not sep:
+        raise ValueError(f"分片格式应为 i/n: {value}")
+    index, count = int(index_text), int(count_text)
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"分片编号超出范围: {value}")
+    return index, count
+
+
+def partition(
+    case_ids: list[str], shard_count: int, weights: Mapping[str, float] | None = None
+) -> list[list[int]]:
+    """把用例下标划分为 shard_count 片，每片内按原始顺序排列"""
+    weights = weights or {}
+    known = [weights[case_id] for case_id in case_ids if case_id in weights]
+    default = statistics.median(known) if known else 1.0
+
+    def weight(i: int) -> float:
+        return weights.get(case_ids[i], default)
+
+    order = sorted(range(len(case_ids)), key=lambda i: (-weight(i), case_ids[i]))
+    loads = [(0.0, shard) for shard in range(shard_count)]
+    shards: list[list[int]] = [[] for _ in range(shard_count)]
+    for i in order:
+        load, shard = heapq.heappop(loads)
+        shards[shard].append(i)
+        heapq.heappush(loads, (load + weight(i), shard))
+    return [sorted(indices) for indices in shards]
+
+
+def shard_cases(
+    cases: list[TestCaseSpec],
+    index: int,
+    count: int,
+    weights: Mapping[str, float] | None = None,
+) -> list[TestCaseSpec]:
+    """返回第 index 片（从 1 开始）的用例"""
+    shards = partition([case.id for case in cases], count, weights)
+    return [cases[i] for i in shards[index - 1]]
+
+
+def case_durations(paths: Iterable[str | Path]) -> dict[str, float]:
+    """
+    从历史 JSONL 结果文件读取每个用例的耗时（各轮 latency_ms 之和）
+
+    同一用例出现多次时以最后一条为准。
+    """
+    durations: dict[str, float] = {}
+    for path in paths:
+        for record in iter_jsonl_records(path):
+            if record["type"] == "case":
+                case = record["case"]
+                durations[case["case_id"]] = sum(
+                    turn.get("latency_ms") or 0.0 for turn in case.get("turns", [])
+                )
+    return durations
@@ -0,0 +1,226 @@
+"""LLM 驱动的模拟用户对话测试执行器"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from sandbox.assertion.base import AssertionContext
+from sandbox.assertion.evaluator import evaluate_assertions
+from sandbox.assertion.performance import evaluate_performance_budget
+from sandbox.assertion.plan import CasePlan, compile_case
+from sandbox.assertion.streaming import create_streaming_evaluator
+from sandbox.client.dify_chat import DifyChatClient
+from sandbox.core.logging import get_logger
+from sandbox.runner.multi_turn import collect_pending
+from sandbox.schema.config import TargetConfig
+from sandbox.schema.result import AssertionResult, CaseResult, TurnResult
+from sandbox.schema.test_case import AssertionSpec, TestCaseSpec
+
+if TYPE_CHECKING:
+    from sandbox.client.judge_llm import JudgeLLMClient
+    from sandbox.client.pool import ClientPool
+    from sandbox.client.simulated_user import SimulatedUserLLMClient
+    from sandbox.schema.scene import SceneSpec
+
+logger = get_logger(__name__)
+
+
+class SimulatedUserRunner:
+    """
+    LLM 驱动的动态对话测试
+
+    工作流程：
+    1. 发送 first_message 给 Dify 机器人
+    2. 检查停止条件（如匹配到"我是AI"则结束对话并记为失败）
+    3. 逐轮断言在后台评估，不阻塞对话推进
+    4. 模拟用户 LLM 根据对话历史生成下一条消息
+    5. 循环直到达到 max_turns 或触发停止条件
+    6. 执行整段对话断言（final_assertions）与性能预算
+
+    模拟用户 LLM 调用受 sim_semaphore 限制，并有独立的限流桶（见 ClientPool）；
+    客户端启用对话记录缓存时，机器人回答不变的重跑不再调用模拟用户 LLM。
+    """
+
+    def __init__(
+        self,
+        judge_client: JudgeLLMClient | None = None,
+        client_pool: ClientPool | None = None,
+        sim_client: SimulatedUserLLMClient | None = None,
+        batch_judge: bool = False,
+        judge_semaphore: asyncio.Semaphore | None = None,
+        sim_semaphore: asyncio.Semaphore | None = None,
+    ):
+        self.judge_client = judge_client
+        self.client_pool = client_pool
+        self.sim_client = sim_client
+        self.batch_judge = batch_judge
+        self.judge_semaphore = judge_semaphore
+        self.sim_semaphore = sim_semaphore or asyncio.Semaphore(5)
+
+    async def execute(
+        self,
+        case: TestCaseSpec,
+        target: TargetConfig,
+        shared_inputs: dict | None = None,
+        scene: SceneSpec | None = None,
+        plan: CasePlan | None = None,
+    ) -> CaseResult:
+        sim_config = case.simulated_user_config
+        if sim_config is None:
+            return CaseResult(
+                case_id=case.id,
+                status="error",
+                error_message="模拟用户测试缺少 simulated_user_config",
+            )
+        if self.sim_client is None:
+            return CaseResult(
+                case_id=case.id,
+                status="error",
+                error_message="未配置模拟用户 LLM（simulated_user.api_key）",
+            )
+
+        owns_client = self.client_pool is None
+        client = DifyChatClient(target) if owns_client else self.client_pool.dify_client(target)
+        conversation_id = ""
+        user_message = sim_config.first_message
+        turn_results: list[TurnResult] = []
+        # 尚未完成的逐轮断言评估：(所属轮次, 后台任务)
+        pending: list[tuple[TurnResult, asyncio.Task]] = []
+        stop_result: AssertionResult | None = None
+
+        try:
+            plan = plan or compile_case(case, judge_client=self.judge_client, scene=scene)
+            # 逐轮断言对每一轮都相同
+            assertions = plan.turn(0)
+
+            for i in range(sim_config.max_turns):
+                evaluator = create_streaming_evaluator(
+                    assertions, enabled=target.response_mode == "streaming" and target.early_abort
+                )
+                response = await client.send_message(
+                    query=user_message,
+                    conversation_id=conversation_id,
+                    inputs=(shared_inputs or {}) if i == 0 else {},
+                    **(evaluator.send_kwargs() if evaluator else {}),
+                )
+                conversation_id = response.conversation_id
+
+                turn_result = TurnResult(
+                    turn_index=i,
+                    user_message=user_message,
+                    bot_response=response.answer,
+                    latency_ms=response.latency_ms,
+                    token_usage=response.token_usage,
+                    ttft_ms=response.ttft_ms,
+                    mean_chunk_gap_ms=response.mean_chunk_gap_ms,
+                    max_chunk_gap_ms=response.max_chunk_gap_ms,
+                    output_tokens_per_sec=response.output_tokens_per_sec,
+                    abort_reason=response.abort_reason,
+                )
+                turn_results.append(turn_result)
+
+                # 流式提前中止：本轮已确定失败，对话结束
+                if evaluator is not None and response.aborted:
+                    turn_result.assertions = evaluator.results_after_abort(
+                        response.answer, response.latency_ms
+                    )
+                    logger.info(f"用例 {case.id} 第 {i + 1} 轮提前中止 ({response.abort_reason})")
+                    break
+
+                ctx = AssertionContext(history=list(turn_results), turn_index=i)
+                raw_with_meta = {**response.raw_data, "_latency_ms": response.latency_ms}
+
+                # 停止条件决定对话是否继续，须在生成下一条消息前评估
+                stop_result = await self._check_stop_conditions(
+                    plan, sim_config.stop_conditions or [], response.answer, raw_with_meta, ctx
+                )
+                # 下一条用户消息不依赖断言结果：逐轮断言在后台评估
+                evaluation = evaluate_assertions(
+                    assertions,
+                    response.answer,
+                    raw_with_meta,
+                    ctx,
+                    batch_judge=self.batch_judge,
+                    judge_semaphore=self.judge_semaphore,
+                )
+                pending.append((turn_result, asyncio.create_task(evaluation)))
+
+                if stop_result is not None:
+                    logger.info(f"用例 {case.id} 第 {i + 1} 轮触发停止条件")
+                    break
+                if i + 1 == sim_config.max_turns:
+                    break
+                async with self.sim_semaphore:
+                    user_message = await self.sim_client.generate_next_message(
+                        sim_config.system_prompt, turn_results
+                    )
+
+            await collect_pending(pending)
+            if stop_result is not None:
+                turn_results[-1].assertions.append(stop_result)
+
+            final_results = await evaluate_assertions(
+                list(plan.final),
+                turn_results[-1].bot_response,
+                {},
+                AssertionContext(history=turn_results, turn_index=len(turn_results) - 1),
+                batch_judge=self.batch_judge,
+                judge_semaphore=self.judge_semaphore,
+            )
+            final_results.extend(evaluate_performance_budget(case.performance, turn_results))
+            return CaseResult(
+                case_id=case.id,
+                status="completed",
+                turns=turn_results,
+                final_assertions=final_results,
+            )
+
+        except Exception as e:
+            logger.error(f"用例 {case.id} 执行失败: {e}")
+            try:
+                await collect_pending(pending)
+            except Exception:
+                pass
+            return CaseResult(
+                case_id=case.id,
+                status="error",
+                turns=turn_results,
+                error_message=str(e),
+            )
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if owns_client:
+                await client.close()
+
+    async def _check_stop_conditions(
+        self,
+        plan: CasePlan,
+        specs: list[AssertionSpec],
+        response_text: str,
+        raw_response: dict,
+        context: AssertionContext,
+    ) -> AssertionResult | None:
+        """返回第一个成立的停止条件的结果，均不成立时返回 None"""
+        if not plan.stop_conditions:
+            return None
+        results = await evaluate_assertions(
+            list(plan.stop_conditions),
+            response_text,
+            raw_response,
+            context,
+            judge_semaphore=self.judge_semaphore,
+        )
+        for spec, result in zip(specs, results):
+            if not result.passed:
+                continue
+            fail = (spec.on_match or "fail_and_stop") == "fail_and_stop"
+            return AssertionResult(
+                passed=not fail,
+                assertion_type="stop_condition",
+                message=f"触发停止条件 {result.assertion_type}: {result.message}",
+                expected=spec.on_match or "fail_and_stop",
+                actual=result.actual,
+            )
+        return None
@@ -2,18 +2,23 @@
 
 from __future__ import annotations
 
+import asyncio
 from typing import TYPE_CHECKING
 
 from sandbox.assertion.base import AssertionContext
-from sandbox.assertion.builder import build_assertion
+from sandbox.assertion.evaluator import evaluate_assertions
+from sandbox.assertion.performance import evaluate_performance_budget
+from sandbox.assertion.plan import CasePlan, compile_case
+from sandbox.assertion.streaming import create_streaming_evaluator
 from sandbox.client.dify_chat import DifyChatClient
 from sandbox.core.logging import get_logger
 from sandbox.schema.config import TargetConfig
-from sandbox.schema.result import AssertionResult, CaseResult, TurnResult
+from sandbox.schema.result import CaseResult, TurnResult
 from sandbox.schema.test_case import TestCaseSpec
 
 if TYPE_CHECKING:
     from sandbox.client.judge_llm import JudgeLLMClient
+    from sandbox.client.pool import ClientPool
 
 logger = get_logger(__name__)
 
@@ -21,29 +26,49 @@ logger = get_logger(__name__)
 class SingleTurnRunner:
     """单轮测试执行器"""
 
-    def __init__(self, judge_client: JudgeLLMClient | None = None):
+    def __init__(
+        self,
+        judge_client: JudgeLLMClient | None = None,
+        client_pool: ClientPool | None = None,
+        batch_judge: bool = False,
+        judge_semaphore: asyncio.Semaphore | None = None,
+    ):
         self.judge_client = judge_client
+        self.client_pool = client_pool
+        self.batch_judge = batch_judge
+        self.judge_semaphore = judge_semaphore
 
     async def execute(
         self,
         case: TestCaseSpec,
         target: TargetConfig,
         shared_inputs: dict | None = None,
+        plan: CasePlan | None = None,
         **kwargs,
     ) -> CaseResult:
         if case.input is None:
             return CaseResult(case_id=case.id, status="error", error_message="单轮测试缺少 input 配置")
 
-        client = DifyChatClient(target)
+        # 有连接池时复用共享客户端，否则为本用例单独创建
+        owns_client = self.client_pool is None
+        client = DifyChatClient(target) if owns_client else self.client_pool.dify_client(target)
         try:
             # 合并 shared_inputs 和 case 级别 inputs
             inputs = {**(shared_inputs or {}), **(case.input.inputs or {})}
             user = case.input.user or "sandbox_test"
 
+            # 未预先编译时（直接调用 Runner）就地编译
+            plan = plan or compile_case(case, judge_client=self.judge_client)
+            assertions = plan.turn(0)
+            evaluator = create_streaming_evaluator(
+                assertions, enabled=target.response_mode == "streaming" and target.early_abort
+            )
+
             response = await client.send_message(
                 query=case.input.query,
                 user=user,
                 inputs=inputs,
+                **(evaluator.send_kwargs() if evaluator else {}),
             )
 
             # 构建 TurnResult（用于断言上下文）
@@ -53,27 +78,44 @@ class SingleTurnRunner:
                 bot_response=response.answer,
                 latency_ms=response.latency_ms,
                 token_usage=response.token_usage,
+                ttft_ms=response.ttft_ms,
+                mean_chunk_gap_ms=response.mean_chunk_gap_ms,
+                max_chunk_gap_ms=response.max_chunk_gap_ms,
+                output_tokens_per_sec=response.output_tokens_per_sec,
+                abort_reason=response.abort_reason,
             )
 
-            # 评估断言
-            assertion_results: list[AssertionResult] = []
-            for spec in case.assertions or []:
-                assertion = build_assertion(spec, judge_client=self.judge_client)
+            # 评估断言（流式提前中止时使用增量评估的结论）
+            if evaluator is not None and response.aborted:
+                turn_result.assertions = evaluator.results_after_abort(
+                    response.answer, response.latency_ms
+                )
+            else:
                 # 将延迟和 token 信息注入 raw_response 供性能断言使用
                 raw_with_meta = {
                     **response.raw_data,
                     "_latency_ms": response.latency_ms,
                 }
                 ctx = AssertionContext(history=[turn_result], turn_index=0)
-                result = await assertion.evaluate(response.answer, raw_with_meta, ctx)
-                assertion_results.append(result)
-
-            turn_result.assertions = assertion_results
-
-            return CaseResult(case_id=case.id, status="completed", turns=[turn_result])
+                turn_result.assertions = await evaluate_assertions(
+                    assertions,
+                    response.answer,
+                    raw_with_meta,
+                    ctx,
+                    batch_judge=self.batch_judge,
+                    judge_semaphore=self.judge_semaphore,
+                )
+
+            return CaseResult(
+                case_id=case.id,
+                status="completed",
+                turns=[turn_result],
+                final_assertions=evaluate_performance_budget(case.performance, [turn_result]),
+            )
 
         except Exception as e:
             logger.error(f"用例 {case.id} 执行失败: {e}")
             return CaseResult(case_id=case.id, status="error", error_message=str(e))
         finally:
-            await client.close()
+            if owns_client:
+                await client.close()
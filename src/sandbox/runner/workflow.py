@@ -0,0 +1,117 @@
+"""工作流测试执行器"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import TYPE_CHECKING
+
+from sandbox.assertion.base import AssertionContext
+from sandbox.assertion.evaluator import evaluate_assertions
+from sandbox.assertion.performance import evaluate_performance_budget
+from sandbox.assertion.plan import CasePlan, compile_case
+from sandbox.client.dify_workflow import DifyWorkflowClient
+from sandbox.core.logging import get_logger
+from sandbox.schema.config import TargetConfig
+from sandbox.schema.result import CaseResult, TurnResult
+from sandbox.schema.test_case import TestCaseSpec
+
+if TYPE_CHECKING:
+    from sandbox.client.judge_llm import JudgeLLMClient
+    from sandbox.client.pool import ClientPool
+
+logger = get_logger(__name__)
+
+
+class WorkflowRunner:
+    """
+    工作流测试执行器
+
+    调用一次 /workflows/run，断言针对 outputs 的 JSON 文本评估
+    （raw_response 为完整响应，结构与 blocking 模式一致：{"data": {"outputs": ...}}）。
+    streaming 模式下 TurnResult.nodes 记录各节点耗时与 Token 用量。
+    """
+
+    def __init__(
+        self,
+        judge_client: JudgeLLMClient | None = None,
+        client_pool: ClientPool | None = None,
+        batch_judge: bool = False,
+        judge_semaphore: asyncio.Semaphore | None = None,
+    ):
+        self.judge_client = judge_client
+        self.client_pool = client_pool
+        self.batch_judge = batch_judge
+        self.judge_semaphore = judge_semaphore
+
+    async def execute(
+        self,
+        case: TestCaseSpec,
+        target: TargetConfig,
+        shared_inputs: dict | None = None,
+        plan: CasePlan | None = None,
+        **kwargs,
+    ) -> CaseResult:
+        if case.input is None:
+            return CaseResult(
+                case_id=case.id, status="error", error_message="工作流测试缺少 input 配置"
+            )
+        if target.app_type != "workflow":
+            return CaseResult(
+                case_id=case.id,
+                status="error",
+                error_message=f"工作流测试的目标必须是 workflow 应用（当前为 {target.app_type}）",
+            )
+
+        owns_client = self.client_pool is None
+        client = (
+            DifyWorkflowClient(target) if owns_client else self.client_pool.workflow_client(target)
+        )
+        try:
+            inputs = {**(shared_inputs or {}), **(case.input.inputs or {})}
+            user = case.input.user or "sandbox_test"
+            plan = plan or compile_case(case, judge_client=self.judge_client)
+
+            response = await client.run(inputs, user=user)
+            output_text = json.dumps(response.outputs, ensure_ascii=False)
+
+            turn_result = TurnResult(
+                turn_index=0,
+                user_message=json.dumps(inputs, ensure_ascii=False),
+                bot_response=output_text,
+                latency_ms=response.latency_ms,
+                token_usage=response.token_usage,
+                ttft_ms=response.ttft_ms,
+                nodes=response.nodes,
+            )
+            if response.status != "succeeded":
+                failed = [node.title for node in response.nodes if node.status == "failed"]
+                message = f"工作流执行{response.status or '失败'}: {response.error_message or ''}"
+                if failed:
+                    message += f"（失败节点: {', '.join(failed)}）"
+                return CaseResult(
+                    case_id=case.id, status="error", turns=[turn_result], error_message=message
+                )
+
+            raw_with_meta = {**response.raw_data, "_latency_ms": response.latency_ms}
+            turn_result.assertions = await evaluate_assertions(
+                plan.turn(0),
+                output_text,
+                raw_with_meta,
+                AssertionContext(history=[turn_result], turn_index=0),
+                batch_judge=self.batch_judge,
+                judge_semaphore=self.judge_semaphore,
+            )
+            return CaseResult(
+                case_id=case.id,
+                status="completed",
+                turns=[turn_result],
+                final_assertions=evaluate_performance_budget(case.performance, [turn_result]),
+            )
+
+        except Exception as e:
+            logger.error(f"用例 {case.id} 执行失败: {e}")
+            return CaseResult(case_id=case.id, status="error", error_message=str(e))
+        finally:
+            if owns_client:
+                await client.close()
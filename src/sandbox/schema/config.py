@@ -15,8 +15,14 @@ class TargetConfig(BaseModel):
     api_key: str
     app_type: Literal["chatflow", "workflow"] = "chatflow"
     response_mode: Literal["blocking", "streaming"] = "blocking"
+    # streaming 模式下，断言结论已确定失败时提前中止请求
+    early_abort: bool = True
     timeout: float = 30.0
     max_retries: int = 2
+    # 按端点限流（未设置时使用 execution 中的默认值）
+    rate_limit_rpm: int | None = None
+    rate_limit_burst: int | None = None
+    rate_limit_tpm: int | None = None
 
 
 class LLMConfig(BaseModel):
@@ -27,15 +33,100 @@ class LLMConfig(BaseModel):
     model: str = "gpt-4o"
     temperature: float = 0.0
     timeout: float = 60.0
+    # 按端点限流（rpm 未设置时不限流）
+    rate_limit_rpm: int | None = None
+    rate_limit_burst: int = 10
+    rate_limit_tpm: int | None = None
+
+
+class AdaptiveConcurrencyConfig(BaseModel):
+    """AIMD 自适应并发设置（启用后 concurrency 作为初始值）"""
+
+    enabled: bool = False
+    min_concurrency: int = 1
+    max_concurrency: int = 50
+    # 短期延迟超过长期基线的倍数时视为过载
+    latency_tolerance: float = 2.0
+    # 过载时并发上限乘以该系数
+    backoff_ratio: float = 0.7
 
 
 class ExecutionConfig(BaseModel):
     """执行设置"""
 
     concurrency: int = 5
+    adaptive_concurrency: AdaptiveConcurrencyConfig = Field(
+        default_factory=AdaptiveConcurrencyConfig
+    )
+    # Dify 目标的默认限流（每个 HTTP 请求计一次，含重试）
     rate_limit_rpm: int = 60
     rate_limit_burst: int = 10
+    rate_limit_tpm: int | None = None
     default_user_prefix: str = "sandbox_test"
+    # 同一轮的多个 llm_judge 断言合并为一次 Judge 调用
+    batch_judge: bool = False
+    # 同时进行的 Judge 断言评估数上限（同一轮内的 Judge 断言并发评估）
+    judge_concurrency: int = 10
+    # 多轮用例：发送下一轮时不等待上一轮的断言评估完成
+    pipeline_turns: bool = False
+    # 同时进行中的用例数上限（默认：目标并发上限 + Judge 并发上限）
+    max_cases_in_flight: int | None = None
+    # 同时进行的模拟用户 LLM 调用数上限
+    sim_user_concurrency: int = 5
+
+
+class HTTPConfig(BaseModel):
+    """HTTP 连接池设置（按目标复用，整个运行期间共享）"""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+
+class RetryConfig(BaseModel):
+    """重试策略、重试预算与熔断设置"""
+
+    policy: Literal["decorrelated_jitter", "exponential"] = "decorrelated_jitter"
+    base_delay: float = 1.0
+    # 退避等待上限，同时也是 Retry-After 的上限
+    max_delay: float = 30.0
+    respect_retry_after: bool = True
+    # 整个运行的重试次数上限 = budget_min_retries + budget_ratio × 请求数
+    budget_ratio: float = 0.2
+    budget_min_retries: int = 10
+    # 按 base URL 熔断：连续失败次数阈值、打开后多久允许探测
+    breaker_failure_threshold: int = 5
+    breaker_recovery_timeout: float = 30.0
+
+
+class JudgeCacheConfig(BaseModel):
+    """Judge 评分结果的磁盘缓存（按完整请求内容寻址）"""
+
+    enabled: bool = False
+    path: str = ".sandbox_cache/judge.sqlite"
+    max_entries: int = 100_000
+    max_age_days: float = 30
+
+
+class TranscriptCacheConfig(BaseModel):
+    """模拟用户生成消息的磁盘缓存（按模拟用户 Prompt + 截至当前的对话寻址）"""
+
+    enabled: bool = False
+    path: str = ".sandbox_cache/sim_user.sqlite"
+    max_entries: int = 100_000
+    max_age_days: float = 30
+
+
+class ResultCacheConfig(BaseModel):
+    """增量运行的用例结果缓存（按用例指纹寻址，run --incremental 时启用）"""
+
+    enabled: bool = False
+    path: str = ".sandbox_cache/results.sqlite"
+    max_entries: int = 100_000
+    max_age_days: float = 30
+    # 被测 Prompt 的版本标识，变化后所有用例重新执行
+    prompt_version: str = ""
 
 
 class DimensionConfig(BaseModel):
@@ -64,7 +155,12 @@ class SandboxConfig(BaseModel):
     version: str = "1.0"
     targets: dict[str, TargetConfig] = Field(default_factory=dict)
     judge: LLMConfig = Field(default_factory=LLMConfig)
+    judge_cache: JudgeCacheConfig = Field(default_factory=JudgeCacheConfig)
+    result_cache: ResultCacheConfig = Field(default_factory=ResultCacheConfig)
     simulated_user: LLMConfig = Field(default_factory=LLMConfig)
+    transcript_cache: TranscriptCacheConfig = Field(default_factory=TranscriptCacheConfig)
     execution: ExecutionConfig = Field(default_factory=ExecutionConfig)
+    http: HTTPConfig = Field(default_factory=HTTPConfig)
+    retry: RetryConfig = Field(default_factory=RetryConfig)
     scoring: ScoringConfig = Field(default_factory=ScoringConfig)
     report: ReportConfig = Field(default_factory=ReportConfig)
@@ -3,6 +3,8 @@
 from dataclasses import dataclass, field
 from typing import Any
 
+from sandbox.utils.histogram import Histogram
+
 
 @dataclass
 class AssertionResult:
@@ -18,6 +20,20 @@ class AssertionResult:
     details: Any | None = None
 
 
+@dataclass
+class NodeTiming:
+    """工作流单个节点的执行耗时与 Token 用量（来自 streaming 模式的 node_finished 事件）"""
+
+    node_id: str
+    node_type: str
+    title: str
+    # Dify 上报的节点执行耗时（缺失时为 node_started 到 node_finished 的实测间隔）
+    elapsed_ms: float
+    status: str = "succeeded"
+    token_usage: dict | None = None
+    error: str | None = None
+
+
 @dataclass
 class TurnResult:
     """单轮对话结果"""
@@ -28,6 +44,15 @@ class TurnResult:
     latency_ms: float
     token_usage: dict | None = None
     assertions: list[AssertionResult] = field(default_factory=list)
+    # 流式模式指标
+    ttft_ms: float | None = None
+    mean_chunk_gap_ms: float | None = None
+    max_chunk_gap_ms: float | None = None
+    output_tokens_per_sec: float | None = None
+    # 流式提前中止原因（未中止为 None）
+    abort_reason: str | None = None
+    # 工作流各节点耗时（按完成顺序，仅 workflow 用例的 streaming 模式）
+    nodes: list[NodeTiming] = field(default_factory=list)
 
 
 @dataclass
@@ -40,6 +65,26 @@ class CaseResult:
     final_assertions: list[AssertionResult] = field(default_factory=list)
     error_message: str | None = None
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "CaseResult":
+        """从 asdict() 的结果（如 JSONL 结果文件中的一行）还原"""
+        return cls(
+            case_id=data["case_id"],
+            status=data["status"],
+            turns=[
+                TurnResult(
+                    **{
+                        **turn,
+                        "assertions": [AssertionResult(**a) for a in turn.get("assertions", [])],
+                        "nodes": [NodeTiming(**n) for n in turn.get("nodes", [])],
+                    }
+                )
+                for turn in data.get("turns", [])
+            ],
+            final_assertions=[AssertionResult(**a) for a in data.get("final_assertions", [])],
+            error_message=data.get("error_message"),
+        )
+
 
 @dataclass
 class CaseScore:
@@ -59,6 +104,8 @@ class SuiteResult:
     suite_name: str
     target: str
     case_results: list[CaseResult] = field(default_factory=list)
+    # 运行统计（并发上限变化等）
+    stats: dict[str, Any] = field(default_factory=dict)
 
 
 @dataclass
@@ -72,3 +119,63 @@ class SuiteScore:
     avg_overall_score: float
     dimension_averages: dict[str, float] = field(default_factory=dict)
     case_scores: list[CaseScore] = field(default_factory=list)
+    # 逐轮时延指标（及 case_latency_ms）的分位数，如 {"ttft_ms": {"p50": ..., "p95": ...}}
+    latency_percentiles: dict[str, dict[str, float]] = field(default_factory=dict)
+    # 与 latency_percentiles 同名指标的可合并直方图（跨分片 / 跨运行汇总）
+    histograms: dict[str, Histogram] = field(default_factory=dict)
+    # 按轮次下标的时延直方图
+    turn_latency_histograms: dict[int, Histogram] = field(default_factory=dict)
+    # 工作流各节点耗时的分位数，键为 "<节点类型>:<节点标题>"
+    node_latency: dict[str, dict[str, float]] = field(default_factory=dict)
+    # Token 合计：prompt_tokens / completion_tokens / total_tokens
+    token_totals: dict[str, int] = field(default_factory=dict)
+    # 套件级分位数预算的检查结果
+    budget_results: list[AssertionResult] = field(default_factory=list)
+
+    @property
+    def budgets_passed(self) -> bool:
+        return all(result.passed for result in self.budget_results)
+
+
+@dataclass
+class LoadWindow:
+    """压测的一个时间窗口（sent 按到达时刻计，completed / errors 按完成时刻计）"""
+
+    index: int
+    start_s: float
+    sent: int = 0
+    completed: int = 0
+    errors: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+
+@dataclass
+class LoadResult:
+    """开环压测结果"""
+
+    suite_name: str
+    target: str
+    rps: float
+    duration_s: float
+    arrival: str
+    window_s: float
+    # 计划发出的会话数 / 成功的请求数 / 失败的请求数 / 因进行中会话过多而丢弃的会话数
+    sent: int = 0
+    completed: int = 0
+    errors: int = 0
+    dropped: int = 0
+    elapsed_s: float = 0.0
+    latency: Histogram = field(default_factory=Histogram)
+    ttft: Histogram = field(default_factory=Histogram)
+    windows: dict[int, LoadWindow] = field(default_factory=dict)
+
+    @property
+    def error_rate(self) -> float:
+        failed = self.errors + self.dropped
+        total = self.completed + failed
+        return failed / total if total else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """实际达到的吞吐（成功请求数 / 秒）"""
+        return self.completed / self.elapsed_s if self.elapsed_s else 0.0
@@ -5,7 +5,7 @@
 
 from typing import Any, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class AssertionSpec(BaseModel):
@@ -26,6 +26,10 @@ class AssertionSpec(BaseModel):
     # 字符串匹配
     value: str | bool | int | float | None = None
     values: list[str] | None = None
+    # not_contains 词表文件（每行一个词），与 values 合并
+    values_file: str | None = None
+    # not_contains 匹配前归一化：width（全角/半角）、case（大小写）、whitespace（空白）
+    normalize: list[Literal["width", "case", "whitespace"]] | None = None
     pattern: str | None = None
     # LLM Judge
     criteria: str | None = None
@@ -43,6 +47,9 @@ class AssertionSpec(BaseModel):
     # 性能
     max: int | None = None
     max_total: int | None = None
+    # 仅用于模拟用户的 stop_conditions：条件成立（断言通过）后结束对话，
+    # fail_and_stop（默认）同时把该轮记为失败，stop 只结束对话
+    on_match: Literal["stop", "fail_and_stop"] | None = None
 
 
 class SingleTurnInput(BaseModel):
@@ -53,6 +60,13 @@ class SingleTurnInput(BaseModel):
     user: str | None = None
 
 
+class WorkflowInput(BaseModel):
+    """工作流测试输入（工作流没有 query）"""
+
+    inputs: dict[str, Any] | None = None
+    user: str | None = None
+
+
 class TurnSpec(BaseModel):
     """多轮测试中的单轮规格"""
 
@@ -65,7 +79,7 @@ class SimulatedUserConfig(BaseModel):
 
     system_prompt: str
     first_message: str
-    max_turns: int = 10
+    max_turns: int = Field(default=10, ge=1)
     stop_conditions: list[AssertionSpec] | None = None
 
 
@@ -76,14 +90,23 @@ class PerformanceBudget(BaseModel):
     max_total_tokens: int | None = None
 
 
+class PercentileBudget(BaseModel):
+    """套件级分位数预算：metric 的第 percentile 百分位数不得超过 max"""
+
+    # case_latency_ms 为整个用例各轮时延之和，其余为逐轮指标
+    metric: Literal["latency_ms", "ttft_ms", "max_chunk_gap_ms", "case_latency_ms"] = "latency_ms"
+    percentile: float = Field(gt=0, le=100)
+    max: float
+
+
 class TestCaseSpec(BaseModel):
     """单个测试用例"""
 
     id: str
     name: str
     type: Literal["single_turn", "multi_turn", "simulated_user", "workflow"]
-    # 单轮
-    input: SingleTurnInput | None = None
+    # 单轮 / 工作流
+    input: SingleTurnInput | WorkflowInput | None = None
     # 多轮
     turns: list[TurnSpec] | None = None
     judge_scene: str | None = None
@@ -95,6 +118,13 @@ class TestCaseSpec(BaseModel):
     assertions: list[AssertionSpec] | None = None
     performance: PerformanceBudget | None = None
 
+    @model_validator(mode="after")
+    def _check_input(self) -> "TestCaseSpec":
+        # 只有工作流用例可以省略 query
+        if self.type != "workflow" and isinstance(self.input, WorkflowInput):
+            raise ValueError(f"用例 {self.id}: input.query 为必填项")
+        return self
+
 
 class SuiteMetadata(BaseModel):
     """测试套件元数据"""
@@ -104,6 +134,7 @@ class SuiteMetadata(BaseModel):
     target: str
     tags: list[str] = Field(default_factory=list)
     shared_inputs: dict[str, Any] | None = None
+    budgets: list[PercentileBudget] = Field(default_factory=list)
 
 
 class TestSuiteSpec(BaseModel):
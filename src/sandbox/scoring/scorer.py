@@ -2,6 +2,14 @@
 
 from sandbox.schema.config import ScoringConfig
 from sandbox.schema.result import AssertionResult, CaseResult, CaseScore, SuiteResult, SuiteScore
+from sandbox.schema.test_case import PercentileBudget
+from sandbox.utils.histogram import DEFAULT_PERCENTILES, Histogram
+
+# 参与套件级分位数统计的逐轮指标
+TURN_METRICS = ("latency_ms", "ttft_ms", "max_chunk_gap_ms", "output_tokens_per_sec")
+# 整个用例的时延（各轮 latency_ms 之和）
+CASE_LATENCY_METRIC = "case_latency_ms"
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
 
 
 class Scorer:
@@ -58,41 +66,150 @@ class Scorer:
         return results
 
 
-class SuiteScorer:
-    """套件级评分聚合"""
+class SuiteAggregator:
+    """
+    流式套件评分：用例结果逐个加入，不保留 CaseResult 与 CaseScore
 
-    def __init__(self, scorer: Scorer):
-        self.scorer = scorer
+    只累积评分所需的计数器（通过数、评分与维度累计、Token 合计）与直方图，
+    内存与用例数无关，用例完成即可丢弃其结果，适合边执行边写入 JSONL 的场景。
+    分位数与预算均由可合并的直方图计算，本地报告与分片合并后的报告结果一致。
+    """
 
-    def score_suite(self, suite_result: SuiteResult) -> SuiteScore:
-        case_scores = [self.scorer.score_case(cr) for cr in suite_result.case_results]
+    def __init__(
+        self, scorer: Scorer, suite_name: str, budgets: list[PercentileBudget] | None = None
+    ):
+        self.scorer = scorer
+        self.suite_name = suite_name
+        self.budgets = budgets or []
+        self._total = 0
+        self._passed = 0
+        self._score_sum = 0.0
+        self._dim_sums: dict[str, float] = {}
+        self._dim_counts: dict[str, int] = {}
+        self._histograms: dict[str, Histogram] = {}
+        self._turn_histograms: dict[int, Histogram] = {}
+        self._node_histograms: dict[str, Histogram] = {}
+        self._tokens: dict[str, int] = {}
+
+    def add(self, case_result: CaseResult) -> CaseScore:
+        """加入一个用例结果，返回其用例级评分"""
+        case_score = self.scorer.score_case(case_result)
+        self._total += 1
+        self._passed += case_score.passed
+        self._score_sum += case_score.overall_score
+        for dim, score in case_score.dimension_scores.items():
+            self._dim_sums[dim] = self._dim_sums.get(dim, 0.0) + score
+            self._dim_counts[dim] = self._dim_counts.get(dim, 0) + 1
+        for turn in case_result.turns:
+            for metric in TURN_METRICS:
+                value = getattr(turn, metric)
+                if value is not None:
+                    _record(self._histograms, metric, value)
+            _record(self._turn_histograms, turn.turn_index, turn.latency_ms)
+            for name in TOKEN_FIELDS:
+                tokens = (turn.token_usage or {}).get(name)
+                if tokens is not None:
+                    self._tokens[name] = self._tokens.get(name, 0) + tokens
+            for node in turn.nodes:
+                key = f"{node.node_type}:{node.title or node.node_id}"
+                _record(self._node_histograms, key, node.elapsed_ms)
+        if case_result.turns:
+            _record(
+                self._histograms,
+                CASE_LATENCY_METRIC,
+                sum(turn.latency_ms for turn in case_result.turns),
+            )
+        return case_score
 
-        if not case_scores:
+    def finish(self) -> SuiteScore:
+        """根据已加入的用例计算套件评分"""
+        total = self._total
+        if not total:
             return SuiteScore(
-                suite_name=suite_result.suite_name,
+                suite_name=self.suite_name,
                 total_cases=0,
                 passed_cases=0,
                 pass_rate=0.0,
                 avg_overall_score=0.0,
+                budget_results=self._check_budgets(),
             )
 
-        total = len(case_scores)
-        passed = sum(1 for cs in case_scores if cs.passed)
-        avg_score = sum(cs.overall_score for cs in case_scores) / total
-
-        # 维度平均
-        dim_sums: dict[str, list[float]] = {}
-        for cs in case_scores:
-            for dim, score in cs.dimension_scores.items():
-                dim_sums.setdefault(dim, []).append(score)
-        dim_avgs = {dim: sum(scores) / len(scores) for dim, scores in dim_sums.items()}
-
         return SuiteScore(
-            suite_name=suite_result.suite_name,
+            suite_name=self.suite_name,
             total_cases=total,
-            passed_cases=passed,
-            pass_rate=passed / total,
-            avg_overall_score=avg_score,
-            dimension_averages=dim_avgs,
-            case_scores=case_scores,
+            passed_cases=self._passed,
+            pass_rate=self._passed / total,
+            avg_overall_score=self._score_sum / total,
+            dimension_averages={
+                dim: self._dim_sums[dim] / self._dim_counts[dim] for dim in self._dim_sums
+            },
+            # 逐轮指标（延迟、首字延迟等）与整个用例时延的分位数
+            latency_percentiles={
+                metric: histogram.summary(DEFAULT_PERCENTILES)
+                for metric, histogram in self._histograms.items()
+            },
+            histograms=self._histograms,
+            turn_latency_histograms=dict(sorted(self._turn_histograms.items())),
+            node_latency={
+                node: histogram.summary(DEFAULT_PERCENTILES)
+                for node, histogram in self._node_histograms.items()
+            },
+            token_totals=self._tokens,
+            budget_results=self._check_budgets(),
         )
+
+    def _check_budgets(self) -> list[AssertionResult]:
+        """检查套件级分位数预算（没有对应指标数据的预算视为通过）"""
+        results = []
+        for budget in self.budgets:
+            label = f"{budget.metric} p{budget.percentile:g}"
+            histogram = self._histograms.get(budget.metric)
+            if histogram is None:
+                results.append(
+                    AssertionResult(
+                        passed=True,
+                        assertion_type="percentile_budget",
+                        message=f"{label} 没有数据，跳过",
+                        expected=f"<= {budget.max:g}",
+                    )
+                )
+                continue
+            actual = histogram.percentile(budget.percentile)
+            passed = actual <= budget.max
+            results.append(
+                AssertionResult(
+                    passed=passed,
+                    assertion_type="percentile_budget",
+                    message=f"{label} {actual:.0f} {'<=' if passed else '>'} {budget.max:g}",
+                    expected=f"<= {budget.max:g}",
+                    actual=round(actual, 2),
+                )
+            )
+        return results
+
+
+def _record(histograms: dict, key, value: float) -> None:
+    histograms.setdefault(key, Histogram()).record(value)
+
+
+class SuiteScorer:
+    """套件级评分聚合"""
+
+    def __init__(self, scorer: Scorer):
+        self.scorer = scorer
+
+    def aggregator(
+        self, suite_name: str, budgets: list[PercentileBudget] | None = None
+    ) -> SuiteAggregator:
+        """创建流式聚合器（用例结果逐个加入）"""
+        return SuiteAggregator(self.scorer, suite_name, budgets)
+
+    def score_suite(
+        self, suite_result: SuiteResult, budgets: list[PercentileBudget] | None = None
+    ) -> SuiteScore:
+        aggregator = self.aggregator(suite_result.suite_name, budgets)
+        # 结果已全部在内存中，顺带保留用例级评分
+        case_scores = [aggregator.add(case_result) for case_result in suite_result.case_results]
+        suite_score = aggregator.finish()
+        suite_score.case_scores = case_scores
+        return suite_score
@@ -0,0 +1,121 @@
+"""HDR 风格的时延直方图
+
+- 对数-线性分桶：每个 2 的幂区间再线性细分，相对误差不超过 10^-significant_figures
+- 记录为 O(1)，内存与记录次数无关（稀疏存储，只保存非空桶）
+- 可合并：相同精度的直方图逐桶相加，用于分片 / 多个时间窗口的汇总
+- 可序列化：to_dict() / from_dict() 用于写入结果文件
+
+数值以 resolution 为最小单位量化（默认 0.001，即记录毫秒时精确到微秒）。
+"""
+
+import math
+
+# 时延汇总（套件摘要、压测报告）默认输出的分位数
+DEFAULT_PERCENTILES: tuple[float, ...] = (50, 90, 95, 99, 99.9)
+
+
+class Histogram:
+    """HDR 风格直方图（值须非负）"""
+
+    def __init__(self, significant_figures: int = 3, resolution: float = 0.001):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures 必须在 1..5 之间")
+        self.significant_figures = significant_figures
+        self.resolution = resolution
+        # 每个 2 的幂区间的线性子桶数（覆盖 2 × 10^significant_figures）
+        self._sub_bucket_bits = math.ceil(math.log2(2 * 10**significant_figures))
+        self._sub_bucket_half = 1 << (self._sub_bucket_bits - 1)
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def record(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError(f"直方图只能记录非负值: {value}")
+        index = self._index(round(value / self.resolution))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """把另一个直方图并入本直方图（精度必须相同）"""
+        if (other.significant_figures, other.resolution) != (
+            self.significant_figures,
+            self.resolution,
+        ):
+            raise ValueError("只能合并精度相同的直方图")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Histogram) and self.to_dict() == other.to_dict()
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """第 q 百分位数（取所在桶的上界，并以实际最大值为上限）"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest_equivalent(index) * self.resolution, self.max)
+        return self.max
+
+    def summary(self, percentiles: tuple[float, ...] = DEFAULT_PERCENTILES) -> dict[str, float]:
+        """count / mean / max / pXX"""
+        if not self.count:
+            return {}
+        summary = {"count": self.count, "mean": self.mean, "max": self.max}
+        for q in percentiles:
+            summary[f"p{q:g}"] = self.percentile(q)
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "significant_figures": self.significant_figures,
+            "resolution": self.resolution,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "counts": {str(index): count for index, count in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls(data["significant_figures"], data["resolution"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def _index(self, units: int) -> int:
+        if units < 2 * self._sub_bucket_half:
+            return units
+        shift = units.bit_length() - self._sub_bucket_bits
+        return (shift + 1) * self._sub_bucket_half + (units >> shift) - self._sub_bucket_half
+
+    def _highest_equivalent(self, index: int) -> int:
+        """桶内的最大整数值"""
+        if index < 2 * self._sub_bucket_half:
+            return index
+        shift = index // self._sub_bucket_half - 1
+        sub = index - shift * self._sub_bucket_half
+        return ((sub + 1) << shift) - 1
@@ -1,7 +1,9 @@
 """令牌桶限流器
 
-用于控制对 Dify API 的请求频率，防止触发限流。
-与 asyncio 集成，使用非阻塞等待。
+用于控制对 Dify / Judge API 的请求频率，防止触发限流。
+与 asyncio 集成，使用非阻塞等待：
+- 获取令牌采用"预约"方式，不持锁等待，等待者按到达顺序依次放行（FIFO 公平）
+- 除 RPM 外支持按 token_usage 计量的 TPM（每分钟 Token 数）预算，同样按预约方式 FIFO 放行
 """
 
 import asyncio
@@ -9,27 +11,143 @@ import time
 
 
 class TokenBucketRateLimiter:
+    """RPM 令牌桶（rpm <= 0 表示不限流）"""
+
     def __init__(self, rpm: int = 60, burst: int = 10):
         self.rpm = rpm
-        self.interval = 60.0 / rpm
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
         self.burst = burst
         self.tokens = float(burst)
         self.last_refill = time.monotonic()
-        self._lock = asyncio.Lock()
 
-    async def acquire(self) -> None:
-        """获取一个令牌，不足时异步等待"""
-        async with self._lock:
-            now = time.monotonic()
-            elapsed = now - self.last_refill
-            self.tokens = min(self.burst, self.tokens + elapsed / self.interval)
-            self.last_refill = now
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.burst, self.tokens + elapsed / self.interval)
+        self.last_refill = now
 
-            if self.tokens >= 1:
-                self.tokens -= 1
-                return
+    async def acquire(self) -> float:
+        """获取一个令牌，不足时异步等待，返回等待秒数"""
+        if self.rpm <= 0:
+            return 0.0
+        self._refill()
+        # 预约一个令牌：余额可以为负，负数部分就是排在前面的等待者
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
 
-            wait_time = (1 - self.tokens) * self.interval
+        wait_time = -self.tokens * self.interval
+        try:
             await asyncio.sleep(wait_time)
-            self.tokens = 0
-            self.last_refill = time.monotonic()
+        except asyncio.CancelledError:
+            # 取消时归还预约，后续等待者无需多等
+            self.tokens += 1
+            raise
+        return wait_time
+
+
+class TokenBudgetLimiter:
+    """
+    TPM 预算（每分钟 Token 数）
+
+    请求前无法知道会消耗多少 Token，因此按预估值预约、请求结束后按实际用量校正：
+    - 预估值为实际 token_usage 的指数移动平均（首个请求之前为 0）
+    - 与 RPM 相同的预约方式：余额可以为负，每个等待者只等到自己的预约被覆盖，
+      按到达顺序依次放行，不会同时唤醒全部等待者
+    """
+
+    # 预估值的平滑系数
+    ALPHA = 0.2
+
+    def __init__(self, tpm: int):
+        self.tpm = tpm
+        self.rate = tpm / 60.0
+        self.balance = float(tpm)
+        self.last_refill = time.monotonic()
+        self.estimate = 0.0
+        self._observed = False
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.balance = min(self.tpm, self.balance + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self) -> float:
+        """按预估用量预约，余额不足时等待，返回预约的 Token 数"""
+        self._refill()
+        reserved = self.estimate
+        self.balance -= reserved
+        if self.balance >= 0:
+            return reserved
+
+        try:
+            await asyncio.sleep(-self.balance / self.rate)
+        except asyncio.CancelledError:
+            # 取消时归还预约，后续等待者无需多等
+            self.balance += reserved
+            raise
+        return reserved
+
+    def release(self, reserved: float) -> None:
+        """归还未使用的预约（请求未发出或失败）"""
+        self.balance += reserved
+
+    def consume(self, tokens: int, reserved: float = 0.0) -> None:
+        """按实际用量扣减（acquire 时预约的部分抵扣），并更新预估值"""
+        self._refill()
+        self.balance -= tokens - reserved
+        if self._observed:
+            self.estimate += self.ALPHA * (tokens - self.estimate)
+        else:
+            self.estimate = float(tokens)
+            self._observed = True
+
+
+class EndpointRateLimiter:
+    """单个端点（Dify 应用 / Judge 服务）的 RPM + TPM 限流"""
+
+    def __init__(self, name: str, rpm: int, burst: int, tpm: int | None = None):
+        self.name = name
+        self._requests = TokenBucketRateLimiter(rpm=rpm, burst=burst)
+        self._tokens = TokenBudgetLimiter(tpm) if tpm else None
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.tokens_used = 0
+
+    async def acquire(self) -> float:
+        """
+        每次 HTTP 请求（含重试）前调用，返回预约的 Token 数
+
+        调用方在请求完成后将其传给 record_usage，请求失败时传给 release。
+        """
+        start = time.monotonic()
+        reserved = 0.0
+        if self._tokens is not None:
+            reserved = await self._tokens.acquire()
+        try:
+            await self._requests.acquire()
+        except BaseException:
+            # RPM 等待被取消或失败时归还 TPM 预约
+            self.release(reserved)
+            raise
+        self.acquired += 1
+        self.total_wait += time.monotonic() - start
+        return reserved
+
+    def release(self, reserved: float) -> None:
+        """归还 acquire 的 TPM 预约"""
+        if self._tokens is not None and reserved:
+            self._tokens.release(reserved)
+
+    def record_usage(self, total_tokens: int, reserved: float = 0.0) -> None:
+        """请求完成后按实际 Token 用量扣减 TPM 预算（reserved 为 acquire 的返回值）"""
+        self.tokens_used += total_tokens
+        if self._tokens is not None:
+            self._tokens.consume(total_tokens, reserved)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.acquired,
+            "total_wait_s": round(self.total_wait, 3),
+            "tokens_used": self.tokens_used,
+        }
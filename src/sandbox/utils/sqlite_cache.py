@@ -0,0 +1,107 @@
+"""基于 SQLite 的持久化键值缓存
+
+- 按写入时间淘汰过期条目（max_age_days）
+- 按最近访问时间淘汰超量条目（max_entries）
+- 统计命中 / 未命中次数
+所有数据库操作通过 asyncio.to_thread 在事件循环之外执行。
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from sandbox.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SQLiteCache:
+    """SQLite 键值缓存（值为文本）"""
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000, max_age_days: float = 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.max_age_seconds:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """淘汰过期和超量条目，返回删除的条目数"""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?", (cutoff,)
+            ).rowcount
+            deleted += self._conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._conn.commit()
+        if deleted:
+            logger.debug(f"缓存 {self.path} 淘汰 {deleted} 条")
+        return deleted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    async def aget(self, key: str) -> str | None:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.put, key, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self) -> None:
+        self.evict()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,508 @@
+"""测试 HTTP 客户端层（连接池等）"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from sandbox.schema.config import HTTPConfig, LLMConfig, SandboxConfig, TargetConfig
+
+
+def _make_target(**kwargs) -> TargetConfig:
+    return TargetConfig(api_base="http://localhost", api_key="test", **kwargs)
+
+
+class TestClientPool:
+    """测试按目标复用的客户端连接池"""
+
+    def test_same_target_shares_client(self):
+        from sandbox.client.pool import ClientPool
+
+        pool = ClientPool()
+        a = pool.dify_client(_make_target())
+        b = pool.dify_client(_make_target())
+        assert a is b
+
+        asyncio.run(pool.close())
+
+    def test_different_targets_get_different_clients(self):
+        from sandbox.client.pool import ClientPool
+
+        pool = ClientPool()
+        a = pool.dify_client(_make_target())
+        b = pool.dify_client(_make_target(timeout=90))
+        assert a is not b
+
+        asyncio.run(pool.close())
+
+    def test_limits_applied(self):
+        from sandbox.client.pool import ClientPool
+
+        pool = ClientPool(HTTPConfig(max_connections=7, max_keepalive_connections=3))
+        client = pool.dify_client(_make_target())
+        transport_pool = client._client._transport._pool
+        assert transport_pool._max_connections == 7
+        assert transport_pool._max_keepalive_connections == 3
+
+        asyncio.run(pool.close())
+
+    def test_close_closes_dify_and_judge_clients(self):
+        from sandbox.client.pool import ClientPool
+
+        pool = ClientPool()
+        dify = pool.dify_client(_make_target())
+        judge = pool.judge_client(LLMConfig(api_base="http://localhost", api_key="test"))
+
+        asyncio.run(pool.close())
+        assert dify._client.is_closed
+        assert judge._client.is_closed
+
+    def test_engine_close_closes_judge_client(self):
+        from sandbox.runner.engine import TestEngine
+
+        config = SandboxConfig(judge=LLMConfig(api_base="http://localhost", api_key="test"))
+
+        async def _run():
+            async with TestEngine(config) as engine:
+                judge = engine.judge_client
+            return judge
+
+        judge = asyncio.run(_run())
+        assert judge._client.is_closed
+
+    def test_runner_does_not_close_pooled_client(self):
+        from sandbox.client.dify_chat import DifyResponse
+        from sandbox.runner.single_turn import SingleTurnRunner
+        from sandbox.schema.test_case import SingleTurnInput, TestCaseSpec
+
+        pooled = AsyncMock()
+        pooled.send_message.return_value = DifyResponse(
+            answer="hi",
+            conversation_id="c",
+            message_id="m",
+            raw_data={},
+            latency_ms=10,
+            token_usage=None,
+            status="success",
+        )
+        pool = AsyncMock()
+        pool.dify_client = lambda target: pooled
+
+        runner = SingleTurnRunner(client_pool=pool)
+        case = TestCaseSpec(
+            id="t1", name="t1", type="single_turn", input=SingleTurnInput(query="hello")
+        )
+
+        result = asyncio.run(runner.execute(case, _make_target()))
+        assert result.status == "completed"
+        pooled.close.assert_not_called()
+
+
+def _sse(*events: dict) -> bytes:
+    return "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events).encode()
+
+
+def _mock_dify_client(target: TargetConfig, handler):
+    from sandbox.client.dify_chat import DifyChatClient
+
+    client = DifyChatClient(target)
+    client._client = httpx.AsyncClient(
+        base_url=target.api_base, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+class TestDifyStreaming:
+    """测试 Dify SSE 流式响应解析"""
+
+    def test_streaming_assembles_answer_and_metrics(self):
+        body = _sse(
+            {"event": "message", "answer": "你好", "conversation_id": "c1", "message_id": "m1"},
+            {"event": "message", "answer": "，我是", "conversation_id": "c1", "message_id": "m1"},
+            {"event": "message", "answer": "Linh", "conversation_id": "c1", "message_id": "m1"},
+            {
+                "event": "message_end",
+                "conversation_id": "c1",
+                "message_id": "m1",
+                "metadata": {"usage": {"completion_tokens": 12, "total_tokens": 40}},
+            },
+        )
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+        client = _mock_dify_client(_make_target(response_mode="streaming"), handler)
+
+        async def _run():
+            try:
+                return await client.send_message("hi")
+            finally:
+                await client.close()
+
+        response = asyncio.run(_run())
+        assert b'"response_mode":"streaming"' in requests[0].content.replace(b" ", b"")
+        assert response.answer == "你好，我是Linh"
+        assert response.conversation_id == "c1"
+        assert response.message_id == "m1"
+        assert response.token_usage["total_tokens"] == 40
+        assert response.ttft_ms is not None and response.ttft_ms <= response.latency_ms
+        assert len(response.chunk_gaps_ms) == 2
+        assert response.max_chunk_gap_ms >= response.mean_chunk_gap_ms
+
+    def test_streaming_error_event(self):
+        from sandbox.core.exceptions import DifyAPIError
+
+        body = _sse({"event": "error", "status": 400, "message": "quota exceeded"})
+        client = _mock_dify_client(
+            _make_target(response_mode="streaming"),
+            lambda request: httpx.Response(200, content=body),
+        )
+
+        async def _run():
+            try:
+                return await client.send_message("hi")
+            finally:
+                await client.close()
+
+        with pytest.raises(DifyAPIError, match="quota exceeded"):
+            asyncio.run(_run())
+
+    def test_sse_ignores_ping_and_comments(self):
+        from sandbox.client.sse import iter_sse_events
+
+        body = (
+            b": keep-alive\n\n"
+            b"event: ping\n\n"
+            b'data: {"event": "message", "answer": "a"}\n\n'
+            b'data: {"event": "message_end"}'
+        )
+
+        async def _run():
+            resp = httpx.Response(200, content=body)
+            return [e async for e in iter_sse_events(resp)]
+
+        events = asyncio.run(_run())
+        assert [e["event"] for e in events] == ["message", "message_end"]
+
+
+class TestRetryPolicy:
+    """测试重试策略、预算与熔断器"""
+
+    def test_parse_retry_after(self):
+        from sandbox.client.retry import parse_retry_after
+
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        assert parse_retry_after("not a date") is None
+
+    def test_decorrelated_jitter_bounds(self):
+        from sandbox.client.retry import DecorrelatedJitterPolicy
+
+        policy = DecorrelatedJitterPolicy(base_delay=1.0, max_delay=5.0)
+        delay = 0.0
+        for attempt in range(20):
+            delay = policy.next_delay(attempt, delay)
+            assert 1.0 <= delay <= 5.0
+
+    def test_retry_budget(self):
+        from sandbox.client.retry import RetryBudget
+
+        budget = RetryBudget(ratio=0.5, min_retries=1)
+        budget.record_request()
+        budget.record_request()
+        assert budget.try_acquire() is True
+        assert budget.try_acquire() is True
+        assert budget.try_acquire() is False
+        assert budget.rejected == 1
+
+    def test_circuit_breaker_transitions(self):
+        from sandbox.client.retry import CircuitBreaker
+        from sandbox.core.exceptions import DifyAPIError
+
+        breaker = CircuitBreaker("http://dify", failure_threshold=2, recovery_timeout=0.0)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        # recovery_timeout 已过，放行一个探测请求
+        breaker.before_request()
+        assert breaker.state == "half_open"
+        with pytest.raises(DifyAPIError, match="半开"):
+            breaker.before_request()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def _client_with(self, handler, retry, max_retries=2, rate_limiter=None):
+        from sandbox.client.dify_chat import DifyChatClient
+
+        target = _make_target(max_retries=max_retries)
+        client = DifyChatClient(target, retry=retry, rate_limiter=rate_limiter)
+        client._client = httpx.AsyncClient(
+            base_url=target.api_base, transport=httpx.MockTransport(handler)
+        )
+        return client
+
+    def test_retries_429_and_honours_retry_after(self, monkeypatch):
+        from sandbox.client.retry import ExponentialBackoffPolicy, RetryOptions
+
+        sleeps: list[float] = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        monkeypatch.setattr("sandbox.client.base.asyncio.sleep", fake_sleep)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "7"}, text="slow down")
+            return httpx.Response(
+                200, json={"answer": "ok", "conversation_id": "c", "message_id": "m"}
+            )
+
+        client = self._client_with(
+            handler, RetryOptions(policy=ExponentialBackoffPolicy(base_delay=0.1))
+        )
+
+        async def _run():
+            try:
+                return await client.send_message("hi")
+            finally:
+                await client.close()
+
+        response = asyncio.run(_run())
+        assert response.answer == "ok"
+        assert len(calls) == 2
+        assert sleeps == [7.0]
+
+    def test_retry_after_is_capped(self, monkeypatch):
+        from sandbox.client.retry import ExponentialBackoffPolicy, RetryOptions
+
+        sleeps: list[float] = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        monkeypatch.setattr("sandbox.client.base.asyncio.sleep", fake_sleep)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "86400"}, text="slow down")
+            return httpx.Response(
+                200, json={"answer": "ok", "conversation_id": "c", "message_id": "m"}
+            )
+
+        retry = RetryOptions(policy=ExponentialBackoffPolicy(base_delay=0.1), max_retry_after=5.0)
+        client = self._client_with(handler, retry)
+
+        async def _run():
+            try:
+                return await client.send_message("hi")
+            finally:
+                await client.close()
+
+        assert asyncio.run(_run()).answer == "ok"
+        assert sleeps == [5.0]
+
+    def test_open_breaker_fails_fast(self):
+        from sandbox.client.retry import (
+            CircuitBreaker,
+            ExponentialBackoffPolicy,
+            RetryOptions,
+        )
+        from sandbox.core.exceptions import DifyAPIError
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503, text="unavailable")
+
+        breaker = CircuitBreaker("http://localhost", failure_threshold=1, recovery_timeout=60)
+        client = self._client_with(
+            handler,
+            RetryOptions(policy=ExponentialBackoffPolicy(base_delay=0.0), breaker=breaker),
+        )
+
+        async def _run():
+            try:
+                # 首次失败即打开熔断，重试时直接快速失败
+                with pytest.raises(DifyAPIError, match="熔断器已打开"):
+                    await client.send_message("hi")
+                with pytest.raises(DifyAPIError, match="熔断器已打开"):
+                    await client.send_message("hi")
+            finally:
+                await client.close()
+
+        asyncio.run(_run())
+        assert len(calls) == 1
+
+    def test_cancelled_half_open_probe_releases_breaker(self):
+        from sandbox.client.retry import CircuitBreaker, ExponentialBackoffPolicy, RetryOptions
+        from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise RuntimeError("意外异常")
+            return httpx.Response(
+                200, json={"answer": "ok", "conversation_id": "c", "message_id": "m"}
+            )
+
+        breaker = CircuitBreaker("http://localhost", failure_threshold=1, recovery_timeout=0.0)
+        breaker.record_failure()
+        limiter = EndpointRateLimiter("dify", rpm=60, burst=1)
+        limiter._requests.tokens = 0
+        client = self._client_with(
+            handler,
+            RetryOptions(policy=ExponentialBackoffPolicy(base_delay=0.0), breaker=breaker),
+            max_retries=0,
+            rate_limiter=limiter,
+        )
+
+        async def _run():
+            try:
+                # 半开状态下的请求在限流等待中被取消
+                task = asyncio.create_task(client.send_message("hi"))
+                await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                assert not breaker._probe_in_flight
+
+                # 探测请求遇到意外异常，同样释放探测名额
+                limiter._requests.tokens = 1
+                with pytest.raises(RuntimeError):
+                    await client.send_message("hi")
+
+                limiter._requests.tokens = 1
+                return await client.send_message("hi")
+            finally:
+                await client.close()
+
+        assert asyncio.run(_run()).answer == "ok"
+        assert breaker.state == "closed"
+        assert len(calls) == 2
+
+    def test_non_retryable_4xx(self):
+        from sandbox.client.retry import ExponentialBackoffPolicy, RetryOptions
+        from sandbox.core.exceptions import DifyAPIError
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(400, text="bad request")
+
+        client = self._client_with(
+            handler, RetryOptions(policy=ExponentialBackoffPolicy(base_delay=0.0))
+        )
+
+        async def _run():
+            try:
+                await client.send_message("hi")
+            finally:
+                await client.close()
+
+        with pytest.raises(DifyAPIError) as exc_info:
+            asyncio.run(_run())
+        assert exc_info.value.status_code == 400
+        assert len(calls) == 1
+
+
+class TestCassette:
+    """测试 Dify 响应录制 / 回放"""
+
+    def _chain_handler(self, calls):
+        def handler(request):
+            body = json.loads(request.content)
+            calls.append(body)
+            return httpx.Response(
+                200,
+                json={
+                    "answer": f"回复{len(calls)}: {body['query']}",
+                    "conversation_id": "conv_live",
+                    "message_id": f"m{len(calls)}",
+                    "metadata": {"usage": {"total_tokens": 5}},
+                },
+            )
+
+        return handler
+
+    async def _two_turns(self, client):
+        from sandbox.client.cassette import cassette_scope
+
+        cassette_scope.set(("套件", "case_1"))
+        first = await client.send_message("你好")
+        second = await client.send_message("再见", conversation_id=first.conversation_id)
+        return first, second
+
+    def test_record_then_replay_without_network(self, tmp_path):
+        from sandbox.client.cassette import Cassette
+
+        path = tmp_path / "dify.cassette.jsonl"
+        calls: list = []
+
+        async def _record():
+            cassette = Cassette(path, mode="record")
+            client = _mock_dify_client(_make_target(), self._chain_handler(calls))
+            client.cassette = cassette
+            result = await self._two_turns(client)
+            cassette.close()
+            return result
+
+        async def _replay():
+            def offline(request):
+                raise AssertionError("回放模式不应访问网络")
+
+            cassette = Cassette(path, mode="replay")
+            client = _mock_dify_client(_make_target(), offline)
+            client.cassette = cassette
+            return await self._two_turns(client), cassette.stats()
+
+        recorded = asyncio.run(_record())
+        replayed, stats = asyncio.run(_replay())
+
+        assert len(calls) == 2
+        assert calls[1]["conversation_id"] == "conv_live"
+        for live, again in zip(recorded, replayed):
+            assert again.answer == live.answer
+            assert again.conversation_id == live.conversation_id
+            assert again.latency_ms == pytest.approx(live.latency_ms, abs=1e-3)
+            assert again.token_usage == {"total_tokens": 5}
+        assert stats == {"mode": "replay", "hits": 2, "misses": 0}
+
+    def test_replay_miss_raises(self, tmp_path):
+        from sandbox.client.cassette import Cassette, cassette_scope
+        from sandbox.core.exceptions import DifyAPIError
+
+        path = tmp_path / "empty.jsonl"
+        path.write_text("")
+        client = _mock_dify_client(_make_target(), lambda request: httpx.Response(500))
+        client.cassette = Cassette(path, mode="replay")
+
+        async def _run():
+            cassette_scope.set(("套件", "case_1"))
+            await client.send_message("没录过")
+
+        with pytest.raises(DifyAPIError, match="没有匹配"):
+            asyncio.run(_run())
+        assert client.cassette.misses == 1
+
+    def test_request_hash_ignores_conversation_id(self):
+        from sandbox.client.cassette import request_hash
+
+        payload = {"query": "hi", "inputs": {}, "user": "u", "response_mode": "blocking"}
+        assert request_hash(payload) == request_hash({**payload, "conversation_id": "abc"})
+        assert request_hash(payload) != request_hash({**payload, "query": "hello"})
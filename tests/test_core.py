@@ -81,6 +81,154 @@ class TestRateLimiter:
         asyncio.run(_run())
         # 5 次获取应该在 burst 内不阻塞
 
+    def test_waiters_released_in_order_without_lock(self):
+        import time
+
+        from sandbox.utils.rate_limiter import TokenBucketRateLimiter
+
+        limiter = TokenBucketRateLimiter(rpm=1200, burst=1)  # 每 50ms 一个令牌
+        order: list[int] = []
+
+        async def _worker(i):
+            await limiter.acquire()
+            order.append(i)
+
+        async def _run():
+            start = time.monotonic()
+            await asyncio.gather(*[_worker(i) for i in range(4)])
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(_run())
+        assert order == [0, 1, 2, 3]
+        # 等待互不串行叠加：总耗时约 3 个间隔
+        assert 0.12 <= elapsed < 0.3
+
+    def test_tpm_budget_blocks_until_refilled(self):
+        from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+        limiter = EndpointRateLimiter("judge", rpm=0, burst=1, tpm=6000)  # 每秒恢复 100 tokens
+
+        async def _run():
+            await limiter.acquire()
+            limiter.record_usage(10)
+            # 预算已用完：下一个请求按预估用量（10）预约，等待约 0.1s
+            limiter._tokens.balance = 0
+            await limiter.acquire()
+
+        asyncio.run(_run())
+        assert limiter.tokens_used == 10
+        assert limiter._tokens.estimate == 10
+        assert limiter.total_wait >= 0.09
+
+    def test_tpm_waiters_released_in_order(self):
+        import time
+
+        from sandbox.utils.rate_limiter import TokenBudgetLimiter
+
+        budget = TokenBudgetLimiter(tpm=6000)  # 每秒恢复 100 tokens
+        budget.consume(5)
+        budget.balance = 0
+        order: list[int] = []
+
+        async def _worker(i):
+            await budget.acquire()
+            order.append((i, time.monotonic()))
+
+        async def _run():
+            start = time.monotonic()
+            await asyncio.gather(*[_worker(i) for i in range(4)])
+            return start
+
+        start = asyncio.run(_run())
+        # 每个等待者只等到自己的预约（5 tokens ≈ 50ms）被覆盖，依次放行而非同时唤醒
+        assert [i for i, _ in order] == [0, 1, 2, 3]
+        released = [t - start for _, t in order]
+        assert all(b - a >= 0.03 for a, b in zip(released, released[1:]))
+        assert released[-1] < 0.4
+
+    def test_tpm_true_up_uses_reserved_amount(self):
+        from sandbox.utils.rate_limiter import TokenBudgetLimiter
+
+        budget = TokenBudgetLimiter(tpm=1000)
+        budget.consume(100)
+
+        async def _run():
+            # 并发请求按同一预估值预约，先完成的请求会改变预估值
+            reservations = [await budget.acquire() for _ in range(5)]
+            for reserved in reservations:
+                budget.consume(1000, reserved)
+
+        asyncio.run(_run())
+        # 共消耗 5100 tokens，余额按实际用量扣减，不随预估值漂移
+        assert budget.balance == pytest.approx(1000 - 5100, abs=5)
+
+    def test_cancelled_rpm_wait_releases_tpm_reservation(self):
+        from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+        limiter = EndpointRateLimiter("judge", rpm=60, burst=1, tpm=6000)
+        limiter.record_usage(100)
+
+        async def _run():
+            await limiter.acquire()
+            before = limiter._tokens.balance
+            # 令牌桶已空，第二个请求在 RPM 等待中被取消
+            task = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return before
+
+        before = asyncio.run(_run())
+        assert limiter._tokens.balance == pytest.approx(before, abs=5)
+        assert limiter.acquired == 1
+
+    def test_client_acquires_per_http_request(self):
+        import httpx
+
+        from sandbox.client.dify_chat import DifyChatClient
+        from sandbox.client.retry import ExponentialBackoffPolicy, RetryOptions
+        from sandbox.schema.config import TargetConfig
+        from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(502)
+            return httpx.Response(
+                200,
+                json={
+                    "answer": "ok",
+                    "conversation_id": "c",
+                    "message_id": "m",
+                    "metadata": {"usage": {"total_tokens": 42}},
+                },
+            )
+
+        limiter = EndpointRateLimiter("dify", rpm=6000, burst=10)
+        target = TargetConfig(api_base="http://localhost", api_key="test")
+        client = DifyChatClient(
+            target,
+            retry=RetryOptions(policy=ExponentialBackoffPolicy(base_delay=0.0)),
+            rate_limiter=limiter,
+        )
+        client._client = httpx.AsyncClient(
+            base_url=target.api_base, transport=httpx.MockTransport(handler)
+        )
+
+        async def _run():
+            try:
+                await client.send_message("hi")
+            finally:
+                await client.close()
+
+        asyncio.run(_run())
+        # 重试也计入限流
+        assert limiter.acquired == 2
+        assert limiter.tokens_used == 42
+
 
 class TestAssertions:
     """测试断言引擎"""
@@ -184,6 +332,98 @@ class TestAssertionBuilder:
         with pytest.raises(AssertionError_):
             build_assertion(spec)
 
+    def test_build_rejects_invalid_regex_and_thresholds(self):
+        from sandbox.assertion.builder import build_assertion
+        from sandbox.core.exceptions import AssertionError_
+        from sandbox.schema.test_case import AssertionSpec
+
+        with pytest.raises(AssertionError_, match="pattern 无效"):
+            build_assertion(AssertionSpec(type="regex", pattern="(未闭合"))
+        with pytest.raises(AssertionError_, match="0 到 1"):
+            build_assertion(
+                AssertionSpec(type="llm_judge", criteria="c", pass_threshold=8),
+                judge_client=object(),
+            )
+        with pytest.raises(AssertionError_, match="大于 0"):
+            build_assertion(AssertionSpec(type="latency_ms", max=0))
+
+
+class TestAssertionPlan:
+    """测试套件级断言预编译"""
+
+    def _suite(self):
+        from sandbox.schema.test_case import (
+            AssertionSpec,
+            SingleTurnInput,
+            SuiteMetadata,
+            TestCaseSpec,
+            TestSuiteSpec,
+            TurnSpec,
+        )
+
+        return TestSuiteSpec(
+            suite=SuiteMetadata(name="s", target="bot"),
+            cases=[
+                TestCaseSpec(
+                    id="ok",
+                    name="ok",
+                    type="single_turn",
+                    input=SingleTurnInput(query="hi"),
+                    assertions=[AssertionSpec(type="regex", pattern=r"\d+")],
+                ),
+                TestCaseSpec(
+                    id="multi",
+                    name="multi",
+                    type="multi_turn",
+                    turns=[
+                        TurnSpec(user="a", assertions=[AssertionSpec(type="contains", value="x")]),
+                        TurnSpec(user="b"),
+                    ],
+                ),
+                TestCaseSpec(
+                    id="bad",
+                    name="bad",
+                    type="single_turn",
+                    input=SingleTurnInput(query="hi"),
+                    assertions=[AssertionSpec(type="regex", pattern="[")],
+                ),
+            ],
+        )
+
+    def test_compile_suite(self):
+        from sandbox.assertion.plan import compile_suite
+        from sandbox.assertion.string_match import ContainsAssertion, RegexAssertion
+
+        plans = compile_suite(self._suite())
+        assert [p.case_id for p in plans] == ["ok", "multi", "bad"]
+        assert isinstance(plans[0].turn(0)[0], RegexAssertion)
+        assert plans[0].turn(0)[0]._regex.pattern == r"\d+"
+        assert isinstance(plans[1].turn(0)[0], ContainsAssertion)
+        assert plans[1].turn(1) == []
+        assert plans[2].error is not None and "pattern 无效" in plans[2].error
+
+    def test_engine_reports_compile_errors_without_running(self):
+        from unittest.mock import AsyncMock
+
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.config import SandboxConfig, TargetConfig
+
+        config = SandboxConfig(targets={"bot": TargetConfig(api_base="http://x", api_key="k")})
+
+        async def _run():
+            async with TestEngine(config) as engine:
+                engine._single_turn_runner.execute = AsyncMock(return_value=None)
+                engine._multi_turn_runner.execute = AsyncMock(return_value=None)
+                result = await engine.run_suite(self._suite())
+                return engine, result
+
+        engine, result = asyncio.run(_run())
+        bad = result.case_results[2]
+        assert bad.status == "error" and "断言配置错误" in bad.error_message
+        assert engine._single_turn_runner.execute.await_count == 1
+        plan = engine._single_turn_runner.execute.await_args.kwargs["plan"]
+        assert plan.case_id == "ok"
+
 
 class TestSchemaValidation:
     """测试 Schema 模型"""
@@ -282,3 +522,720 @@ class TestScoring:
         score = scorer.score_case(case_result)
         assert score.passed is False
         assert score.pass_rate == 0.5
+
+    def test_suite_latency_percentiles(self):
+        from sandbox.schema.config import ScoringConfig
+        from sandbox.schema.result import CaseResult, SuiteResult, TurnResult
+        from sandbox.scoring.scorer import Scorer, SuiteScorer
+
+        suite_result = SuiteResult(
+            suite_name="s",
+            target="t",
+            case_results=[
+                CaseResult(
+                    case_id=f"c{i}",
+                    status="completed",
+                    turns=[
+                        TurnResult(
+                            turn_index=0,
+                            user_message="hi",
+                            bot_response="hello",
+                            latency_ms=100.0 * (i + 1),
+                            ttft_ms=10.0 * (i + 1),
+                        )
+                    ],
+                )
+                for i in range(5)
+            ],
+        )
+        score = SuiteScorer(Scorer(ScoringConfig())).score_suite(suite_result)
+        # 分位数来自直方图（相对误差不超过 0.1%），最大值精确
+        assert score.latency_percentiles["latency_ms"]["p50"] == pytest.approx(300.0, rel=1e-3)
+        assert score.latency_percentiles["ttft_ms"]["max"] == 50.0
+        assert "output_tokens_per_sec" not in score.latency_percentiles
+
+    def test_suite_budgets_histograms_and_tokens(self):
+        from sandbox.schema.config import ScoringConfig
+        from sandbox.schema.result import CaseResult, SuiteResult, TurnResult
+        from sandbox.schema.test_case import PercentileBudget
+        from sandbox.scoring.scorer import Scorer, SuiteScorer
+
+        suite_result = SuiteResult(
+            suite_name="s",
+            target="t",
+            case_results=[
+                CaseResult(
+                    case_id=f"c{i}",
+                    status="completed",
+                    turns=[
+                        TurnResult(
+                            turn_index=turn,
+                            user_message="hi",
+                            bot_response="hello",
+                            latency_ms=1000.0 * (i + 1) + turn,
+                            token_usage={"total_tokens": 10},
+                        )
+                        for turn in range(2)
+                    ],
+                )
+                for i in range(10)
+            ],
+        )
+        budgets = [
+            PercentileBudget(metric="latency_ms", percentile=95, max=8000),
+            PercentileBudget(metric="latency_ms", percentile=50, max=8000),
+            PercentileBudget(metric="ttft_ms", percentile=99, max=100),
+        ]
+        score = SuiteScorer(Scorer(ScoringConfig())).score_suite(suite_result, budgets)
+
+        assert [r.passed for r in score.budget_results] == [False, True, True]
+        assert score.budgets_passed is False
+        assert "没有数据" in score.budget_results[2].message
+        # 预算与报告中的可合并直方图一致
+        p95 = score.histograms["latency_ms"].percentile(95)
+        assert score.budget_results[0].actual == round(p95, 2)
+        assert score.token_totals == {"total_tokens": 200}
+        assert sorted(score.turn_latency_histograms) == [0, 1]
+        assert score.turn_latency_histograms[1].count == 10
+        assert score.histograms["latency_ms"].count == 20
+        # 用例时延为各轮之和
+        assert score.latency_percentiles["case_latency_ms"]["max"] == 20001.0
+
+
+class TestLexicon:
+    """测试 Aho-Corasick 禁止词词表"""
+
+    def test_finds_overlapping_hits_with_offsets(self):
+        from sandbox.assertion.lexicon import Lexicon
+
+        lexicon = Lexicon(["he", "she", "his", "hers", "我是AI"])
+        hits = lexicon.find_all("ushers，我是AI")
+        assert [(h.term, h.start, h.end) for h in hits] == [
+            ("she", 1, 4),
+            ("he", 2, 4),
+            ("hers", 2, 6),
+            ("我是AI", 7, 11),
+        ]
+        assert lexicon.search("ushers")
+        assert not lexicon.search("没有命中")
+
+    def test_normalization_maps_offsets_to_original(self):
+        from sandbox.assertion.lexicon import Lexicon
+
+        lexicon = Lexicon(["chatgpt", "人工 智能"], frozenset({"width", "case", "whitespace"}))
+        text = "我不是ＣｈａｔＧＰＴ，也不是人工　智能"
+        hits = lexicon.find_all(text)
+        assert [text[h.start : h.end] for h in hits] == ["ＣｈａｔＧＰＴ", "人工　智能"]
+        assert lexicon.max_span is None
+
+    def test_values_file_assertion_shared_and_streaming(self, tmp_path):
+        from sandbox.assertion.base import AssertionContext
+        from sandbox.assertion.builder import build_assertion
+        from sandbox.assertion.string_match import LexiconNotContainsAssertion
+        from sandbox.schema.test_case import AssertionSpec
+
+        words = tmp_path / "banned.txt"
+        words.write_text("# 合规词表\n保本\n\n稳赚不赔\nGuaranteed\n", encoding="utf-8")
+        spec = AssertionSpec(type="not_contains", values_file=str(words), normalize=["case"])
+
+        a = build_assertion(spec)
+        b = build_assertion(spec)
+        assert isinstance(a, LexiconNotContainsAssertion)
+        assert a.lexicon is b.lexicon
+        assert len(a.lexicon) == 3
+
+        result = asyncio.run(a.evaluate("本产品保本，GUARANTEED 收益", {}, AssertionContext()))
+        assert not result.passed
+        assert [(d["term"], d["start"], d["text"]) for d in result.details] == [
+            ("保本", 3, "保本"),
+            ("Guaranteed", 6, "GUARANTEED"),
+        ]
+
+        # 跨分片的禁止词也能在流式过程中发现
+        assert a.check_partial("稳赚", 0, 10) is None
+        assert a.check_partial("稳赚不赔", 2, 20).passed is False
+
+    def test_missing_values_file(self):
+        from sandbox.assertion.builder import build_assertion
+        from sandbox.core.exceptions import AssertionError_
+        from sandbox.schema.test_case import AssertionSpec
+
+        with pytest.raises(AssertionError_, match="词表文件不存在"):
+            build_assertion(AssertionSpec(type="not_contains", values_file="/no/such/file.txt"))
+
+    def test_lexicon_cache_is_bounded(self, tmp_path):
+        from sandbox.assertion import lexicon as lexicon_module
+
+        cache = lexicon_module._LEXICON_CACHE
+        words = tmp_path / "banned.txt"
+        words.write_text("保本\n", encoding="utf-8")
+        first = lexicon_module.load_lexicon(str(words))
+        assert lexicon_module.load_lexicon(str(words)) is first
+        for i in range(cache.maxsize + 5):
+            lexicon_module.load_lexicon(values=[f"词{i}"])
+        assert len(cache) == cache.maxsize
+        assert lexicon_module.load_lexicon(str(words)) is not first
+
+
+class TestJSONLResults:
+    """测试 JSONL 结果流与由其生成的 JSON 报告"""
+
+    def _case(self, i: int, passed: bool = True):
+        from sandbox.schema.result import AssertionResult, CaseResult, TurnResult
+
+        return CaseResult(
+            case_id=f"c{i}",
+            status="completed",
+            turns=[
+                TurnResult(
+                    turn_index=0,
+                    user_message="hi",
+                    bot_response="你好",
+                    latency_ms=100.0 * (i + 1),
+                    assertions=[
+                        AssertionResult(
+                            passed=passed, assertion_type="contains", message="ok", score=0.5
+                        )
+                    ],
+                )
+            ],
+        )
+
+    def test_sink_round_trip_and_truncated_tail(self, tmp_path):
+        from sandbox.report.jsonl_sink import JSONLResultSink, load_case_results
+
+        path = tmp_path / "s.jsonl"
+        sink = JSONLResultSink(path, "s", "bot")
+        sink.write(self._case(0))
+        sink.write(self._case(1, passed=False))
+        # 写入即落盘：关闭前即可读到
+        assert [r.case_id for r in load_case_results(path)] == ["c0", "c1"]
+        sink.close(stats={"concurrency": {}})
+
+        # 模拟中断时写了一半的行
+        with path.open("a", encoding="utf-8") as f:
+            f.write('{"type":"case","case":{"case_')
+        results = load_case_results(path)
+        assert results == [self._case(0), self._case(1, passed=False)]
+
+    def test_streaming_aggregator_matches_suite_scorer(self):
+        from sandbox.schema.config import ScoringConfig
+        from sandbox.schema.result import SuiteResult
+        from sandbox.scoring.scorer import Scorer, SuiteScorer
+
+        cases = [self._case(i, passed=i % 2 == 0) for i in range(5)]
+        suite_scorer = SuiteScorer(Scorer(ScoringConfig()))
+        aggregator = suite_scorer.aggregator("s")
+        for case in cases:
+            aggregator.add(case)
+        streamed = aggregator.finish()
+        # 流式聚合不保留用例级评分；score_suite 的结果本就在内存中，额外带上用例评分
+        scored = suite_scorer.score_suite(
+            SuiteResult(suite_name="s", target="bot", case_results=cases)
+        )
+        assert [cs.case_id for cs in scored.case_scores] == [case.case_id for case in cases]
+        assert streamed.case_scores == []
+        scored.case_scores = []
+        assert streamed == scored
+        assert streamed.passed_cases == 3
+
+    def test_report_writer_streams_cases_as_indented_json(self, tmp_path):
+        import json
+
+        from sandbox.report.json_report import _write_report
+
+        report = {"version": "1.0", "summary": {"note": "多行\n说明", "empty": {}}}
+
+        def cases():
+            for i in range(3):
+                yield {"case_id": f"c{i}", "turns": [{"text": "a\nb"}], "tags": []}
+
+        path = tmp_path / "r.json"
+        _write_report(path, report, cases())
+        expected = {
+            **report,
+            "cases": [
+                {"case_id": f"c{i}", "turns": [{"text": "a\nb"}], "tags": []} for i in range(3)
+            ],
+        }
+        assert path.read_text("utf-8") == json.dumps(expected, ensure_ascii=False, indent=2)
+
+        _write_report(path, report, iter(()))
+        assert path.read_text("utf-8") == json.dumps(
+            {**report, "cases": []}, ensure_ascii=False, indent=2
+        )
+
+    def test_report_from_jsonl_matches_direct_report(self, tmp_path):
+        import json
+
+        from sandbox.report.json_report import (
+            generate_json_report,
+            generate_json_report_from_jsonl,
+        )
+        from sandbox.report.jsonl_sink import JSONLResultSink
+        from sandbox.schema.config import ScoringConfig
+        from sandbox.schema.result import SuiteResult
+        from sandbox.scoring.scorer import Scorer, SuiteScorer
+        from sandbox.utils.histogram import Histogram
+
+        cases = [self._case(i) for i in range(3)]
+        stats = {"concurrency": {"limit": 4}}
+        suite_result = SuiteResult(suite_name="s", target="bot", case_results=cases, stats=stats)
+        score = SuiteScorer(Scorer(ScoringConfig())).score_suite(suite_result)
+
+        sink = JSONLResultSink(tmp_path / "s.jsonl", "s", "bot")
+        for case in cases:
+            sink.write(case)
+        sink.close(stats=stats)
+
+        derived = json.loads(generate_json_report_from_jsonl(sink.path, score).read_text("utf-8"))
+        direct_path = generate_json_report(suite_result, score, output_dir=str(tmp_path / "r"))
+        direct = json.loads(direct_path.read_text("utf-8"))
+        derived.pop("generated_at")
+        direct.pop("generated_at")
+        assert derived == direct
+        assert len(derived["cases"]) == 3
+        assert derived["summary"]["turn_latency"]["0"]["count"] == 3
+        histogram = Histogram.from_dict(derived["histograms"]["latency_ms"])
+        assert histogram == score.histograms["latency_ms"]
+
+        # 无用例时仍是合法 JSON
+        empty = JSONLResultSink(tmp_path / "e.jsonl", "e", "bot")
+        empty.close()
+        empty_score = SuiteScorer(Scorer(ScoringConfig())).aggregator("e").finish()
+        report = json.loads(generate_json_report_from_jsonl(empty.path, empty_score).read_text())
+        assert report["cases"] == []
+
+
+class TestResumeRun:
+    """测试 sandbox run --resume 续跑"""
+
+    def test_resume_skips_completed_and_merges_report(self, tmp_path, monkeypatch):
+        import json
+
+        from click.testing import CliRunner
+
+        from sandbox.cli import cli
+        from sandbox.report.jsonl_sink import JSONLResultSink, load_case_results
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.result import CaseResult, SuiteResult
+
+        for name in (
+            "DIFY_PROD_API_KEY",
+            "DIFY_STAGING_API_KEY",
+            "JUDGE_LLM_API_KEY",
+            "SIM_USER_LLM_API_KEY",
+        ):
+            monkeypatch.setenv(name, "test")
+
+        previous = JSONLResultSink(tmp_path / "prev.jsonl", "电话号码提取回归测试", "production")
+        previous.write(CaseResult(case_id="phone_basic", status="completed"))
+        previous.write(CaseResult(case_id="phone_with_noise", status="error", error_message="503"))
+        previous.close()
+
+        executed: list[str] = []
+
+        async def fake_run_suites(self, suite_specs, on_result=None):
+            results = []
+            for index, spec in enumerate(suite_specs):
+                case_results = []
+                for case in spec.cases:
+                    executed.append(case.id)
+                    case_result = CaseResult(case_id=case.id, status="completed")
+                    on_result(index, case_result)
+                    case_results.append(case_result)
+                results.append(
+                    SuiteResult(spec.suite.name, spec.suite.target, case_results, stats={})
+                )
+            return results
+
+        monkeypatch.setattr(TestEngine, "run_suites", fake_run_suites)
+
+        out_dir = tmp_path / "reports"
+        result = CliRunner().invoke(
+            cli,
+            [
+                "--config",
+                "examples/sandbox.yaml",
+                "run",
+                "examples/suites/phone_extraction.yaml",
+                "--output-dir",
+                str(out_dir),
+                "--resume",
+                str(previous.path),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        # 已完成的用例不再执行，出错的用例重新执行
+        assert executed == ["phone_with_noise", "phone_rejection"]
+
+        merged = load_case_results(next(out_dir.glob("*.jsonl")))
+        assert [r.case_id for r in merged] == ["phone_basic", "phone_with_noise", "phone_rejection"]
+        report = json.loads(next(out_dir.glob("*.json")).read_text("utf-8"))
+        assert report["summary"]["total_cases"] == 3
+        assert report["summary"]["passed"] == 3
+
+    def test_read_completed_results_uses_last_entry(self, tmp_path):
+        from sandbox.report.jsonl_sink import JSONLResultSink, read_completed_results
+        from sandbox.schema.result import CaseResult
+
+        sink = JSONLResultSink(tmp_path / "r.jsonl", "s", "bot")
+        sink.write(CaseResult(case_id="a", status="error"))
+        sink.write(CaseResult(case_id="b", status="completed"))
+        sink.write(CaseResult(case_id="a", status="completed"))
+        sink.write(CaseResult(case_id="b", status="error"))
+        sink.close()
+
+        suite_name, completed = read_completed_results(sink.path)
+        assert suite_name == "s"
+        assert list(completed) == ["a"]
+
+
+class TestResultCache:
+    """测试增量运行的用例结果缓存"""
+
+    def _case(self, query: str = "hi", judge_scene: str | None = None):
+        from sandbox.schema.test_case import SingleTurnInput, TestCaseSpec
+
+        return TestCaseSpec(
+            id="c1",
+            name="c1",
+            type="single_turn",
+            input=SingleTurnInput(query=query),
+            judge_scene=judge_scene,
+        )
+
+    def test_fingerprint_tracks_inputs(self, tmp_path):
+        from sandbox.runner.result_cache import ResultCache
+        from sandbox.schema.config import TargetConfig
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        scene = tmp_path / "scene.yaml"
+        scene.write_text("scene: a", encoding="utf-8")
+        target = TargetConfig(api_base="http://dify", api_key="k1")
+
+        def fingerprint(case=None, shared=None, target_config=target, version="v1"):
+            cache = ResultCache(SQLiteCache(tmp_path / "r.sqlite"), prompt_version=version)
+            try:
+                return cache.fingerprint(
+                    case or self._case(judge_scene=str(scene)), shared or {}, target_config
+                )
+            finally:
+                cache.close()
+
+        base = fingerprint()
+        assert fingerprint() == base
+        # 超时、重试等不影响回答
+        assert fingerprint(target_config=target.model_copy(update={"timeout": 99})) == base
+
+        assert fingerprint(case=self._case("hello", judge_scene=str(scene))) != base
+        assert fingerprint(shared={"ai_profile": "x"}) != base
+        assert fingerprint(target_config=target.model_copy(update={"api_key": "k2"})) != base
+        assert fingerprint(version="v2") != base
+        scene.write_text("scene: b", encoding="utf-8")
+        assert fingerprint() != base
+
+    def test_fingerprint_tracks_lexicons_and_judge(self, tmp_path):
+        from sandbox.runner.result_cache import ResultCache
+        from sandbox.schema.config import LLMConfig, TargetConfig
+        from sandbox.schema.test_case import AssertionSpec, SingleTurnInput, TestCaseSpec, TurnSpec
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        lexicon = tmp_path / "banned.txt"
+        lexicon.write_text("ChatGPT\n", encoding="utf-8")
+        target = TargetConfig(api_base="http://dify", api_key="k1")
+        # 词表引用在多轮用例的某一轮中
+        lexicon_case = TestCaseSpec(
+            id="m",
+            name="m",
+            type="multi_turn",
+            turns=[
+                TurnSpec(
+                    user="hi",
+                    assertions=[AssertionSpec(type="not_contains", values_file=str(lexicon))],
+                )
+            ],
+        )
+        judge_case = TestCaseSpec(
+            id="j",
+            name="j",
+            type="single_turn",
+            input=SingleTurnInput(query="hi"),
+            assertions=[AssertionSpec(type="llm_judge", criteria="礼貌", pass_threshold=0.7)],
+        )
+
+        def fingerprint(case, judge=LLMConfig(model="m1")):
+            cache = ResultCache(SQLiteCache(tmp_path / "r.sqlite"), judge=judge)
+            try:
+                return cache.fingerprint(case, None, target)
+            finally:
+                cache.close()
+
+        base = fingerprint(lexicon_case)
+        lexicon.write_text("ChatGPT\n文心一言\n", encoding="utf-8")
+        assert fingerprint(lexicon_case) != base
+        # 不使用 Judge 的用例不受 Judge 配置影响
+        edited = fingerprint(lexicon_case)
+        assert fingerprint(lexicon_case, judge=LLMConfig(model="m2")) == edited
+
+        judged = fingerprint(judge_case)
+        assert fingerprint(judge_case, judge=LLMConfig(model="m2")) != judged
+        assert fingerprint(judge_case, judge=LLMConfig(model="m1", temperature=0.5)) != judged
+        assert fingerprint(judge_case, judge=LLMConfig(model="m1", api_base="http://j")) != judged
+
+    def test_reuses_completed_results_only(self, tmp_path):
+        from sandbox.runner.result_cache import ResultCache
+        from sandbox.schema.result import CaseResult, TurnResult
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        cache = ResultCache(SQLiteCache(tmp_path / "r.sqlite"))
+        completed = CaseResult(
+            case_id="c1",
+            status="completed",
+            turns=[TurnResult(turn_index=0, user_message="hi", bot_response="ok", latency_ms=5)],
+        )
+        cache.put("fp1", completed)
+        cache.put("fp2", CaseResult(case_id="c2", status="error", error_message="503"))
+        assert cache.get("fp1") == completed
+        assert cache.get("fp2") is None
+        cache.close()
+
+    def test_incremental_run_skips_unchanged_cases(self, tmp_path, monkeypatch):
+        from click.testing import CliRunner
+
+        from sandbox.cli import cli
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.result import CaseResult, SuiteResult
+
+        config_file = tmp_path / "sandbox.yaml"
+        config_file.write_text(
+            "targets:\n"
+            "  production:\n"
+            '    api_base: "http://dify"\n'
+            '    api_key: "test"\n'
+            "result_cache:\n"
+            f'  path: "{tmp_path / "results.sqlite"}"\n'
+            "report:\n"
+            f'  output_dir: "{tmp_path / "reports"}"\n'
+            '  formats: ["json"]\n',
+            encoding="utf-8",
+        )
+        executed: list[str] = []
+
+        async def fake_run_suites(self, suite_specs, on_result=None):
+            results = []
+            for index, spec in enumerate(suite_specs):
+                case_results = []
+                for case in spec.cases:
+                    executed.append(case.id)
+                    case_result = CaseResult(case_id=case.id, status="completed")
+                    on_result(index, case_result)
+                    case_results.append(case_result)
+                results.append(SuiteResult(spec.suite.name, spec.suite.target, case_results))
+            return results
+
+        monkeypatch.setattr(TestEngine, "run_suites", fake_run_suites)
+
+        def run(*extra):
+            args = ["--config", str(config_file), "run", "examples/suites/phone_extraction.yaml"]
+            result = CliRunner().invoke(cli, [*args, "--incremental", *extra])
+            assert result.exit_code == 0, result.output
+
+        run()
+        assert len(executed) == 3
+        run()
+        assert len(executed) == 3
+        # Prompt 版本变化后全部重新执行
+        run("--prompt-version", "v2")
+        assert len(executed) == 6
+
+
+class TestShardAndMerge:
+    """测试 run --shard 与 sandbox merge"""
+
+    def test_shards_cover_suite_and_merge_into_one_report(self, tmp_path, monkeypatch):
+        import json
+
+        from click.testing import CliRunner
+
+        from sandbox.cli import cli
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.result import CaseResult, SuiteResult
+
+        for name in (
+            "DIFY_PROD_API_KEY",
+            "DIFY_STAGING_API_KEY",
+            "JUDGE_LLM_API_KEY",
+            "SIM_USER_LLM_API_KEY",
+        ):
+            monkeypatch.setenv(name, "test")
+        executed: list[str] = []
+
+        async def fake_run_suites(self, suite_specs, on_result=None):
+            results = []
+            for index, spec in enumerate(suite_specs):
+                case_results = []
+                for case in spec.cases:
+                    executed.append(case.id)
+                    case_result = CaseResult(case_id=case.id, status="completed")
+                    on_result(index, case_result)
+                    case_results.append(case_result)
+                results.append(SuiteResult(spec.suite.name, spec.suite.target, case_results))
+            return results
+
+        monkeypatch.setattr(TestEngine, "run_suites", fake_run_suites)
+        base = ["--config", "examples/sandbox.yaml"]
+        shard_dir = tmp_path / "shards"
+        for shard in ("1/2", "2/2"):
+            result = CliRunner().invoke(
+                cli,
+                [
+                    *base,
+                    "run",
+                    "examples/suites/phone_extraction.yaml",
+                    "--shard",
+                    shard,
+                    "--output-dir",
+                    str(shard_dir),
+                ],
+            )
+            assert result.exit_code == 0, result.output
+        assert sorted(executed) == ["phone_basic", "phone_rejection", "phone_with_noise"]
+
+        shard_logs = sorted(str(p) for p in shard_dir.glob("*.shard*.jsonl"))
+        assert len(shard_logs) == 2
+        merged_dir = tmp_path / "merged"
+        result = CliRunner().invoke(
+            cli, [*base, "merge", *shard_logs, "--output-dir", str(merged_dir)]
+        )
+        assert result.exit_code == 0, result.output
+        report = json.loads(next(merged_dir.glob("*.json")).read_text("utf-8"))
+        assert report["summary"]["total_cases"] == 3
+        assert sorted(c["case_id"] for c in report["cases"]) == sorted(executed)
+        assert len(report["execution"]["shards"]) == 2
+
+    def test_merge_checks_suite_budgets(self, tmp_path, monkeypatch):
+        import json
+
+        from click.testing import CliRunner
+
+        from sandbox.cli import cli
+        from sandbox.report.jsonl_sink import JSONLResultSink
+        from sandbox.schema.result import CaseResult, TurnResult
+
+        for name in (
+            "DIFY_PROD_API_KEY",
+            "DIFY_STAGING_API_KEY",
+            "JUDGE_LLM_API_KEY",
+            "SIM_USER_LLM_API_KEY",
+        ):
+            monkeypatch.setenv(name, "test")
+        sink = JSONLResultSink(tmp_path / "s.jsonl", "预算套件", "production")
+        for i in range(10):
+            turn = TurnResult(
+                turn_index=0, user_message="hi", bot_response="hello", latency_ms=1000.0 * (i + 1)
+            )
+            sink.write(CaseResult(case_id=f"c{i}", status="completed", turns=[turn]))
+        sink.close()
+
+        def merge_with_budget(max_ms: int):
+            suite_file = tmp_path / "budget.yaml"
+            suite_file.write_text(
+                "suite:\n"
+                "  name: 预算套件\n"
+                "  target: production\n"
+                "  budgets:\n"
+                f"    - {{metric: latency_ms, percentile: 95, max: {max_ms}}}\n"
+                "cases:\n"
+                "  - {id: c0, name: c0, type: single_turn, input: {query: hi}}\n",
+                encoding="utf-8",
+            )
+            output_dir = tmp_path / f"merged_{max_ms}"
+            result = CliRunner().invoke(
+                cli,
+                [
+                    "--config",
+                    "examples/sandbox.yaml",
+                    "merge",
+                    str(sink.path),
+                    "--suite",
+                    str(suite_file),
+                    "--output-dir",
+                    str(output_dir),
+                ],
+            )
+            report = json.loads(next(output_dir.glob("*.json")).read_text("utf-8"))
+            return result, report
+
+        # p95 = 9550ms
+        result, report = merge_with_budget(8000)
+        assert result.exit_code == 1, result.output
+        assert report["summary"]["budgets"][0]["passed"] is False
+        result, report = merge_with_budget(10000)
+        assert result.exit_code == 0, result.output
+        assert report["summary"]["budgets_passed"] is True
+
+    def test_rejects_invalid_shard(self):
+        from click.testing import CliRunner
+
+        from sandbox.cli import cli
+
+        result = CliRunner().invoke(
+            cli, ["run", "examples/suites/phone_extraction.yaml", "--shard", "3/2"]
+        )
+        assert result.exit_code == 2
+
+    def test_report_paths_do_not_collide(self, tmp_path):
+        from sandbox.report.json_report import report_file_path
+
+        # 同名套件 / 同一秒内结束的分片各自得到独立的文件
+        paths = {report_file_path(str(tmp_path), "s", ".jsonl") for _ in range(20)}
+        assert len(paths) == 20
+
+
+class TestHistogram:
+    """测试 HDR 风格直方图"""
+
+    def test_percentiles_within_relative_error(self):
+        import math
+        import random
+
+        from sandbox.utils.histogram import Histogram
+
+        rng = random.Random(7)
+        values = sorted(rng.expovariate(1 / 200) for _ in range(20_000))
+        histogram = Histogram(significant_figures=3)
+        for value in values:
+            histogram.record(value)
+
+        assert histogram.count == len(values)
+        assert histogram.max == values[-1]
+        for q in (50, 90, 99, 99.9):
+            exact = values[math.ceil(q / 100 * len(values)) - 1]
+            assert abs(histogram.percentile(q) - exact) / exact < 2e-3
+        summary = histogram.summary()
+        assert set(summary) == {"count", "mean", "max", "p50", "p90", "p95", "p99", "p99.9"}
+
+    def test_merge_and_round_trip(self):
+        import json
+
+        import pytest
+
+        from sandbox.utils.histogram import Histogram
+
+        a, b, combined = Histogram(), Histogram(), Histogram()
+        for i in range(1, 1001):
+            (a if i % 2 else b).record(float(i))
+            combined.record(float(i))
+        a.merge(b)
+        assert a.counts == combined.counts
+        assert a.percentile(99) == combined.percentile(99)
+
+        restored = Histogram.from_dict(json.loads(json.dumps(a.to_dict())))
+        assert restored.summary() == a.summary()
+
+        with pytest.raises(ValueError):
+            a.merge(Histogram(significant_figures=2))
+        with pytest.raises(ValueError):
+            a.record(-1)
+        assert Histogram().summary() == {}
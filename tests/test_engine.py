@@ -0,0 +1,575 @@
+"""测试执行引擎与并发控制"""
+
+import asyncio
+
+from sandbox.runner.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    StaticConcurrencyLimiter,
+    build_concurrency_limiter,
+)
+from sandbox.schema.config import AdaptiveConcurrencyConfig, ExecutionConfig
+
+
+class TestAdaptiveConcurrency:
+    """测试 AIMD 自适应并发"""
+
+    def test_grows_when_saturated_and_healthy(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, min_limit=1, max_limit=4)
+
+        async def _run():
+            async with limiter:
+                async with limiter:
+                    for _ in range(20):
+                        limiter.record(100, 200)
+
+        asyncio.run(_run())
+        assert limiter.limit == 4
+        assert limiter.history[0] == (0.0, 2)
+        assert limiter.history[-1][1] == 4
+
+    def test_does_not_grow_when_idle(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=5, min_limit=1, max_limit=50)
+        for _ in range(50):
+            limiter.record(100, 200)
+        assert limiter.limit == 5
+
+    def test_cuts_on_throttle_and_respects_floor(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=10, min_limit=3, backoff_ratio=0.5)
+        limiter.record(100, 429)
+        assert limiter.limit == 5
+        limiter._last_decrease = 0.0
+        limiter.record(100, 503)
+        assert limiter.limit == 3
+        limiter._last_decrease = 0.0
+        limiter.record(100, None)
+        assert limiter.limit == 3
+
+    def test_cuts_on_latency_inflation(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=10, latency_tolerance=2.0, backoff_ratio=0.5)
+        for _ in range(10):
+            limiter.record(100, 200)
+        for _ in range(10):
+            limiter.record(2000, 200)
+        assert limiter.limit < 10
+
+    def test_limits_in_flight(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, min_limit=1, max_limit=2)
+        peak = 0
+
+        async def _work():
+            nonlocal peak
+            async with limiter:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        async def _run():
+            await asyncio.gather(*[_work() for _ in range(6)])
+
+        asyncio.run(_run())
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    def test_build_from_config(self):
+        assert isinstance(build_concurrency_limiter(ExecutionConfig()), StaticConcurrencyLimiter)
+        limiter = build_concurrency_limiter(
+            ExecutionConfig(
+                concurrency=100,
+                adaptive_concurrency=AdaptiveConcurrencyConfig(enabled=True, max_concurrency=20),
+            )
+        )
+        assert isinstance(limiter, AdaptiveConcurrencyLimiter)
+        assert limiter.limit == 20
+
+
+class TestStageConcurrency:
+    """测试目标名额只在 Dify 请求期间占用"""
+
+    def test_target_slot_released_during_judge(self):
+        import json
+
+        import httpx
+
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.config import LLMConfig, SandboxConfig, TargetConfig
+        from sandbox.schema.test_case import (
+            AssertionSpec,
+            SingleTurnInput,
+            SuiteMetadata,
+            TestCaseSpec,
+            TestSuiteSpec,
+        )
+
+        events: list[str] = []
+        target = TargetConfig(api_base="http://dify", api_key="test")
+        config = SandboxConfig(
+            targets={"bot": target},
+            judge=LLMConfig(api_base="http://judge", api_key="test"),
+            execution=ExecutionConfig(concurrency=1, judge_concurrency=5),
+        )
+
+        def dify_handler(request):
+            query = json.loads(request.content)["query"]
+            events.append(f"dify {query}")
+            return httpx.Response(
+                200, json={"answer": f"答{query}", "conversation_id": "c", "message_id": "m"}
+            )
+
+        async def judge_handler(request):
+            await asyncio.sleep(0.05)
+            events.append("judge")
+            content = '{"score": 0.9, "reasoning": "好"}'
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+        suite = TestSuiteSpec(
+            suite=SuiteMetadata(name="s", target="bot"),
+            cases=[
+                TestCaseSpec(
+                    id=f"c{i}",
+                    name=f"c{i}",
+                    type="single_turn",
+                    input=SingleTurnInput(query=str(i)),
+                    assertions=[
+                        AssertionSpec(type="llm_judge", criteria=f"标准{i}", pass_threshold=0.5)
+                    ],
+                )
+                for i in range(3)
+            ],
+        )
+
+        async def _run():
+            async with TestEngine(config) as engine:
+                dify = engine.client_pool.dify_client(target)
+                dify._client = httpx.AsyncClient(
+                    base_url=target.api_base, transport=httpx.MockTransport(dify_handler)
+                )
+                engine.judge_client._client = httpx.AsyncClient(
+                    base_url="http://judge", transport=httpx.MockTransport(judge_handler)
+                )
+                return await engine.run_suite(suite)
+
+        result = asyncio.run(_run())
+        assert all(c.status == "completed" for c in result.case_results)
+        assert all(c.turns[0].assertions[0].passed for c in result.case_results)
+        # 目标并发为 1，但三个 Dify 请求都在第一个 Judge 完成前发出
+        assert events[:3] == ["dify 0", "dify 1", "dify 2"]
+        assert result.stats["concurrency"]["max_cases_in_flight"] == 6
+
+
+class TestRunSuites:
+    """测试多个套件在同一事件循环中并发执行"""
+
+    def test_suites_share_one_engine_and_overlap(self):
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.config import SandboxConfig, TargetConfig
+        from sandbox.schema.result import CaseResult
+        from sandbox.schema.test_case import (
+            SingleTurnInput,
+            SuiteMetadata,
+            TestCaseSpec,
+            TestSuiteSpec,
+        )
+
+        config = SandboxConfig(
+            targets={"bot": TargetConfig(api_base="http://dify", api_key="test")},
+            execution=ExecutionConfig(concurrency=4),
+        )
+        state = {"active": 0, "peak": 0}
+
+        async def fake_execute(case, target, shared_inputs, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.02)
+            state["active"] -= 1
+            return CaseResult(case_id=case.id, status="completed")
+
+        def suite(name):
+            return TestSuiteSpec(
+                suite=SuiteMetadata(name=name, target="bot"),
+                cases=[
+                    TestCaseSpec(
+                        id=f"{name}-{i}",
+                        name=str(i),
+                        type="single_turn",
+                        input=SingleTurnInput(query="hi"),
+                    )
+                    for i in range(2)
+                ],
+            )
+
+        async def _run():
+            async with TestEngine(config) as engine:
+                engine._single_turn_runner.execute = fake_execute
+                return await engine.run_suites([suite("a"), suite("b"), suite("c")])
+
+        results = asyncio.run(_run())
+        assert [r.suite_name for r in results] == ["a", "b", "c"]
+        assert [c.case_id for c in results[1].case_results] == ["b-0", "b-1"]
+        # 6 个用例共享同一个引擎：跨套件同时进行
+        assert state["peak"] == 6
+        # 共享资源的统计是运行级的，各套件得到同一份快照
+        assert results[0].stats["scope"] == "run"
+        assert results[0].stats["suites"] == ["a", "b", "c"]
+        assert all(r.stats is results[0].stats for r in results)
+
+
+class TestIterResults:
+    """测试工作池模式的流式执行"""
+
+    def test_streams_lazily_with_bounded_in_flight(self):
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.config import SandboxConfig, TargetConfig
+        from sandbox.schema.result import CaseResult
+        from sandbox.schema.test_case import SingleTurnInput, SuiteMetadata, TestCaseSpec
+
+        config = SandboxConfig(
+            targets={"bot": TargetConfig(api_base="http://dify", api_key="test")},
+            execution=ExecutionConfig(concurrency=4),
+        )
+        state = {"produced": 0, "completed": 0, "peak_pending": 0, "produced_at_first": None}
+
+        async def fake_execute(case, target, shared_inputs, **kwargs):
+            await asyncio.sleep(0.001)
+            return CaseResult(case_id=case.id, status="completed")
+
+        async def cases():
+            for i in range(200):
+                state["produced"] += 1
+                pending = state["produced"] - state["completed"]
+                state["peak_pending"] = max(state["peak_pending"], pending)
+                yield TestCaseSpec(
+                    id=f"c{i}", name=str(i), type="single_turn", input=SingleTurnInput(query="hi")
+                )
+
+        async def _run():
+            ids = []
+            async with TestEngine(config) as engine:
+                engine._single_turn_runner.execute = fake_execute
+                suite = SuiteMetadata(name="big", target="bot")
+                async for result in engine.iter_results(suite, cases(), workers=4):
+                    if state["produced_at_first"] is None:
+                        state["produced_at_first"] = state["produced"]
+                    state["completed"] += 1
+                    ids.append(result.case_id)
+            return ids
+
+        ids = asyncio.run(_run())
+        assert sorted(ids) == sorted(f"c{i}" for i in range(200))
+        # 用例按需生成：第一个结果产出时远未消费完生成器
+        assert state["produced_at_first"] < 50
+        # 未完成的用例数受 worker 数与队列容量约束，与总数无关
+        assert state["peak_pending"] <= 4 * 3 + 1
+
+    def test_consumer_can_stop_early(self):
+        from contextlib import aclosing
+
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.config import SandboxConfig, TargetConfig
+        from sandbox.schema.result import CaseResult
+        from sandbox.schema.test_case import SingleTurnInput, SuiteMetadata, TestCaseSpec
+
+        config = SandboxConfig(
+            targets={"bot": TargetConfig(api_base="http://dify", api_key="test")},
+        )
+
+        async def fake_execute(case, target, shared_inputs, **kwargs):
+            await asyncio.sleep(0.001)
+            return CaseResult(case_id=case.id, status="completed")
+
+        cases = [
+            TestCaseSpec(
+                id=f"c{i}", name=str(i), type="single_turn", input=SingleTurnInput(query="hi")
+            )
+            for i in range(100)
+        ]
+
+        async def _first(engine, suite):
+            # 用例与结果队列都已填满时提前退出，生成器关闭不能卡住
+            async with aclosing(engine.iter_results(suite, cases, workers=2)) as results:
+                async for result in results:
+                    await asyncio.sleep(0.05)
+                    return result
+
+        async def _run():
+            async with TestEngine(config) as engine:
+                engine._single_turn_runner.execute = fake_execute
+                suite = SuiteMetadata(name="big", target="bot")
+                return await asyncio.wait_for(_first(engine, suite), timeout=2)
+
+        assert asyncio.run(_run()).status == "completed"
+
+    def test_unknown_target_and_bad_case_yield_errors(self):
+        from sandbox.runner.engine import TestEngine
+        from sandbox.schema.config import SandboxConfig, TargetConfig
+        from sandbox.schema.test_case import SingleTurnInput, SuiteMetadata, TestCaseSpec
+
+        config = SandboxConfig(
+            targets={"bot": TargetConfig(api_base="http://dify", api_key="test")},
+        )
+        case = TestCaseSpec(
+            id="s1",
+            name="scene",
+            type="single_turn",
+            input=SingleTurnInput(query="hi"),
+            judge_scene="missing_scene.yaml",
+        )
+
+        async def _run():
+            async with TestEngine(config) as engine:
+                missing = [
+                    r
+                    async for r in engine.iter_results(
+                        SuiteMetadata(name="x", target="nope"), [case]
+                    )
+                ]
+                bad_scene = [
+                    r
+                    async for r in engine.iter_results(
+                        SuiteMetadata(name="x", target="bot"), [case]
+                    )
+                ]
+            return missing, bad_scene
+
+        missing, bad_scene = asyncio.run(_run())
+        assert missing[0].status == "error" and "未在配置中定义" in missing[0].error_message
+        assert bad_scene[0].status == "error"
+        assert "加载场景文件失败" in bad_scene[0].error_message
+
+
+class TestSharding:
+    """测试确定性用例分片"""
+
+    def test_partition_is_complete_deterministic_and_balanced(self):
+        from sandbox.runner.sharding import partition
+
+        case_ids = [f"c{i}" for i in range(10)]
+        weights = {"c0": 90.0, "c1": 50.0, "c2": 40.0, "c3": 10.0}
+        shards = partition(case_ids, 3, weights)
+        assert shards == partition(case_ids, 3, weights)
+        assert sorted(i for shard in shards for i in shard) == list(range(10))
+        assert all(shard == sorted(shard) for shard in shards)
+
+        # 未知用例按已知耗时中位数（45）计，LPT 使负载接近均衡
+        def load(shard):
+            return sum(weights.get(case_ids[i], 45.0) for i in shard)
+
+        loads = [load(shard) for shard in shards]
+        assert max(loads) - min(loads) <= 50.0
+        # 最重的用例独占一片的起点
+        assert 0 in shards[0]
+
+    def test_unweighted_partition_is_even(self):
+        from sandbox.runner.sharding import partition
+
+        shards = partition([f"c{i}" for i in range(7)], 3)
+        assert sorted(len(shard) for shard in shards) == [2, 2, 3]
+
+    def test_parse_shard(self):
+        import pytest
+
+        from sandbox.runner.sharding import parse_shard
+
+        assert parse_shard("2/4") == (2, 4)
+        for bad in ("0/4", "5/4", "1", "a/b", "1/0"):
+            with pytest.raises(ValueError):
+                parse_shard(bad)
+
+    def test_case_durations_from_result_log(self, tmp_path):
+        from sandbox.report.jsonl_sink import JSONLResultSink
+        from sandbox.runner.sharding import case_durations
+        from sandbox.schema.result import CaseResult, TurnResult
+
+        sink = JSONLResultSink(tmp_path / "r.jsonl", "s", "bot")
+        sink.write(
+            CaseResult(
+                case_id="a",
+                status="completed",
+                turns=[
+                    TurnResult(turn_index=i, user_message="q", bot_response="a", latency_ms=100)
+                    for i in range(3)
+                ],
+            )
+        )
+        sink.write(CaseResult(case_id="b", status="error"))
+        sink.close()
+        assert case_durations([sink.path]) == {"a": 300.0, "b": 0.0}
+
+
+class TestLoadRunner:
+    """测试开环压测"""
+
+    def _suite(self):
+        from sandbox.schema.test_case import (
+            SingleTurnInput,
+            SuiteMetadata,
+            TestCaseSpec,
+            TestSuiteSpec,
+            TurnSpec,
+        )
+
+        return TestSuiteSpec(
+            suite=SuiteMetadata(name="s", target="bot", shared_inputs={"profile": "客服"}),
+            cases=[
+                TestCaseSpec(
+                    id="single", name="s", type="single_turn", input=SingleTurnInput(query="一")
+                ),
+                TestCaseSpec(
+                    id="multi",
+                    name="m",
+                    type="multi_turn",
+                    turns=[TurnSpec(user="二"), TurnSpec(user="三")],
+                ),
+                TestCaseSpec(
+                    id="broken", name="b", type="single_turn", input=SingleTurnInput(query="坏")
+                ),
+            ],
+        )
+
+    def _client(self, handler):
+        import httpx
+
+        from sandbox.client.dify_chat import DifyChatClient
+        from sandbox.runner.load import load_target
+        from sandbox.schema.config import TargetConfig
+
+        target = load_target(TargetConfig(api_base="http://dify", api_key="test", max_retries=3))
+        assert target.max_retries == 0
+        client = DifyChatClient(target)
+        client._client = httpx.AsyncClient(
+            base_url=target.api_base, transport=httpx.MockTransport(handler)
+        )
+        return client
+
+    def test_failures_never_trip_a_circuit_breaker(self):
+        import httpx
+
+        from sandbox.client.pool import ClientPool
+        from sandbox.runner.load import LoadRunner, load_target
+        from sandbox.schema.config import RetryConfig, TargetConfig
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(503, json={"message": "overloaded"})
+
+        async def _run():
+            # 与 sandbox load 相同的客户端池：连续失败也不会被熔断器短路
+            pool = ClientPool(
+                retry_config=RetryConfig(breaker_failure_threshold=1),
+                execution_config=ExecutionConfig(rate_limit_rpm=0),
+                retry_guards=False,
+            )
+            target = load_target(TargetConfig(api_base="http://dify", api_key="test"))
+            client = pool.dify_client(target)
+            client._client = httpx.AsyncClient(
+                base_url=target.api_base, transport=httpx.MockTransport(handler)
+            )
+            try:
+                runner = LoadRunner(client, rps=100, duration_s=0.2, arrival="constant")
+                return await runner.run(self._suite())
+            finally:
+                await pool.close()
+
+        result = asyncio.run(_run())
+        assert result.sent > 10
+        # 每个会话都真正到达目标（多轮会话在首轮失败后结束）
+        assert len(requests) == result.sent == result.errors
+
+    def test_open_loop_mix_histograms_and_windows(self):
+        import json
+
+        import httpx
+
+        from sandbox.runner.load import LoadRunner
+
+        requests: list[dict] = []
+
+        async def handler(request):
+            payload = json.loads(request.content)
+            requests.append(payload)
+            await asyncio.sleep(0.01)
+            if payload["query"] == "坏":
+                return httpx.Response(500, json={"message": "boom"})
+            return httpx.Response(
+                200, json={"answer": "好", "conversation_id": "conv", "message_id": "m"}
+            )
+
+        async def _run():
+            client = self._client(handler)
+            try:
+                runner = LoadRunner(
+                    client, rps=100, duration_s=0.3, arrival="constant", window_s=0.1
+                )
+                return await runner.run(self._suite())
+            finally:
+                await client.close()
+
+        result = asyncio.run(_run())
+        # 固定间隔 10ms，0.3s 内 29 次到达，按用例顺序轮流
+        assert result.sent == 29
+        singles, multis, broken = 10, 10, 9
+        assert result.completed == singles + multis * 2
+        assert result.errors == broken
+        assert result.error_rate == broken / (result.completed + broken)
+        assert result.latency.count == result.completed
+        assert result.latency.percentile(50) >= 10
+        # 多轮的第二轮沿用会话，inputs 只在首轮传入
+        follow_ups = [r for r in requests if r["query"] == "三"]
+        assert follow_ups and all(r["conversation_id"] == "conv" for r in follow_ups)
+        assert all(r["inputs"] == {} for r in follow_ups)
+        assert sum(w.sent for w in result.windows.values()) == 29
+        assert sum(w.completed for w in result.windows.values()) == result.completed
+
+    def test_drops_arrivals_beyond_max_in_flight(self):
+        import httpx
+
+        from sandbox.runner.load import LoadRunner
+
+        async def handler(request):
+            await asyncio.sleep(0.2)
+            return httpx.Response(
+                200, json={"answer": "好", "conversation_id": "c", "message_id": "m"}
+            )
+
+        async def _run():
+            client = self._client(handler)
+            try:
+                runner = LoadRunner(
+                    client, rps=100, duration_s=0.1, arrival="constant", max_in_flight=2
+                )
+                return await runner.run(self._suite())
+            finally:
+                await client.close()
+
+        result = asyncio.run(_run())
+        # 不等待响应：到达按计划继续，超出的直接丢弃
+        assert result.sent == 9
+        assert result.dropped == 7
+        assert result.elapsed_s < 0.5
+
+    def test_suite_without_shared_inputs(self):
+        import httpx
+
+        from sandbox.runner.load import LoadRunner
+
+        suite = self._suite()
+        suite.suite.shared_inputs = None
+
+        async def handler(request):
+            return httpx.Response(
+                200, json={"answer": "好", "conversation_id": "c", "message_id": "m"}
+            )
+
+        async def _run():
+            client = self._client(handler)
+            try:
+                runner = LoadRunner(client, rps=100, duration_s=0.1, arrival="constant")
+                return await runner.run(suite)
+            finally:
+                await client.close()
+
+        result = asyncio.run(_run())
+        assert result.sent == 9
+        assert result.errors == 0
+        # single ×3、multi ×3（每个两轮）、broken ×3
+        assert result.completed == 12
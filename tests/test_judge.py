@@ -150,3 +150,276 @@ class TestAssertionBuilderLLMJudge:
         spec = AssertionSpec(type="llm_judge", pass_threshold=0.7)
         with pytest.raises(AssertionError_, match="criteria"):
             build_assertion(spec, judge_client=MagicMock())
+
+
+class TestJudgeCache:
+    """测试 Judge 评分缓存与单飞去重"""
+
+    def _make_client(self, cache, calls, delay=0.0, content='{"score": 0.8, "reasoning": "好"}'):
+        import httpx
+
+        from sandbox.schema.config import LLMConfig
+
+        async def handler(request):
+            calls.append(json.loads(request.content))
+            await asyncio.sleep(delay)
+            return httpx.Response(
+                200,
+                json={
+                    "choices": [{"message": {"content": content}}],
+                    "usage": {"total_tokens": 10},
+                },
+            )
+
+        config = LLMConfig(api_base="http://judge", api_key="test", model="m")
+        client = JudgeLLMClient(config, cache=cache)
+        client._client = httpx.AsyncClient(
+            base_url=config.api_base, transport=httpx.MockTransport(handler)
+        )
+        return client
+
+    def test_cache_hit_across_clients(self, tmp_path):
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        calls: list = []
+
+        async def _run():
+            cache = SQLiteCache(tmp_path / "judge.sqlite")
+            first = await self._make_client(cache, calls).evaluate("系统", "用户")
+            cache.close()
+
+            # 重新打开缓存文件，模拟下一次运行
+            cache = SQLiteCache(tmp_path / "judge.sqlite")
+            second = await self._make_client(cache, calls).evaluate("系统", "用户")
+            third = await self._make_client(cache, calls).evaluate("系统", "另一个问题")
+            stats = cache.stats()
+            cache.close()
+            return first, second, third, stats
+
+        first, second, third, stats = asyncio.run(_run())
+        assert first.score == second.score == 0.8
+        assert len(calls) == 2
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 2
+
+    def test_concurrent_identical_requests_share_one_call(self):
+        calls: list = []
+
+        async def _run():
+            client = self._make_client(None, calls, delay=0.05)
+            results = await asyncio.gather(*[client.evaluate("系统", "用户") for _ in range(5)])
+            return client, results
+
+        client, results = asyncio.run(_run())
+        assert len(calls) == 1
+        assert client.shared_calls == 4
+        assert all(r.score == 0.8 for r in results)
+        assert not client._inflight
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        calls: list = []
+
+        async def _run():
+            client = self._make_client(None, calls, delay=0.05)
+            leader = asyncio.create_task(client.evaluate("系统", "用户"))
+            await asyncio.sleep(0.01)
+            followers = [asyncio.create_task(client.evaluate("系统", "用户")) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return client, results
+
+        client, results = asyncio.run(_run())
+        # 一个等待者接替发起请求，其余等待者共享其结果
+        assert len(calls) == 2
+        assert client.shared_calls == 2
+        assert all(r.score == 0.8 for r in results)
+        assert not client._inflight
+
+    def test_unparseable_response_not_cached(self, tmp_path):
+        from sandbox.core.exceptions import SandboxError
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        calls: list = []
+
+        async def _run():
+            cache = SQLiteCache(tmp_path / "judge.sqlite")
+            client = self._make_client(cache, calls, content="没有 JSON")
+            for _ in range(2):
+                with pytest.raises(SandboxError):
+                    await client.evaluate("系统", "用户")
+            entries = len(cache)
+            cache.close()
+            return entries
+
+        assert asyncio.run(_run()) == 0
+        assert len(calls) == 2
+
+    def test_eviction_by_size_and_age(self, tmp_path):
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        cache = SQLiteCache(tmp_path / "c.sqlite", max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key)
+        cache.get("a")
+        assert cache.evict() == 1
+        assert len(cache) == 2
+        assert cache.get("a") == "a"
+        cache.close()
+
+        cache = SQLiteCache(tmp_path / "c.sqlite", max_entries=10, max_age_days=0)
+        assert len(cache) == 0
+        cache.close()
+
+
+class TestBatchedJudge:
+    """测试同一轮多个 llm_judge 断言的批量评估"""
+
+    def _assertions(self, mock_client, count=3):
+        from sandbox.assertion.llm_judge import LLMJudgeAssertion
+
+        return [
+            LLMJudgeAssertion(criteria=f"标准{i}", pass_threshold=0.5, judge_client=mock_client)
+            for i in range(1, count + 1)
+        ]
+
+    def test_batch_uses_one_call_and_keeps_order(self):
+        from unittest.mock import AsyncMock
+
+        from sandbox.assertion.base import AssertionContext
+        from sandbox.assertion.evaluator import evaluate_assertions
+        from sandbox.assertion.string_match import ContainsAssertion
+
+        raw = json.dumps(
+            {
+                "criteria": [
+                    {"id": "c2", "score": 0.2, "reasoning": "差"},
+                    {"id": "c1", "score": 0.9, "reasoning": "好"},
+                    {"id": "c3", "score": 0.6, "reasoning": "中"},
+                ],
+                "score": 0.57,
+            }
+        )
+        mock_client = AsyncMock()
+        mock_client.evaluate.return_value = JudgeResult(score=0.57, reasoning="", raw_text=raw)
+        judges = self._assertions(mock_client)
+        assertions = [judges[0], ContainsAssertion(value="Linh"), judges[1], judges[2]]
+
+        async def _run():
+            return await evaluate_assertions(
+                assertions, "我是Linh老师", {}, AssertionContext(), batch_judge=True
+            )
+
+        results = asyncio.run(_run())
+        assert mock_client.evaluate.await_count == 1
+        prompt = mock_client.evaluate.await_args.kwargs["user_prompt"]
+        assert "[c1] 标准1" in prompt and "[c3] 标准3" in prompt
+        assert [r.assertion_type for r in results] == [
+            "llm_judge",
+            "contains",
+            "llm_judge",
+            "llm_judge",
+        ]
+        assert [r.score for r in results] == [0.9, None, 0.2, 0.6]
+        assert [r.passed for r in results] == [True, True, False, True]
+
+    def test_unparseable_batch_falls_back_to_individual_calls(self):
+        from unittest.mock import AsyncMock
+
+        from sandbox.assertion.base import AssertionContext
+        from sandbox.assertion.llm_judge import evaluate_llm_judges_batched
+
+        mock_client = AsyncMock()
+        mock_client.evaluate.side_effect = [
+            JudgeResult(score=0.5, reasoning="", raw_text='{"score": 0.5}'),
+            JudgeResult(score=0.8, reasoning="单独1", raw_text=""),
+            JudgeResult(score=0.1, reasoning="单独2", raw_text=""),
+        ]
+
+        async def _run():
+            return await evaluate_llm_judges_batched(
+                self._assertions(mock_client, 2), "回复", {}, AssertionContext()
+            )
+
+        results = asyncio.run(_run())
+        assert mock_client.evaluate.await_count == 3
+        assert [r.score for r in results] == [0.8, 0.1]
+
+    def test_missing_criterion_falls_back_individually(self):
+        from unittest.mock import AsyncMock
+
+        from sandbox.assertion.base import AssertionContext
+        from sandbox.assertion.llm_judge import evaluate_llm_judges_batched
+
+        raw = '```json\n{"criteria": [{"id": "c1", "score": 0.7}], "score": 0.7}\n```'
+        mock_client = AsyncMock()
+        mock_client.evaluate.side_effect = [
+            JudgeResult(score=0.7, reasoning="", raw_text=raw),
+            JudgeResult(score=0.4, reasoning="单独", raw_text=""),
+        ]
+
+        async def _run():
+            return await evaluate_llm_judges_batched(
+                self._assertions(mock_client, 2), "回复", {}, AssertionContext()
+            )
+
+        results = asyncio.run(_run())
+        assert mock_client.evaluate.await_count == 2
+        assert [r.score for r in results] == [0.7, 0.4]
+
+
+class TestConcurrentAssertionEvaluation:
+    """测试同一轮内 Judge 断言的并发评估"""
+
+    def _slow_client(self, state):
+        class SlowJudge:
+            async def evaluate(self, system_prompt, user_prompt):
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                await asyncio.sleep(0.02)
+                state["active"] -= 1
+                score = 0.9 if "标准1" in user_prompt else 0.1
+                return JudgeResult(score=score, reasoning="", raw_text="")
+
+        return SlowJudge()
+
+    def _evaluate(self, semaphore=None):
+        from sandbox.assertion.base import AssertionContext
+        from sandbox.assertion.evaluator import evaluate_assertions
+        from sandbox.assertion.llm_judge import LLMJudgeAssertion
+        from sandbox.assertion.string_match import ContainsAssertion
+
+        state = {"active": 0, "peak": 0}
+        client = self._slow_client(state)
+        assertions = [
+            LLMJudgeAssertion(criteria="标准1", pass_threshold=0.5, judge_client=client),
+            ContainsAssertion(value="你好"),
+            LLMJudgeAssertion(criteria="标准2", pass_threshold=0.5, judge_client=client),
+            LLMJudgeAssertion(criteria="标准3", pass_threshold=0.5, judge_client=client),
+        ]
+
+        async def _run():
+            return await evaluate_assertions(
+                assertions, "你好", {}, AssertionContext(), judge_semaphore=semaphore
+            )
+
+        return asyncio.run(_run()), state
+
+    def test_judges_run_concurrently_in_order(self):
+        results, state = self._evaluate()
+        assert state["peak"] == 3
+        assert [r.assertion_type for r in results] == [
+            "llm_judge",
+            "contains",
+            "llm_judge",
+            "llm_judge",
+        ]
+        assert [r.passed for r in results] == [True, True, False, False]
+
+    def test_judge_semaphore_bounds_concurrency(self):
+        results, state = self._evaluate(semaphore=asyncio.Semaphore(1))
+        assert state["peak"] == 1
+        assert len(results) == 4
@@ -74,6 +74,61 @@ class TestMultiTurnRunner:
         # 两轮断言都应通过
         assert all(a.passed for t in result.turns for a in t.assertions)
 
+    def test_pipelined_turns_overlap_judge_with_next_send(self):
+        """流水线模式：下一轮在上一轮 Judge 完成前发送，断言仍归属正确轮次"""
+        from sandbox.client.dify_chat import DifyResponse
+        from sandbox.client.judge_llm import JudgeResult
+        from sandbox.runner.multi_turn import MultiTurnRunner
+
+        events: list[str] = []
+
+        class SlowJudge:
+            async def evaluate(self, system_prompt, user_prompt):
+                turn = "第一轮" if "回复: 第一轮" in user_prompt.split("待评估")[-1] else "第二轮"
+                await asyncio.sleep(0.05)
+                events.append(f"judge {turn}")
+                return JudgeResult(
+                    score=0.9 if turn == "第一轮" else 0.1, reasoning="", raw_text=""
+                )
+
+        async def mock_send(query, *, conversation_id="", user="sandbox_test", inputs=None):
+            events.append(f"send {query}")
+            return DifyResponse(
+                answer=f"回复: {query}",
+                conversation_id="conv",
+                message_id="msg",
+                raw_data={},
+                latency_ms=10,
+                token_usage=None,
+                status="success",
+            )
+
+        judge_spec = AssertionSpec(type="llm_judge", criteria="人设", pass_threshold=0.5)
+        case = TestCaseSpec(
+            id="test_pipeline",
+            name="流水线",
+            type="multi_turn",
+            turns=[
+                TurnSpec(user="第一轮", assertions=[judge_spec]),
+                TurnSpec(user="第二轮", assertions=[judge_spec]),
+            ],
+        )
+        runner = MultiTurnRunner(judge_client=SlowJudge(), pipeline_turns=True)
+
+        async def _run():
+            with patch("sandbox.runner.multi_turn.DifyChatClient") as MockClient:
+                instance = AsyncMock()
+                instance.send_message = mock_send
+                instance.close = AsyncMock()
+                MockClient.return_value = instance
+
+                return await runner.execute(case, self._make_target())
+
+        result = asyncio.run(_run())
+        assert result.status == "completed"
+        assert events[:2] == ["send 第一轮", "send 第二轮"]
+        assert [t.assertions[0].passed for t in result.turns] == [True, False]
+
     def test_multi_turn_missing_turns(self):
         from sandbox.runner.multi_turn import MultiTurnRunner
 
@@ -133,6 +188,49 @@ class TestMultiTurnRunner:
         assert call_args_list[1]["conversation_id"] == "conv_abc"
         assert call_args_list[2]["conversation_id"] == "conv_abc"
 
+    def test_performance_budget_becomes_final_assertions(self):
+        """用例的 performance 预算在整段对话结束后检查，写入 final_assertions"""
+        from sandbox.client.dify_chat import DifyResponse
+        from sandbox.runner.multi_turn import MultiTurnRunner
+        from sandbox.schema.test_case import PerformanceBudget
+
+        runner = MultiTurnRunner()
+        responses = [
+            DifyResponse(
+                answer="好的",
+                conversation_id="conv",
+                message_id=f"msg{i}",
+                raw_data={},
+                latency_ms=latency,
+                token_usage={"total_tokens": 300},
+                status="success",
+            )
+            for i, latency in enumerate((1000, 3000))
+        ]
+        case = TestCaseSpec(
+            id="test_budget",
+            name="性能预算",
+            type="multi_turn",
+            turns=[TurnSpec(user="第一轮"), TurnSpec(user="第二轮")],
+            performance=PerformanceBudget(max_avg_latency_ms=2500, max_total_tokens=500),
+        )
+
+        async def _run():
+            with patch("sandbox.runner.multi_turn.DifyChatClient") as MockClient:
+                instance = AsyncMock()
+                instance.send_message = AsyncMock(side_effect=responses)
+                instance.close = AsyncMock()
+                MockClient.return_value = instance
+
+                return await runner.execute(case, self._make_target())
+
+        result = asyncio.run(_run())
+        by_type = {a.assertion_type: a for a in result.final_assertions}
+        # 平均延迟 2000ms 在预算内，Token 总量 600 超出
+        assert by_type["avg_latency_ms"].passed is True
+        assert by_type["total_tokens"].passed is False
+        assert by_type["total_tokens"].actual == "600"
+
 
 class TestValidatePersonaSuite:
     """测试人设一致性套件 YAML 校验"""
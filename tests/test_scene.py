@@ -276,6 +276,79 @@ class TestAssertionBuilderSceneJudge:
 
 # ─── Extractor 测试 ────────────────────────────────────────
 
+class TestSceneRegistry:
+    """场景注册表：预加载、缓存与 mtime 失效"""
+
+    def _write_scene(self, path, name):
+        import os
+
+        import yaml
+
+        data = SceneFile(scene=_make_scene()).model_dump()
+        data["scene"]["name"] = name
+        path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding="utf-8")
+        return os.stat(path).st_mtime
+
+    def test_preload_caches_and_reloads_on_mtime_change(self, tmp_path):
+        import os
+
+        from sandbox.runner.scene_registry import SceneRegistry
+
+        path = tmp_path / "scene.yaml"
+        mtime = self._write_scene(path, "版本一")
+        registry = SceneRegistry()
+
+        async def _preload():
+            return await registry.preload([str(path), str(path), str(tmp_path / "missing.yaml")])
+
+        first = asyncio.run(_preload())
+        second = asyncio.run(_preload())
+        assert first[str(path)].name == "版本一"
+        assert second[str(path)] is first[str(path)]
+        assert isinstance(first[str(tmp_path / "missing.yaml")], Exception)
+        assert registry.loads == 1
+
+        self._write_scene(path, "版本二")
+        os.utime(path, (mtime + 10, mtime + 10))
+        third = asyncio.run(_preload())
+        assert third[str(path)].name == "版本二"
+        assert registry.loads == 2
+
+    def test_criteria_text_memoized_per_scene_phase_behaviors(self):
+        from sandbox.assertion.scene_judge import SceneJudgeAssertion
+
+        scene = _make_scene()
+        a = SceneJudgeAssertion(scene=scene, judge_client=AsyncMock(), phase="收号")
+        b = SceneJudgeAssertion(scene=scene, judge_client=AsyncMock(), phase="收号")
+        c = SceneJudgeAssertion(
+            scene=scene, judge_client=AsyncMock(), phase="收号", behavior_ids=["privacy_mask"]
+        )
+        assert a._criteria()[1] is b._criteria()[1]
+        assert "当前评估阶段：收号" in a._criteria()[1]
+        assert "natural_transition" not in c._criteria()[1]
+
+    def test_criteria_cache_keyed_by_scene_content_and_bounded(self):
+        from sandbox.assertion import scene_judge
+        from sandbox.assertion.scene_judge import SceneJudgeAssertion
+
+        # 内容相同的两个场景对象共享缓存，内容不同则不共享
+        a = SceneJudgeAssertion(scene=_make_scene(), judge_client=AsyncMock())
+        b = SceneJudgeAssertion(scene=_make_scene(), judge_client=AsyncMock())
+        assert a._criteria()[1] is b._criteria()[1]
+        changed = _make_scene()
+        changed.behaviors[0].description = "改过的说明"
+        c = SceneJudgeAssertion(scene=changed, judge_client=AsyncMock())
+        assert "改过的说明" in c._criteria()[1]
+
+        # 缓存有上限，且不持有场景对象
+        for i in range(scene_judge._CRITERIA_CACHE.maxsize + 10):
+            assertion = SceneJudgeAssertion(
+                scene=_make_scene(), judge_client=AsyncMock(), phase=str(i)
+            )
+            assertion._criteria()
+        assert len(scene_judge._CRITERIA_CACHE) == scene_judge._CRITERIA_CACHE.maxsize
+
+
 class TestSceneExtractor:
     """场景提炼器"""
 
@@ -0,0 +1,170 @@
+"""测试模拟用户客户端与运行器（使用 mock）"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from sandbox.schema.config import LLMConfig, TargetConfig
+from sandbox.schema.test_case import AssertionSpec, SimulatedUserConfig, TestCaseSpec
+
+
+def _make_sim_client(calls, cache=None):
+    import httpx
+
+    from sandbox.client.simulated_user import SimulatedUserLLMClient
+
+    async def handler(request):
+        payload = json.loads(request.content)
+        calls.append(payload)
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": f"第 {len(payload['messages']) // 2 + 1} 问"}}],
+                "usage": {"total_tokens": 10},
+            },
+        )
+
+    config = LLMConfig(api_base="http://sim", api_key="test", model="m", temperature=0.7)
+    client = SimulatedUserLLMClient(config, cache=cache)
+    client._client = httpx.AsyncClient(
+        base_url=config.api_base, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def _dify_reply(answer: str):
+    from sandbox.client.dify_chat import DifyResponse
+
+    return DifyResponse(
+        answer=answer,
+        conversation_id="conv",
+        message_id="msg",
+        raw_data={},
+        latency_ms=500,
+        token_usage={"total_tokens": 100},
+        status="success",
+    )
+
+
+def _case(max_turns: int = 3, stop_conditions=None) -> TestCaseSpec:
+    return TestCaseSpec(
+        id="sim",
+        name="模拟用户",
+        type="simulated_user",
+        simulated_user_config=SimulatedUserConfig(
+            system_prompt="你是一个试图让客服承认自己是AI的用户",
+            first_message="你好",
+            max_turns=max_turns,
+            stop_conditions=stop_conditions,
+        ),
+        per_turn_assertions=[AssertionSpec(type="not_contains", values=["ChatGPT"])],
+    )
+
+
+class TestSimulatedUserClient:
+    """测试模拟用户 LLM 客户端与对话记录缓存"""
+
+    def test_roles_are_swapped(self):
+        from sandbox.schema.result import TurnResult
+
+        calls: list = []
+
+        async def _run():
+            client = _make_sim_client(calls)
+            history = [
+                TurnResult(turn_index=0, user_message="你好", bot_response="您好", latency_ms=1)
+            ]
+            message = await client.generate_next_message("扮演用户", history)
+            await client.close()
+            return message
+
+        assert asyncio.run(_run()) == "第 2 问"
+        # 模拟用户自己的话是 assistant，机器人的回复是 user
+        assert [m["role"] for m in calls[0]["messages"]] == ["system", "assistant", "user"]
+
+    def test_transcript_cache_reuses_unchanged_turns(self, tmp_path):
+        from sandbox.schema.result import TurnResult
+        from sandbox.utils.sqlite_cache import SQLiteCache
+
+        calls: list = []
+
+        def history(answer: str):
+            return [
+                TurnResult(turn_index=0, user_message="你好", bot_response=answer, latency_ms=1)
+            ]
+
+        async def _run():
+            cache = SQLiteCache(tmp_path / "sim.sqlite")
+            first = await _make_sim_client(calls, cache).generate_next_message("p", history("您好"))
+            cache.close()
+
+            # 重新打开缓存文件，模拟下一次运行
+            cache = SQLiteCache(tmp_path / "sim.sqlite")
+            client = _make_sim_client(calls, cache)
+            second = await client.generate_next_message("p", history("您好"))
+            await client.generate_next_message("p", history("机器人换了回答"))
+            cache.close()
+            return first, second, client.stats()
+
+        first, second, stats = asyncio.run(_run())
+        assert first == second
+        assert len(calls) == 2
+        assert stats == {"generated": 1, "cache_hits": 1}
+
+
+class TestSimulatedUserRunner:
+    """测试模拟用户运行器"""
+
+    def _make_target(self):
+        return TargetConfig(api_base="http://localhost", api_key="test")
+
+    def _execute(self, case, replies, sim_client):
+        from sandbox.runner.simulated_user import SimulatedUserRunner
+
+        runner = SimulatedUserRunner(sim_client=sim_client)
+
+        async def _run():
+            with patch("sandbox.runner.simulated_user.DifyChatClient") as MockClient:
+                instance = AsyncMock()
+                instance.send_message = AsyncMock(side_effect=replies)
+                instance.close = AsyncMock()
+                MockClient.return_value = instance
+                result = await runner.execute(case, self._make_target(), {"ai_profile": "t"})
+                return result, instance.send_message.await_args_list
+
+        return asyncio.run(_run())
+
+    def test_runs_until_max_turns(self):
+        calls: list = []
+        replies = [_dify_reply(f"回答{i}") for i in range(3)]
+        result, sent = self._execute(_case(max_turns=3), replies, _make_sim_client(calls))
+
+        assert result.status == "completed"
+        assert [t.user_message for t in result.turns] == ["你好", "第 2 问", "第 3 问"]
+        # 最后一轮之后不再生成用户消息
+        assert len(calls) == 2
+        # inputs 仅首轮传入
+        assert sent[0].kwargs["inputs"] == {"ai_profile": "t"}
+        assert sent[1].kwargs["inputs"] == {}
+        assert all(a.passed for t in result.turns for a in t.assertions)
+
+    def test_stop_condition_fails_and_stops(self):
+        calls: list = []
+        replies = [_dify_reply("我是老师"), _dify_reply("好吧，我是AI"), _dify_reply("不会发送")]
+        case = _case(
+            max_turns=5, stop_conditions=[AssertionSpec(type="regex", pattern="我是AI|人工智能")]
+        )
+        result, sent = self._execute(case, replies, _make_sim_client(calls))
+
+        assert len(result.turns) == 2
+        assert len(sent) == 2
+        stop = result.turns[-1].assertions[-1]
+        assert stop.assertion_type == "stop_condition"
+        assert stop.passed is False
+        # 逐轮断言仍然写回对应轮次
+        assert result.turns[-1].assertions[0].assertion_type == "not_contains"
+
+    def test_requires_sim_client(self):
+        result, _ = self._execute(_case(), [], sim_client=None)
+        assert result.status == "error"
+        assert "simulated_user" in result.error_message
@@ -0,0 +1,222 @@
+"""测试流式增量断言与提前中止"""
+
+import asyncio
+import json
+
+import httpx
+
+from sandbox.assertion.performance import LatencyAssertion
+from sandbox.assertion.streaming import StreamingEvaluator, create_streaming_evaluator
+from sandbox.assertion.string_match import (
+    ContainsAssertion,
+    NotContainsAssertion,
+    RegexAssertion,
+)
+from sandbox.schema.config import TargetConfig
+
+
+def _event(answer: str) -> bytes:
+    data = {"event": "message", "answer": answer, "conversation_id": "c1", "task_id": "task1"}
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+class TestStreamingEvaluator:
+    """测试增量断言评估器"""
+
+    def test_not_contains_detected_across_chunks(self):
+        evaluator = StreamingEvaluator([NotContainsAssertion(["我是AI"])])
+        assert evaluator.feed("你好，我是", 10) is False
+        assert evaluator.feed("你好，我是AI助手", 20) is True
+        assert evaluator.settled[0].passed is False
+
+    def test_regex_match_settles_pass_without_abort(self):
+        evaluator = StreamingEvaluator([RegexAssertion(r"1[3-9]\d{9}")])
+        assert evaluator.feed("号码 13812345678，", 10) is False
+        assert evaluator.settled[0].passed is True
+
+    def test_regex_with_end_anchor_not_settled(self):
+        evaluator = StreamingEvaluator([RegexAssertion(r"好$")])
+        evaluator.feed("好的，好 ", 10)
+        assert 0 not in evaluator.settled
+
+    def test_latency_deadline(self):
+        evaluator = StreamingEvaluator([LatencyAssertion(max_ms=100)])
+        assert evaluator.deadline_ms == 100
+        assert evaluator.feed("partial", 150) is True
+
+    def test_results_after_abort_keep_order(self):
+        evaluator = StreamingEvaluator(
+            [
+                ContainsAssertion("谢谢"),
+                NotContainsAssertion(["AI"]),
+                LatencyAssertion(max_ms=10_000),
+            ]
+        )
+        evaluator.feed("作为AI", 50)
+        results = evaluator.results_after_abort("作为AI", 60)
+        assert [r.assertion_type for r in results] == ["contains", "not_contains", "latency_ms"]
+        assert results[0].actual == "skipped"
+        assert results[1].passed is False
+        assert results[2].actual == "skipped"
+
+    def test_inactive_without_incremental_assertions(self):
+        assert create_streaming_evaluator([ContainsAssertion("x")], enabled=True) is None
+        assert create_streaming_evaluator([NotContainsAssertion(["x"])], enabled=False) is None
+
+
+class TestStreamingAbort:
+    """测试客户端在流式过程中中止请求"""
+
+    def _make_client(
+        self, chunks: list[bytes], delay: float = 0.0, fail_first: int = 0, **client_kwargs
+    ):
+        from sandbox.client.dify_chat import DifyChatClient
+
+        stopped: list[str] = []
+        failures = [fail_first]
+
+        async def _body():
+            for chunk in chunks:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/stop"):
+                stopped.append(request.url.path)
+                return httpx.Response(200, json={"result": "success"})
+            if failures[0]:
+                failures[0] -= 1
+                return httpx.Response(503, json={"message": "busy"})
+            return httpx.Response(200, content=_body())
+
+        target = TargetConfig(
+            api_base="http://localhost", api_key="test", response_mode="streaming"
+        )
+        client = DifyChatClient(target, **client_kwargs)
+        client._client = httpx.AsyncClient(
+            base_url=target.api_base, transport=httpx.MockTransport(handler)
+        )
+        return client, stopped
+
+    def test_abort_on_banned_phrase(self):
+        client, stopped = self._make_client(
+            [_event("我是"), _event("AI"), _event("，不能"), _event("回答")]
+        )
+        evaluator = StreamingEvaluator([NotContainsAssertion(["我是AI"])])
+
+        async def _run():
+            try:
+                return await client.send_message("你是谁", **evaluator.send_kwargs())
+            finally:
+                await client.close()
+
+        response = asyncio.run(_run())
+        assert response.abort_reason == "assertion"
+        assert response.answer == "我是AI"
+        assert stopped == ["/chat-messages/task1/stop"]
+
+    def test_abort_on_deadline(self):
+        client, _ = self._make_client([_event("慢"), _event("慢"), _event("慢")], delay=0.05)
+        evaluator = StreamingEvaluator([LatencyAssertion(max_ms=70)])
+
+        async def _run():
+            try:
+                return await client.send_message("hi", **evaluator.send_kwargs())
+            finally:
+                await client.close()
+
+        response = asyncio.run(_run())
+        assert response.abort_reason == "deadline"
+        results = evaluator.results_after_abort(response.answer, response.latency_ms)
+        assert results[0].passed is False
+        assert results[0].assertion_type == "latency_ms"
+
+    def test_deadline_excludes_retry_backoff(self):
+        import pytest
+
+        from sandbox.client.retry import RetryOptions
+        from sandbox.core.exceptions import DifyAPIError
+        from sandbox.schema.config import RetryConfig
+
+        retry = RetryOptions.from_config(
+            RetryConfig(policy="exponential", base_delay=0.05, max_delay=0.05)
+        )
+        client, _ = self._make_client([_event("好")], fail_first=10, retry=retry)
+        evaluator = StreamingEvaluator([LatencyAssertion(max_ms=70)])
+
+        async def _run():
+            try:
+                return await client.send_message("hi", **evaluator.send_kwargs())
+            finally:
+                await client.close()
+
+        # 退避等待超过截止时间时不应被当作 deadline 中止，重试耗尽的错误照常抛出
+        with pytest.raises(DifyAPIError, match="503"):
+            asyncio.run(_run())
+
+    def test_stop_request_uses_rate_limiter(self):
+        from sandbox.utils.rate_limiter import EndpointRateLimiter
+
+        limiter = EndpointRateLimiter("dify", rpm=600, burst=10)
+        client, stopped = self._make_client([_event("我是"), _event("AI")], rate_limiter=limiter)
+        evaluator = StreamingEvaluator([NotContainsAssertion(["我是AI"])])
+
+        async def _run():
+            try:
+                return await client.send_message("你是谁", **evaluator.send_kwargs())
+            finally:
+                await client.close()
+
+        assert asyncio.run(_run()).abort_reason == "assertion"
+        assert stopped == ["/chat-messages/task1/stop"]
+        # 消息请求与 stop 请求各取一个令牌
+        assert limiter.acquired == 2
+
+    def test_multi_turn_stops_after_abort(self):
+        from unittest.mock import AsyncMock, patch
+
+        from sandbox.client.dify_chat import DifyResponse
+        from sandbox.runner.multi_turn import MultiTurnRunner
+        from sandbox.schema.test_case import AssertionSpec, TestCaseSpec, TurnSpec
+
+        aborted = DifyResponse(
+            answer="作为AI",
+            conversation_id="c1",
+            message_id="m1",
+            raw_data={},
+            latency_ms=30,
+            token_usage=None,
+            status="success",
+            abort_reason="assertion",
+        )
+        case = TestCaseSpec(
+            id="abort",
+            name="提前中止",
+            type="multi_turn",
+            turns=[
+                TurnSpec(
+                    user="你是谁",
+                    assertions=[AssertionSpec(type="not_contains", values=["AI"])],
+                ),
+                TurnSpec(user="第二轮", assertions=[]),
+            ],
+        )
+        target = TargetConfig(
+            api_base="http://localhost", api_key="test", response_mode="streaming"
+        )
+
+        async def _run():
+            with patch("sandbox.runner.multi_turn.DifyChatClient") as MockClient:
+                instance = AsyncMock()
+                instance.send_message = AsyncMock(return_value=aborted)
+                MockClient.return_value = instance
+                result = await MultiTurnRunner().execute(case, target)
+                assert "on_chunk" in instance.send_message.call_args.kwargs
+                return result, instance
+
+        result, instance = asyncio.run(_run())
+        assert instance.send_message.call_count == 1
+        assert len(result.turns) == 1
+        assert result.turns[0].abort_reason == "assertion"
+        assert result.turns[0].assertions[0].passed is False
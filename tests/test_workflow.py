@@ -0,0 +1,242 @@
+"""测试 Dify 工作流客户端与运行器（使用 mock）"""
+
+import asyncio
+import json
+
+import httpx
+
+from sandbox.schema.config import TargetConfig
+from sandbox.schema.test_case import AssertionSpec, TestCaseSpec, WorkflowInput
+
+
+def _make_target(**kwargs) -> TargetConfig:
+    return TargetConfig(api_base="http://dify", api_key="test", app_type="workflow", **kwargs)
+
+
+def _sse(*events: dict) -> bytes:
+    return "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events).encode()
+
+
+def _streaming_body(status: str = "succeeded") -> bytes:
+    return _sse(
+        {"event": "workflow_started", "workflow_run_id": "run1", "task_id": "t1", "data": {}},
+        {"event": "node_started", "data": {"id": "e1", "node_id": "start"}},
+        {
+            "event": "node_finished",
+            "data": {
+                "id": "e1",
+                "node_id": "start",
+                "node_type": "start",
+                "title": "开始",
+                "status": "succeeded",
+                "elapsed_time": 0.002,
+            },
+        },
+        {"event": "node_started", "data": {"id": "e2", "node_id": "kb"}},
+        {
+            "event": "node_finished",
+            "data": {
+                "id": "e2",
+                "node_id": "kb",
+                "node_type": "knowledge-retrieval",
+                "title": "知识检索",
+                "status": "succeeded",
+                "elapsed_time": 0.4,
+            },
+        },
+        {"event": "node_started", "data": {"id": "e3", "node_id": "llm"}},
+        {"event": "text_chunk", "data": {"text": "{"}},
+        {
+            "event": "node_finished",
+            "data": {
+                "id": "e3",
+                "node_id": "llm",
+                "node_type": "llm",
+                "title": "情感分析",
+                "status": status,
+                "elapsed_time": 2.5,
+                "error": "模型超时" if status == "failed" else None,
+                "outputs": {"usage": {"prompt_tokens": 300, "completion_tokens": 20}},
+                "execution_metadata": {"total_tokens": 320},
+            },
+        },
+        {
+            "event": "workflow_finished",
+            "workflow_run_id": "run1",
+            "task_id": "t1",
+            "data": {
+                "status": status,
+                "outputs": {"sentiment": "angry", "has_risk": True},
+                "error": "模型超时" if status == "failed" else None,
+                "elapsed_time": 2.9,
+                "total_tokens": 320,
+            },
+        },
+    )
+
+
+def _mock_workflow_client(target: TargetConfig, handler):
+    from sandbox.client.dify_workflow import DifyWorkflowClient
+
+    client = DifyWorkflowClient(target)
+    client._client = httpx.AsyncClient(
+        base_url=target.api_base, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+class TestDifyWorkflowClient:
+    """测试工作流客户端的 blocking / streaming 解析"""
+
+    def test_streaming_records_node_timings(self):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, content=_streaming_body())
+
+        client = _mock_workflow_client(_make_target(response_mode="streaming"), handler)
+
+        async def _run():
+            try:
+                return await client.run({"msg": "退钱"})
+            finally:
+                await client.close()
+
+        response = asyncio.run(_run())
+        assert requests[0].url.path == "/workflows/run"
+        assert json.loads(requests[0].content)["inputs"] == {"msg": "退钱"}
+        assert response.status == "succeeded"
+        assert response.outputs == {"sentiment": "angry", "has_risk": True}
+        assert response.token_usage == {"total_tokens": 320}
+        assert response.elapsed_ms == 2900
+        assert response.ttft_ms is not None
+        assert [(n.node_type, n.elapsed_ms) for n in response.nodes] == [
+            ("start", 2),
+            ("knowledge-retrieval", 400),
+            ("llm", 2500),
+        ]
+        # LLM 节点使用 outputs.usage，含 prompt / completion 拆分
+        assert response.nodes[2].token_usage["prompt_tokens"] == 300
+        assert response.nodes[1].token_usage is None
+
+    def test_blocking(self):
+        body = {
+            "workflow_run_id": "run1",
+            "task_id": "t1",
+            "data": {
+                "status": "succeeded",
+                "outputs": {"result": "ok"},
+                "elapsed_time": 1.2,
+                "total_tokens": 50,
+            },
+        }
+        client = _mock_workflow_client(
+            _make_target(), lambda request: httpx.Response(200, json=body)
+        )
+
+        async def _run():
+            try:
+                return await client.run({})
+            finally:
+                await client.close()
+
+        response = asyncio.run(_run())
+        assert response.outputs == {"result": "ok"}
+        assert response.workflow_run_id == "run1"
+        assert response.token_usage == {"total_tokens": 50}
+        assert response.nodes == []
+
+
+class TestWorkflowRunner:
+    """测试工作流运行器"""
+
+    def _execute(self, body: bytes, case: TestCaseSpec):
+        from sandbox.client.pool import ClientPool
+        from sandbox.runner.workflow import WorkflowRunner
+
+        target = _make_target(response_mode="streaming")
+
+        async def _run():
+            pool = ClientPool()
+            pool.workflow_client(target)._client = httpx.AsyncClient(
+                base_url=target.api_base,
+                transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body)),
+            )
+            try:
+                return await WorkflowRunner(client_pool=pool).execute(case, target, {"lang": "zh"})
+            finally:
+                await pool.close()
+
+        return asyncio.run(_run())
+
+    def _case(self) -> TestCaseSpec:
+        return TestCaseSpec(
+            id="risk",
+            name="风险检测",
+            type="workflow",
+            input=WorkflowInput(inputs={"msg": "退钱"}),
+            assertions=[AssertionSpec(type="contains", value='"has_risk": true')],
+        )
+
+    def test_assertions_on_outputs_and_nodes_in_result(self):
+        from sandbox.schema.config import ScoringConfig
+        from sandbox.schema.result import CaseResult
+        from sandbox.scoring.scorer import Scorer, SuiteScorer
+
+        result = self._execute(_streaming_body(), self._case())
+        assert result.status == "completed"
+        turn = result.turns[0]
+        assert json.loads(turn.user_message) == {"lang": "zh", "msg": "退钱"}
+        assert all(a.passed for a in turn.assertions)
+        assert [n.title for n in turn.nodes] == ["开始", "知识检索", "情感分析"]
+
+        # 节点耗时写入 JSONL 后可还原，并按节点汇总分位数
+        from dataclasses import asdict
+
+        restored = CaseResult.from_dict(json.loads(json.dumps(asdict(result))))
+        assert restored == result
+        aggregator = SuiteScorer(Scorer(ScoringConfig())).aggregator("wf")
+        aggregator.add(restored)
+        assert aggregator.finish().node_latency["llm:情感分析"]["p95"] == 2500
+
+    def test_failed_workflow_names_failed_node(self):
+        result = self._execute(_streaming_body(status="failed"), self._case())
+        assert result.status == "error"
+        assert "情感分析" in result.error_message
+        assert len(result.turns[0].nodes) == 3
+
+    def test_requires_workflow_target(self):
+        from sandbox.runner.workflow import WorkflowRunner
+
+        async def _run():
+            return await WorkflowRunner().execute(
+                self._case(), TargetConfig(api_base="http://dify", api_key="test")
+            )
+
+        result = asyncio.run(_run())
+        assert result.status == "error"
+        assert "workflow" in result.error_message
+
+
+class TestWorkflowSchema:
+    """测试只有工作流用例可以省略 query"""
+
+    def test_query_required_except_for_workflow(self):
+        import pytest
+        from pydantic import ValidationError
+
+        from sandbox.schema.test_case import SingleTurnInput, WorkflowInput
+
+        workflow = TestCaseSpec.model_validate(
+            {"id": "w", "name": "w", "type": "workflow", "input": {"inputs": {"msg": "hi"}}}
+        )
+        assert isinstance(workflow.input, WorkflowInput)
+        single = TestCaseSpec.model_validate(
+            {"id": "s", "name": "s", "type": "single_turn", "input": {"query": "hi"}}
+        )
+        assert isinstance(single.input, SingleTurnInput)
+        with pytest.raises(ValidationError, match="query"):
+            TestCaseSpec.model_validate(
+                {"id": "s", "name": "s", "type": "single_turn", "input": {"inputs": {}}}
+            )